@@ -0,0 +1,368 @@
+"""
+Step Dependency Graph
+
+Declares which upstream outputs and claims each pipeline step needs, and
+resolves them from ONE snapshot of the run's completed steps.
+
+/steps/prepare and /steps/transition used to call get_completed_step() once
+per upstream step (6-10 round trips for 8_MEDIA or 11_DOSSIER_COMPOSER) and
+re-query CLAIMS_EXTRACTION rows for every step. Now:
+
+    snapshot = load_run_snapshot(repo, run_id)   # 1 query (+1 for uncached outputs)
+    step_input.update(resolve_step_inputs(step_name, snapshot))
+
+Each step's clean content is extracted once, shared by every step prepared
+from the snapshot and kept in the step cache (step_cache.py) for later calls.
+"""
+
+from collections import namedtuple
+from typing import Optional, List, Dict, Any
+
+from .outputs import extract_clean_content
+from .step_cache import step_cache, MISSING
+
+
+# ============================================================================
+# CLAIMS SOURCES
+# ============================================================================
+
+# Research steps whose output gets claims-extracted -> (claims key, narrative key)
+CLAIMS_SOURCES = {
+    '2_SIGNAL_DISCOVERY': ('signal_discovery_claims', 'signal_discovery_narrative'),
+    '3_ENTITY_RESEARCH': ('entity_research_claims', 'entity_research_narrative'),
+    '4_CONTACT_DISCOVERY': ('contact_discovery_claims', 'contact_discovery_narrative'),
+    '5A_ENRICH_LEAD': ('enrich_lead_claims', 'enrich_lead_narrative'),
+    '5B_ENRICH_OPPORTUNITY': ('enrich_opportunity_claims', 'enrich_opportunity_narrative'),
+    '5C_CLIENT_SPECIFIC': ('client_specific_claims', 'client_specific_narrative'),
+    '07B_INSIGHT': ('insight_claims', 'insight_narrative')
+}
+
+
+def claims_input_key(source_step: str) -> str:
+    """Input key a CLAIMS_EXTRACTION step receives its source under (e.g. '2_signal_discovery_output')"""
+    return f"{source_step.lower()}_output"
+
+
+def detect_claims_source(step_input: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Figure out which research step a CLAIMS_EXTRACTION row was built from by looking at its input
+
+    Written to v2_pipeline_logs.source_step at completion time, so readers only
+    need this for rows completed before that column existed.
+    """
+    if not isinstance(step_input, dict):
+        return None
+    for source_step in CLAIMS_SOURCES:
+        if claims_input_key(source_step) in step_input:
+            return source_step
+    return None
+
+
+# ============================================================================
+# RUN SNAPSHOT
+# ============================================================================
+
+class RunSnapshot:
+    """
+    In-memory view of every completed step in a run.
+
+    Built from the rows of ColumnlineRepository.get_completed_steps() (ordered
+    by completed_at). If a step completed more than once, the latest row wins.
+    Clean content is extracted lazily and memoized.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._claims_rows: Dict[str, Dict[str, Any]] = {}
+
+        for row in rows:
+            if row.get('step_name') == 'CLAIMS_EXTRACTION':
+                source_step = row.get('source_step') or detect_claims_source(row.get('input'))
+                if source_step:
+                    self._claims_rows[source_step] = row
+            else:
+                self._rows[row['step_name']] = row
+
+    @staticmethod
+    def _content(row: Dict[str, Any]) -> Any:
+        # Rows served from the step cache arrive with 'content' already set
+        if 'content' not in row:
+            row['content'] = extract_clean_content(row.get('output'))
+        return row['content']
+
+    def has(self, step_name: str) -> bool:
+        return step_name in self._rows
+
+    def output(self, step_name: str) -> Any:
+        """Clean content of a completed step, or None if it hasn't completed"""
+        if step_name not in self._rows:
+            return None
+        return self._content(self._rows[step_name])
+
+    def has_claims(self, source_step: str) -> bool:
+        return source_step in self._claims_rows
+
+    def claims(self, source_step: str) -> Any:
+        """Clean claims extracted from a research step, or None"""
+        if source_step not in self._claims_rows:
+            return None
+        return self._content(self._claims_rows[source_step])
+
+    def individual_claims(self) -> Dict[str, Any]:
+        """
+        ALL individual claims AND narratives from all extraction steps
+
+        For each research step that has claims, returns BOTH the extracted
+        claims and the original narrative (e.g. signal_discovery_claims +
+        signal_discovery_narrative).
+        """
+        claims_dict = {}
+        for source_step, (claims_key, narrative_key) in CLAIMS_SOURCES.items():
+            if not self.has_claims(source_step):
+                continue
+            claims_dict[claims_key] = self.claims(source_step)
+            if self.has(source_step):
+                claims_dict[narrative_key] = self.output(source_step)
+        return claims_dict
+
+
+def load_run_snapshot(repo, run_id: str, step_names: Optional[List[str]] = None) -> RunSnapshot:
+    """
+    Build a RunSnapshot, downloading outputs only for steps not in the step cache
+
+    One lightweight query for the run's completed steps (no output column),
+    then one query for the outputs of cache misses - skipped entirely when
+    everything is cached. Misses are cleaned and cached for the next call.
+    """
+    rows = repo.get_completed_steps(run_id, step_names, include_output=False)
+
+    misses = []
+    for row in rows:
+        content = step_cache.get(run_id, row['step_name'], row['step_id'])
+        if content is MISSING:
+            misses.append(row)
+        else:
+            row['content'] = content
+
+    if misses:
+        outputs = repo.get_step_outputs([row['step_id'] for row in misses])
+        for row in misses:
+            row['content'] = extract_clean_content(outputs.get(row['step_id']))
+            step_cache.put(run_id, row['step_name'], row['step_id'], row['content'])
+
+    return RunSnapshot(rows)
+
+
+# ============================================================================
+# DEPENDENCY GRAPH
+# ============================================================================
+
+# kind:
+#   output             clean output of `step` -> `key`
+#   claims             claims extracted from `step` -> `key`
+#   first_output       first completed step in `step` (a list) -> "{step}_output"
+#   individual_claims  every claims + narrative pair (RunSnapshot.individual_claims)
+#   completed          (transition only) clean output of the step just completed -> `key`
+#                      ("{step}_output" if key is None)
+# after / unless_after restrict a dependency to transitions from (or not from) those steps.
+Dep = namedtuple('Dep', ['kind', 'step', 'key', 'after', 'unless_after'], defaults=[None, None, None, None])
+
+
+def output(step: str, key: str) -> Dep:
+    return Dep('output', step, key)
+
+
+def claims(step: str) -> Dep:
+    return Dep('claims', step, CLAIMS_SOURCES[step][0])
+
+
+def completed(key: Optional[str], after: Optional[List[str]] = None) -> Dep:
+    return Dep('completed', None, key, tuple(after) if after else None)
+
+
+INDIVIDUAL_CLAIMS = Dep('individual_claims')
+CONTEXT_PACK = output("CONTEXT_PACK", "context_pack")
+INSIGHT_OUTPUT = output("07B_INSIGHT", "insight_output")
+ENRICHED_CONTACTS = output("6_ENRICH_CONTACTS", "enriched_contacts")
+
+# Claims extraction runs on the most recent research/enrich output
+LATEST_RESEARCH_OUTPUT = Dep('first_output', [
+    "5C_CLIENT_SPECIFIC", "5B_ENRICH_OPPORTUNITY", "5A_ENRICH_LEAD",
+    "4_CONTACT_DISCOVERY", "3_ENTITY_RESEARCH", "2_SIGNAL_DISCOVERY"
+])
+
+RESEARCH_OUTPUTS = [
+    output("2_SIGNAL_DISCOVERY", "signal_discovery_output"),
+    output("3_ENTITY_RESEARCH", "entity_research_output"),
+    output("4_CONTACT_DISCOVERY", "contact_discovery_output"),
+]
+
+RESEARCH_NARRATIVES = [
+    output("2_SIGNAL_DISCOVERY", "signal_discovery_narrative"),
+    output("3_ENTITY_RESEARCH", "entity_research_narrative"),
+    # CRITICAL: contains key_contacts from contact discovery research
+    output("4_CONTACT_DISCOVERY", "contact_discovery_narrative"),
+]
+
+ENRICH_OUTPUTS = [
+    output("5A_ENRICH_LEAD", "enrich_lead_output"),
+    output("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
+    output("5C_CLIENT_SPECIFIC", "client_specific_output"),
+]
+
+RESEARCH_CLAIMS = [claims("2_SIGNAL_DISCOVERY"), claims("3_ENTITY_RESEARCH"), claims("4_CONTACT_DISCOVERY")]
+ENRICH_CLAIMS = [claims("5A_ENRICH_LEAD"), claims("5B_ENRICH_OPPORTUNITY"), claims("5C_CLIENT_SPECIFIC")]
+ALL_CLAIMS = [claims(step) for step in CLAIMS_SOURCES]
+
+ENRICH_STEPS = ["5A_ENRICH_LEAD", "5B_ENRICH_OPPORTUNITY", "5C_CLIENT_SPECIFIC"]
+
+WRITER_STEPS = [
+    "10_WRITER_INTRO", "10_WRITER_SIGNALS", "10_WRITER_LEAD_INTELLIGENCE",
+    "10_WRITER_STRATEGY", "10_WRITER_OPPORTUNITY", "10_WRITER_CLIENT_SPECIFIC"
+]
+
+# /steps/prepare: everything comes from completed steps in the run
+STEP_DEPENDENCIES = {
+    "2_SIGNAL_DISCOVERY": [output("1_SEARCH_BUILDER", "search_builder_output")],
+    "3_ENTITY_RESEARCH": [output("2_SIGNAL_DISCOVERY", "signal_discovery_output")],
+    "4_CONTACT_DISCOVERY": RESEARCH_OUTPUTS[:2],
+    "CLAIMS_EXTRACTION": [LATEST_RESEARCH_OUTPUT],
+    "CONTEXT_PACK": RESEARCH_CLAIMS,
+    **{step: RESEARCH_OUTPUTS + RESEARCH_CLAIMS for step in ENRICH_STEPS},
+    # Insight needs ALL research narratives (not claims)
+    "07B_INSIGHT": RESEARCH_NARRATIVES + ENRICH_OUTPUTS,
+    "MERGE_CLAIMS": [LATEST_RESEARCH_OUTPUT] + ALL_CLAIMS,
+    "9_DOSSIER_PLAN": [CONTEXT_PACK, INDIVIDUAL_CLAIMS],
+    "6_ENRICH_CONTACTS": RESEARCH_NARRATIVES + ENRICH_OUTPUTS + [CONTEXT_PACK, INDIVIDUAL_CLAIMS],
+    "6_ENRICH_CONTACT_INDIVIDUAL": RESEARCH_NARRATIVES + ENRICH_OUTPUTS[:2] + [INDIVIDUAL_CLAIMS],
+    "8_MEDIA": RESEARCH_NARRATIVES + ENRICH_OUTPUTS + [ENRICHED_CONTACTS, INSIGHT_OUTPUT, CONTEXT_PACK, INDIVIDUAL_CLAIMS],
+    **{step: [output("9_DOSSIER_PLAN", "dossier_plan"), CONTEXT_PACK, INDIVIDUAL_CLAIMS] for step in WRITER_STEPS},
+    "11_DOSSIER_COMPOSER": RESEARCH_NARRATIVES + ENRICH_OUTPUTS + [INSIGHT_OUTPUT, ENRICHED_CONTACTS],
+}
+
+# /steps/transition: the just-completed output feeds the next step directly
+TRANSITION_DEPENDENCIES = {
+    "2_SIGNAL_DISCOVERY": [completed("search_builder_output")],
+    "CLAIMS_EXTRACTION": [completed(None, after=list(CLAIMS_SOURCES))],
+    "MERGE_CLAIMS": ALL_CLAIMS,
+    "CONTEXT_PACK": [
+        completed("merged_claims_output", after=["MERGE_CLAIMS"]),
+        # Legacy: context pack after individual claims (not in 07B flow)
+        *[dep._replace(unless_after=("MERGE_CLAIMS",)) for dep in RESEARCH_CLAIMS],
+        completed("latest_claims", after=["CLAIMS_EXTRACTION"]),
+    ],
+    "4_CONTACT_DISCOVERY": [RESEARCH_OUTPUTS[0], completed("entity_research_output")],
+    **{step: RESEARCH_OUTPUTS + RESEARCH_CLAIMS for step in ENRICH_STEPS},
+    "07B_INSIGHT": RESEARCH_CLAIMS + ENRICH_CLAIMS,
+    "10A_COPY": [completed("enriched_contact_data", after=["6_ENRICH_CONTACT_INDIVIDUAL"])],
+    "10B_COPY_CLIENT_OVERRIDE": [completed("base_copy", after=["10A_COPY"])],
+    "6_ENRICH_CONTACTS": RESEARCH_NARRATIVES + ENRICH_OUTPUTS,
+    "6_ENRICH_CONTACT_INDIVIDUAL": RESEARCH_NARRATIVES + ENRICH_OUTPUTS[:2],
+    "11_DOSSIER_COMPOSER": RESEARCH_NARRATIVES + ENRICH_OUTPUTS + [INSIGHT_OUTPUT, ENRICHED_CONTACTS],
+}
+
+
+def dependencies_for(step_name: str, graph: Dict[str, List[Dep]] = STEP_DEPENDENCIES) -> List[Dep]:
+    """Dependencies of a step (any *CLAIM* step not in the graph gets the latest research output)"""
+    if step_name in graph:
+        return graph[step_name]
+    if graph is STEP_DEPENDENCIES and "CLAIM" in step_name.upper():
+        return [LATEST_RESEARCH_OUTPUT]
+    return []
+
+
+def needs_snapshot(step_name: str, graph: Dict[str, List[Dep]] = STEP_DEPENDENCIES) -> bool:
+    """False when a step only depends on the just-completed output (skip the query)"""
+    return any(dep.kind != 'completed' for dep in dependencies_for(step_name, graph))
+
+
+def resolve_step_inputs(
+    step_name: str,
+    snapshot: RunSnapshot,
+    graph: Dict[str, List[Dep]] = STEP_DEPENDENCIES,
+    completed_step: Optional[str] = None,
+    completed_output: Any = None
+) -> Dict[str, Any]:
+    """
+    Assemble the upstream inputs for a step from a run snapshot
+
+    Args:
+        step_name: Step being prepared
+        snapshot: Completed steps of the run
+        graph: STEP_DEPENDENCIES (prepare) or TRANSITION_DEPENDENCIES
+        completed_step: Step just completed (transition only)
+        completed_output: Its clean output (transition only)
+
+    Returns:
+        Dict of input keys to merge into the step's base input
+    """
+    inputs = {}
+
+    for dep in dependencies_for(step_name, graph):
+        if dep.after and completed_step not in dep.after:
+            continue
+        if dep.unless_after and completed_step in dep.unless_after:
+            continue
+
+        if dep.kind == 'output':
+            if snapshot.has(dep.step):
+                inputs[dep.key] = snapshot.output(dep.step)
+        elif dep.kind == 'claims':
+            if snapshot.has_claims(dep.step):
+                inputs[dep.key] = snapshot.claims(dep.step)
+        elif dep.kind == 'first_output':
+            for research_step in dep.step:
+                if snapshot.has(research_step):
+                    inputs[claims_input_key(research_step)] = snapshot.output(research_step)
+                    break
+        elif dep.kind == 'individual_claims':
+            inputs.update(snapshot.individual_claims())
+        elif dep.kind == 'completed':
+            inputs[dep.key or claims_input_key(completed_step)] = completed_output
+
+    return inputs
+
+
+# ============================================================================
+# DERIVED INPUTS
+# ============================================================================
+
+def _media_target(step_input: Dict[str, Any], run: Dict[str, Any], client: Dict[str, Any]) -> None:
+    """Company name and domain for media search, from signal discovery"""
+    signal_data = step_input.get("signal_discovery_narrative")
+    if isinstance(signal_data, dict) and 'lead' in signal_data:
+        step_input["target_company_name"] = signal_data['lead'].get('company_name', '')
+        step_input["target_company_domain"] = signal_data['lead'].get('company_domain', '')
+
+
+def _composer_context(step_input: Dict[str, Any], run: Dict[str, Any], client: Dict[str, Any]) -> None:
+    """Client context + pre-calculated lead scores (composer calculates them if missing)"""
+    step_input["client_name"] = client.get('client_name', '')
+    step_input["client_services"] = client.get('services', client.get('client_services', ''))
+    step_input["client_differentiators"] = client.get('differentiators', client.get('client_differentiators', ''))
+
+    # Pre-calculated scores from enrich_lead
+    enrich_lead = step_input.get("enrich_lead_output", {})
+    if isinstance(enrich_lead, dict):
+        for field in ("lead_score", "timing_urgency", "score_explanation"):
+            if enrich_lead.get(field):
+                step_input[field] = enrich_lead[field]
+
+    # Fallback to seed_data if scores not in enrich_lead
+    seed = run.get("seed_data", {}) or {}
+    for field in ("lead_score", "timing_urgency"):
+        if not step_input.get(field) and seed.get(field):
+            step_input[field] = seed[field]
+
+
+DERIVED_INPUTS = {
+    "8_MEDIA": _media_target,
+    "11_DOSSIER_COMPOSER": _composer_context,
+}
+
+
+def add_derived_inputs(step_name: str, step_input: Dict[str, Any], run: Dict[str, Any], client: Dict[str, Any]) -> None:
+    """Add inputs computed from already-resolved ones (in place)"""
+    derive = DERIVED_INPUTS.get(step_name)
+    if derive:
+        derive(step_input, run, client)
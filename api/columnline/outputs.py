@@ -0,0 +1,126 @@
+"""
+OpenAI Output Parsing
+
+Helpers for turning raw OpenAI responses (as posted by Make.com) into
+token/runtime metadata and the clean content passed to the next step.
+"""
+
+from datetime import datetime
+
+
+def parse_openai_response(openai_output):
+    """
+    Parse OpenAI API response to extract text, tokens, model, and runtime
+
+    Handles both array format and single response format.
+    Extracts input_tokens and output_tokens separately for cost calculation.
+    """
+    # If it's an array, take first element
+    if isinstance(openai_output, list):
+        openai_output = openai_output[0]
+
+    # Extract response text
+    response_text = None
+    if 'result' in openai_output:
+        response_text = openai_output['result']
+    elif 'output' in openai_output and isinstance(openai_output['output'], list):
+        # From output[0].content[0].text
+        if openai_output['output'] and 'content' in openai_output['output'][0]:
+            content = openai_output['output'][0]['content']
+            if content and 'text' in content[0]:
+                response_text = content[0]['text']
+
+    # Extract tokens (detailed breakdown)
+    input_tokens = 0
+    output_tokens = 0
+    tokens_used = 0
+    if 'usage' in openai_output:
+        usage = openai_output['usage']
+        # OpenAI uses both naming conventions depending on API
+        input_tokens = usage.get('input_tokens', usage.get('prompt_tokens', 0))
+        output_tokens = usage.get('output_tokens', usage.get('completion_tokens', 0))
+        tokens_used = usage.get('total_tokens', input_tokens + output_tokens)
+
+    # Extract actual model from response (may differ from requested model)
+    model_used = openai_output.get('model', None)
+
+    # Calculate runtime (completed_at - created_at)
+    runtime_seconds = 0
+    if 'completed_at' in openai_output and 'created_at' in openai_output:
+        # completed_at is unix timestamp, created_at is ISO string
+        completed_ts = openai_output['completed_at']
+        created_at_str = openai_output['created_at']
+        # Parse ISO timestamp to unix
+        created_dt = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
+        created_ts = created_dt.timestamp()
+        runtime_seconds = completed_ts - created_ts
+
+    return {
+        "text": response_text,
+        "tokens_used": tokens_used,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "model_used": model_used,
+        "runtime_seconds": runtime_seconds,
+        "full_output": openai_output  # Store full response for debugging
+    }
+
+
+def extract_clean_content(openai_output):
+    """
+    Extract ONLY the clean content for passing to next step's input
+
+    Removes all metadata, nested arrays, and irrelevant fields.
+    Returns just what the next LLM needs to see.
+
+    Handles different response formats:
+    - Claims Extraction: Returns the claims array
+    - Deep Research: Returns the narrative text or parsed JSON
+    - Context Pack: Returns the context pack content
+    """
+    import json
+
+    # Handle None input
+    if openai_output is None:
+        return {}
+
+    # If it's an array, take first element
+    if isinstance(openai_output, list):
+        if not openai_output:
+            return {}
+        openai_output = openai_output[0]
+
+    # If still None or not a dict, return empty
+    if openai_output is None or not isinstance(openai_output, dict):
+        return openai_output if openai_output else {}
+
+    # Pattern 1: Claims Extraction format - has "result.claims"
+    if 'result' in openai_output and isinstance(openai_output['result'], dict):
+        if 'claims' in openai_output['result']:
+            return openai_output['result']['claims']  # Just the claims array
+        return openai_output['result']  # Or the whole result object if no claims
+
+    # Pattern 2: Deep Research / Responses API format - has "output" array with message content
+    if 'output' in openai_output and isinstance(openai_output['output'], list):
+        # Find the message content (skip reasoning/web_search_call)
+        for output_item in openai_output['output']:
+            if output_item.get('type') == 'message' and output_item.get('status') == 'completed':
+                content = output_item.get('content', [])
+                if content and isinstance(content, list):
+                    for content_item in content:
+                        if content_item.get('type') == 'output_text':
+                            text = content_item.get('text', '')
+                            # Try to parse as JSON if it looks like JSON
+                            if isinstance(text, str) and text.strip().startswith('{'):
+                                try:
+                                    return json.loads(text)
+                                except json.JSONDecodeError:
+                                    pass
+                            return text
+
+    # Pattern 3: Simple text response (fallback)
+    if 'text' in openai_output:
+        return openai_output['text']
+
+    # Fallback: return the whole thing if we can't parse it
+    return openai_output
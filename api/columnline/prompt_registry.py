@@ -0,0 +1,149 @@
+"""
+Prompt Registry
+
+All v2_prompts rows loaded once per process and served from memory.
+
+Every prepare/transition/config call used to fetch its prompt from Supabase
+even though prompts change rarely. The registry loads the whole table in one
+query, then at most every PROMPT_CACHE_CHECK_INTERVAL seconds compares a
+cheap (prompt_id, updated_at, current_version) fingerprint and reloads only
+if something changed (edit, version bump, new/removed prompt - see
+migration 007 for the updated_at trigger). Prompt versions
+(v2_prompt_versions) are immutable per version_number and cached as fetched.
+
+Callers get copies, so mutating a returned prompt never touches the cache.
+
+Environment:
+    PROMPT_CACHE_CHECK_INTERVAL   seconds between fingerprint checks (default 60, 0 = every call)
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+from workers.db import get_supabase
+
+
+CHECK_INTERVAL = float(os.environ.get("PROMPT_CACHE_CHECK_INTERVAL", 60))
+
+
+class PromptRegistry:
+    """In-memory v2_prompts table with fingerprint-based invalidation"""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._prompts: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_step: Dict[str, Dict[str, Any]] = {}
+        self._by_slug: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._fingerprint = None
+        self._next_check = 0.0
+        self._loaded_at = None
+        self.hits = 0
+        self.loads = 0
+        self.checks = 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fingerprint_of(rows: List[Dict[str, Any]]) -> frozenset:
+        return frozenset((row.get('prompt_id'), row.get('updated_at'), row.get('current_version')) for row in rows)
+
+    def _load(self) -> None:
+        rows = get_supabase().table('v2_prompts').select('*').order('prompt_id').execute().data
+
+        by_id, by_step, by_slug = {}, {}, {}
+        for row in rows:
+            by_id[row.get('prompt_id')] = row
+            # First match wins, same as the old .eq(...).execute().data[0]
+            if row.get('step'):
+                by_step.setdefault(row['step'], row)
+            if row.get('prompt_slug'):
+                by_slug.setdefault(row['prompt_slug'], row)
+
+        self._prompts = rows
+        self._by_id, self._by_step, self._by_slug = by_id, by_step, by_slug
+        self._fingerprint = self._fingerprint_of(rows)
+        self._loaded_at = datetime.utcnow().isoformat()
+        self.loads += 1
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._fingerprint is not None and now < self._next_check:
+            self.hits += 1
+            return
+
+        with self._lock:
+            if self._fingerprint is None:
+                self._load()
+            elif now >= self._next_check:
+                self.checks += 1
+                rows = get_supabase().table('v2_prompts').select('prompt_id, updated_at, current_version').execute().data
+                if self._fingerprint_of(rows) != self._fingerprint:
+                    print("[PROMPTS] v2_prompts changed - reloading registry")
+                    self._load()
+            self._next_check = now + self.check_interval
+
+    def refresh(self) -> Dict[str, Any]:
+        """Force a reload (and drop cached versions)"""
+        with self._lock:
+            self._versions.clear()
+            self._load()
+            self._next_check = time.monotonic() + self.check_interval
+        return self.stats()
+
+    # ------------------------------------------------------------------
+    # Lookups (return copies)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _copy(prompt: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        return dict(prompt) if prompt is not None else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        self._ensure_fresh()
+        return [dict(p) for p in self._prompts]
+
+    def by_id(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        return self._copy(self._by_id.get(prompt_id))
+
+    def by_step(self, step_name: str) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        return self._copy(self._by_step.get(step_name))
+
+    def by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        return self._copy(self._by_slug.get(slug))
+
+    def version(self, prompt_id: str, version_number: int) -> Optional[Dict[str, Any]]:
+        """v2_prompt_versions row (immutable per version_number, cached once found)"""
+        key = (prompt_id, version_number)
+        if key not in self._versions:
+            result = get_supabase().table("v2_prompt_versions").select("*").eq("prompt_id", prompt_id).eq("version_number", version_number).execute()
+            if not result.data:
+                return None
+            self._versions[key] = result.data[0]
+        else:
+            self.hits += 1
+        return dict(self._versions[key])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prompts": len(self._prompts),
+            "versions_cached": len(self._versions),
+            "loaded_at": self._loaded_at,
+            "check_interval_seconds": self.check_interval,
+            "hits": self.hits,
+            "loads": self.loads,
+            "checks": self.checks
+        }
+
+
+prompt_registry = PromptRegistry()
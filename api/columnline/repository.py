@@ -5,23 +5,27 @@ Database operations for Columnline API endpoints.
 All queries return clean JSON - no nested arrays, no wrapper hell.
 """
 
-import os
+import functools
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from supabase import create_client, Client
 
+import anyio
+import anyio.to_thread
+from supabase import Client
+from workers.db import get_supabase, POOL_MAX_CONNECTIONS
+from workers.blobs import offload_row, hydrate_rows
 
-class ColumnlineRepository:
-    """Database repository for Columnline operations"""
+from .dependencies import detect_claims_source
+from .prompt_registry import prompt_registry
 
-    def __init__(self):
-        supabase_url = os.environ.get('SUPABASE_URL')
-        supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
 
-        if not supabase_url or not supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+class ColumnlineRepository:
+    """Database repository for Columnline operations"""
 
-        self.client: Client = create_client(supabase_url, supabase_key)
+    @property
+    def client(self) -> Client:
+        """Shared pooled Supabase client (see workers/db.py)"""
+        return get_supabase()
 
     # ========================================================================
     # CLIENT & PROMPTS (Config Fetch)
@@ -36,25 +40,25 @@ class ColumnlineRepository:
         return None
 
     def get_all_prompts(self) -> List[Dict[str, Any]]:
-        """Fetch all 31 prompts"""
-        result = self.client.table('v2_prompts').select('*').order('prompt_id').execute()
-        return result.data
+        """Fetch all 31 prompts (from the prompt registry cache)"""
+        return prompt_registry.all()
 
     def get_prompt_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
         """Fetch specific prompt by slug"""
-        result = self.client.table('v2_prompts').select('*').eq('prompt_slug', slug).execute()
-
-        if result.data:
-            return result.data[0]
-        return None
+        return prompt_registry.by_slug(slug)
 
     def get_prompt_by_step(self, step_name: str) -> Optional[Dict[str, Any]]:
         """Fetch prompt by step name (e.g., '1_SEARCH_BUILDER')"""
-        result = self.client.table('v2_prompts').select('*').eq('step', step_name).execute()
+        return prompt_registry.by_step(step_name)
 
-        if result.data:
-            return result.data[0]
-        return None
+    def get_prompts_by_steps(self, step_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch prompts for several steps at once: {step_name: prompt}"""
+        prompts = {}
+        for step_name in step_names:
+            prompt = prompt_registry.by_step(step_name)
+            if prompt:
+                prompts[step_name] = prompt
+        return prompts
 
     # ========================================================================
     # RUNS (Run Management)
@@ -88,6 +92,31 @@ class ColumnlineRepository:
             'p_cost': cost
         }).execute()
 
+    def allocate_step_ids(self, run_id: str, count: int = 1) -> List[str]:
+        """
+        Reserve step_ids for a run atomically (STEP_{run_id}_NN).
+
+        Uses the allocate_step_ids RPC (per-run counter) so parallel prepares
+        never hand out the same number, and N steps cost one round trip.
+
+        Args:
+            run_id: The run the steps belong to
+            count: How many step_ids to reserve
+
+        Returns:
+            List of `count` new step_ids in order
+        """
+        if count < 1:
+            return []
+
+        result = self.client.rpc('allocate_step_ids', {
+            'p_run_id': run_id,
+            'p_count': count
+        }).execute()
+
+        step_nums = [row if isinstance(row, int) else next(iter(row.values())) for row in result.data]
+        return [f"STEP_{run_id}_{step_num:02d}" for step_num in step_nums]
+
     def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
         """Get run details"""
         result = self.client.table('v2_runs').select('*').eq('run_id', run_id).execute()
@@ -137,16 +166,26 @@ class ColumnlineRepository:
     # ========================================================================
     # PIPELINE STEPS (Logging & Polling)
     # ========================================================================
+    # Large input/output values (client configs repeated in every step, raw
+    # OpenAI responses) are stored in the blob store (workers/blobs.py); rows
+    # keep references, and every read that returns input/output hydrates them.
 
     def create_pipeline_step(self, step_data: Dict[str, Any]) -> Dict[str, Any]:
         """Log a pipeline step (dual-write: running, then completed)"""
-        result = self.client.table('v2_pipeline_logs').insert(step_data).execute()
-        return result.data[0]
+        result = self.client.table('v2_pipeline_logs').insert(offload_row(step_data)).execute()
+        return hydrate_rows(result.data)[0]
+
+    def create_pipeline_steps(self, steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Log several pipeline steps in one bulk insert"""
+        if not steps:
+            return []
+        result = self.client.table('v2_pipeline_logs').insert([offload_row(step) for step in steps]).execute()
+        return hydrate_rows(result.data)
 
     def update_pipeline_step(self, step_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Update pipeline step (for dual-write pattern)"""
-        result = self.client.table('v2_pipeline_logs').update(updates).eq('step_id', step_id).execute()
-        return result.data[0]
+        result = self.client.table('v2_pipeline_logs').update(offload_row(updates)).eq('step_id', step_id).execute()
+        return hydrate_rows(result.data)[0]
 
     def get_completed_step(self, run_id: str, step_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -157,7 +196,7 @@ class ColumnlineRepository:
         result = self.client.table('v2_pipeline_logs').select('*').eq('run_id', run_id).eq('step_name', step_name).eq('status', 'completed').execute()
 
         if result.data:
-            return result.data[0]
+            return hydrate_rows(result.data[:1])[0]
         return None
 
     def get_completed_outputs(self, run_id: str, step_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
@@ -188,7 +227,7 @@ class ColumnlineRepository:
         result = query.execute()
 
         outputs = {}
-        for step in result.data:
+        for step in hydrate_rows(result.data):
             outputs[step['step_name']] = {
                 "step_id": step['step_id'],
                 "output": step['output'],
@@ -199,6 +238,49 @@ class ColumnlineRepository:
 
         return outputs
 
+    def get_completed_steps(self, run_id: str, step_names: Optional[List[str]] = None, include_output: bool = True) -> List[Dict[str, Any]]:
+        """
+        Get completed steps in a run in ONE query (for dependency resolution)
+
+        Args:
+            run_id: Run ID
+            step_names: Optional list of specific step names to fetch
+            include_output: False to skip the (large) output column - pair with
+                get_step_outputs() to fetch only what isn't cached
+
+        Returns rows with step_id, step_name, source_step, completed_at (and
+        output), oldest first. CLAIMS_EXTRACTION rows completed before
+        source_step was recorded get it filled in from their input (one extra
+        query, only if any such rows exist).
+        """
+        columns = 'step_id, step_name, source_step, completed_at'
+        if include_output:
+            columns += ', output'
+
+        query = self.client.table('v2_pipeline_logs').select(columns).eq('run_id', run_id).eq('status', 'completed')
+
+        if step_names:
+            query = query.in_('step_name', step_names)
+
+        rows = query.order('completed_at').execute().data
+        if include_output:
+            hydrate_rows(rows, fields=('output',))
+
+        legacy = {row['step_id']: row for row in rows if row['step_name'] == 'CLAIMS_EXTRACTION' and not row.get('source_step')}
+        if legacy:
+            inputs = self.client.table('v2_pipeline_logs').select('step_id, input').in_('step_id', list(legacy)).execute()
+            for item in hydrate_rows(inputs.data, fields=('input',)):
+                legacy[item['step_id']]['source_step'] = detect_claims_source(item.get('input'))
+
+        return rows
+
+    def get_step_outputs(self, step_ids: List[str]) -> Dict[str, Any]:
+        """Raw outputs for specific steps: {step_id: output}"""
+        if not step_ids:
+            return {}
+        result = self.client.table('v2_pipeline_logs').select('step_id, output').in_('step_id', step_ids).execute()
+        return {row['step_id']: row['output'] for row in hydrate_rows(result.data, fields=('output',))}
+
     # ========================================================================
     # ========================================================================
     # REMOVED: CLAIMS, SECTIONS, DOSSIERS
@@ -338,18 +420,51 @@ class ColumnlineRepository:
 # Merged from api/v2/repository.py
 # ============================================================================
 
+class AsyncColumnlineRepository:
+    """
+    Awaitable facade over ColumnlineRepository for async route handlers
+
+    supabase-py's client is synchronous; calling it from an `async def` route
+    blocks the event loop for the whole round trip. Every method here runs
+    the sync call in a worker thread instead, capped at the Supabase pool
+    size so threads never queue on the connection pool.
+
+        arepo = AsyncColumnlineRepository(repo)
+        run = await arepo.get_run(run_id)
+        rows = await arepo.run(lambda: arepo.client.table('v2_runs').select('*').execute())
+    """
+
+    def __init__(self, repo: Optional[ColumnlineRepository] = None):
+        self._repo = repo or ColumnlineRepository()
+        self._limiter = None
+
+    @property
+    def client(self) -> Client:
+        return self._repo.client
+
+    async def run(self, fn, *args, **kwargs):
+        """Run any sync DB work in the threadpool (bounded by the pool size)"""
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(POOL_MAX_CONNECTIONS)
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=self._limiter)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._repo, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
 class V2Repository:
     """Simplified repository for Make.com API endpoints"""
 
     def __init__(self, client: Optional[Client] = None):
-        if client:
-            self.client = client
-        else:
-            url = os.environ.get("SUPABASE_URL")
-            key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-            if not url or not key:
-                raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
-            self.client = create_client(url, key)
+        self.client = client or get_supabase()
 
     # ---------- Clients ----------
 
@@ -366,9 +481,8 @@ class V2Repository:
     # ---------- Prompts ----------
 
     def get_prompt(self, prompt_id: str) -> Optional[Dict[str, Any]]:
-        """Get a prompt by prompt_id"""
-        result = self.client.table("v2_prompts").select("*").eq("prompt_id", prompt_id).single().execute()
-        return result.data if result.data else None
+        """Get a prompt by prompt_id (from the prompt registry cache)"""
+        return prompt_registry.by_id(prompt_id)
 
     def get_prompt_version(self, prompt_id: str, version_number: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """Get a prompt version - if version_number is None, get current version"""
@@ -379,8 +493,7 @@ class V2Repository:
                 return None
             version_number = prompt.get("current_version", 1)
 
-        result = self.client.table("v2_prompt_versions").select("*").eq("prompt_id", prompt_id).eq("version_number", version_number).single().execute()
-        return result.data if result.data else None
+        return prompt_registry.version(prompt_id, version_number)
 
     def get_prompt_with_content(self, prompt_id: str, version_number: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """Get prompt metadata with content from version"""
@@ -9,7 +9,23 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from datetime import datetime
 
-from .repository import ColumnlineRepository
+from workers.prompt_cache import file_prompts
+
+from .repository import ColumnlineRepository, AsyncColumnlineRepository
+from .outputs import parse_openai_response, extract_clean_content
+from .dependencies import (
+    CLAIMS_SOURCES,
+    RunSnapshot,
+    load_run_snapshot,
+    TRANSITION_DEPENDENCIES,
+    resolve_step_inputs,
+    add_derived_inputs,
+    needs_snapshot,
+    detect_claims_source
+)
+from .step_cache import step_cache
+from workers.blobs import hydrate_rows
+from .prompt_registry import prompt_registry
 from .pricing import calculate_cost
 from .models import (
     RunStartRequest, RunStartResponse,
@@ -43,130 +59,15 @@ from .models import (
 router = APIRouter(prefix="/columnline", tags=["columnline"])
 repo = ColumnlineRepository()
 
+# Async handlers await this so Supabase round trips don't block the event loop;
+# multi-query handlers below are plain `def` and run in FastAPI's threadpool
+arepo = AsyncColumnlineRepository(repo)
+
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def parse_openai_response(openai_output):
-    """
-    Parse OpenAI API response to extract text, tokens, model, and runtime
-
-    Handles both array format and single response format.
-    Extracts input_tokens and output_tokens separately for cost calculation.
-    """
-    # If it's an array, take first element
-    if isinstance(openai_output, list):
-        openai_output = openai_output[0]
-
-    # Extract response text
-    response_text = None
-    if 'result' in openai_output:
-        response_text = openai_output['result']
-    elif 'output' in openai_output and isinstance(openai_output['output'], list):
-        # From output[0].content[0].text
-        if openai_output['output'] and 'content' in openai_output['output'][0]:
-            content = openai_output['output'][0]['content']
-            if content and 'text' in content[0]:
-                response_text = content[0]['text']
-
-    # Extract tokens (detailed breakdown)
-    input_tokens = 0
-    output_tokens = 0
-    tokens_used = 0
-    if 'usage' in openai_output:
-        usage = openai_output['usage']
-        # OpenAI uses both naming conventions depending on API
-        input_tokens = usage.get('input_tokens', usage.get('prompt_tokens', 0))
-        output_tokens = usage.get('output_tokens', usage.get('completion_tokens', 0))
-        tokens_used = usage.get('total_tokens', input_tokens + output_tokens)
-
-    # Extract actual model from response (may differ from requested model)
-    model_used = openai_output.get('model', None)
-
-    # Calculate runtime (completed_at - created_at)
-    runtime_seconds = 0
-    if 'completed_at' in openai_output and 'created_at' in openai_output:
-        # completed_at is unix timestamp, created_at is ISO string
-        completed_ts = openai_output['completed_at']
-        created_at_str = openai_output['created_at']
-        # Parse ISO timestamp to unix
-        from datetime import datetime
-        created_dt = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-        created_ts = created_dt.timestamp()
-        runtime_seconds = completed_ts - created_ts
-
-    return {
-        "text": response_text,
-        "tokens_used": tokens_used,
-        "input_tokens": input_tokens,
-        "output_tokens": output_tokens,
-        "model_used": model_used,
-        "runtime_seconds": runtime_seconds,
-        "full_output": openai_output  # Store full response for debugging
-    }
-
-
-def extract_clean_content(openai_output):
-    """
-    Extract ONLY the clean content for passing to next step's input
-
-    Removes all metadata, nested arrays, and irrelevant fields.
-    Returns just what the next LLM needs to see.
-
-    Handles different response formats:
-    - Claims Extraction: Returns the claims array
-    - Deep Research: Returns the narrative text or parsed JSON
-    - Context Pack: Returns the context pack content
-    """
-    import json
-
-    # Handle None input
-    if openai_output is None:
-        return {}
-
-    # If it's an array, take first element
-    if isinstance(openai_output, list):
-        if not openai_output:
-            return {}
-        openai_output = openai_output[0]
-
-    # If still None or not a dict, return empty
-    if openai_output is None or not isinstance(openai_output, dict):
-        return openai_output if openai_output else {}
-
-    # Pattern 1: Claims Extraction format - has "result.claims"
-    if 'result' in openai_output and isinstance(openai_output['result'], dict):
-        if 'claims' in openai_output['result']:
-            return openai_output['result']['claims']  # Just the claims array
-        return openai_output['result']  # Or the whole result object if no claims
-
-    # Pattern 2: Deep Research / Responses API format - has "output" array with message content
-    if 'output' in openai_output and isinstance(openai_output['output'], list):
-        # Find the message content (skip reasoning/web_search_call)
-        for output_item in openai_output['output']:
-            if output_item.get('type') == 'message' and output_item.get('status') == 'completed':
-                content = output_item.get('content', [])
-                if content and isinstance(content, list):
-                    for content_item in content:
-                        if content_item.get('type') == 'output_text':
-                            text = content_item.get('text', '')
-                            # Try to parse as JSON if it looks like JSON
-                            if isinstance(text, str) and text.strip().startswith('{'):
-                                try:
-                                    return json.loads(text)
-                                except json.JSONDecodeError:
-                                    pass
-                            return text
-
-    # Pattern 3: Simple text response (fallback)
-    if 'text' in openai_output:
-        return openai_output['text']
-
-    # Fallback: return the whole thing if we can't parse it
-    return openai_output
-
-
 def fetch_all_individual_claims(repo, run_id):
     """
     Fetch ALL individual claims AND narratives from all extraction steps
@@ -184,58 +85,58 @@ def fetch_all_individual_claims(repo, run_id):
     - client_specific_claims + client_specific_narrative
     - insight_claims + insight_narrative
     """
-    claims_dict = {}
-
-    # Find all completed claims extraction steps
-    all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-    # Mapping of research step names to dict keys
-    step_mappings = {
-        '2_SIGNAL_DISCOVERY': ('signal_discovery_claims', 'signal_discovery_narrative'),
-        '3_ENTITY_RESEARCH': ('entity_research_claims', 'entity_research_narrative'),
-        '4_CONTACT_DISCOVERY': ('contact_discovery_claims', 'contact_discovery_narrative'),
-        '5A_ENRICH_LEAD': ('enrich_lead_claims', 'enrich_lead_narrative'),
-        '5B_ENRICH_OPPORTUNITY': ('enrich_opportunity_claims', 'enrich_opportunity_narrative'),
-        '5C_CLIENT_SPECIFIC': ('client_specific_claims', 'client_specific_narrative'),
-        '07B_INSIGHT': ('insight_claims', 'insight_narrative')
-    }
-
-    for claims_step in all_claims_steps.data:
-        # Figure out which research step this came from by looking at the input
-        step_input_data = claims_step.get('input', {})
-        claims_output = extract_clean_content(claims_step.get('output'))
-
-        # Determine the source research step
-        source_step_name = None
-        if '2_signal_discovery_output' in step_input_data:
-            source_step_name = '2_SIGNAL_DISCOVERY'
-        elif '3_entity_research_output' in step_input_data:
-            source_step_name = '3_ENTITY_RESEARCH'
-        elif '4_contact_discovery_output' in step_input_data:
-            source_step_name = '4_CONTACT_DISCOVERY'
-        elif '5a_enrich_lead_output' in step_input_data:
-            source_step_name = '5A_ENRICH_LEAD'
-        elif '5b_enrich_opportunity_output' in step_input_data:
-            source_step_name = '5B_ENRICH_OPPORTUNITY'
-        elif '5c_client_specific_output' in step_input_data:
-            source_step_name = '5C_CLIENT_SPECIFIC'
-        elif '07b_insight_output' in step_input_data:
-            source_step_name = '07B_INSIGHT'
-
-        if source_step_name and source_step_name in step_mappings:
-            claims_key, narrative_key = step_mappings[source_step_name]
-
-            # Store the claims
-            claims_dict[claims_key] = claims_output
+    # One projected query for claims rows (tagged with source_step) + their source narratives;
+    # outputs already in the step cache aren't downloaded again
+    return load_run_snapshot(repo, run_id, ['CLAIMS_EXTRACTION', *CLAIMS_SOURCES]).individual_claims()
+
+
+# Model per step (Make.com can override; defaults to gpt-4.1)
+DEFAULT_MODEL = "gpt-4.1"
+
+STEP_MODELS = {
+    "1_SEARCH_BUILDER": "o4-mini",
+    "2_SIGNAL_DISCOVERY": "gpt-4.1",
+    "3_ENTITY_RESEARCH": "o4-mini-deep-research",
+    "4_CONTACT_DISCOVERY": "o4-mini-deep-research",
+    "5A_ENRICH_LEAD": "gpt-4.1",
+    "5B_ENRICH_OPPORTUNITY": "gpt-4.1",
+    "5C_CLIENT_SPECIFIC": "gpt-4.1",
+    "07B_INSIGHT": "gpt-4.1",
+    "MERGE_CLAIMS": "gpt-4.1",
+    "CLAIMS_EXTRACTION": "gpt-4.1",
+    "CONTEXT_PACK": "gpt-4.1",
+    "8_MEDIA": "gpt-5.2",
+    "9_DOSSIER_PLAN": "gpt-4.1",
+    "10_WRITER_INTRO": "gpt-4.1",
+    "10_WRITER_SIGNALS": "gpt-4.1",
+    "10_WRITER_LEAD_INTELLIGENCE": "gpt-4.1",
+    "10_WRITER_STRATEGY": "gpt-4.1",
+    "10_WRITER_OPPORTUNITY": "gpt-4.1",
+    "10_WRITER_CLIENT_SPECIFIC": "gpt-4.1",
+    "6_ENRICH_CONTACTS": "gpt-4.1",
+    "6_ENRICH_CONTACT_INDIVIDUAL": "gpt-4.1",
+    "10A_COPY": "gpt-4.1",
+    "10B_COPY_CLIENT_OVERRIDE": "gpt-4.1",
+    "11_DOSSIER_COMPOSER": "gpt-4.1"
+}
 
-            # Fetch the original narrative from the research step
-            narrative_step = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', run_id).eq('step_name', source_step_name).eq('status', 'completed').execute()
+BASE_INPUT_KEYS = (
+    "current_date", "icp_config_compressed", "industry_research_compressed",
+    "research_context_compressed", "client_specific_research", "seed_data", "dossier_id"
+)
 
-            if narrative_step.data:
-                narrative_output = extract_clean_content(narrative_step.data[0].get('output'))
-                claims_dict[narrative_key] = narrative_output
 
-    return claims_dict
+def _base_step_input(run, client, dossier_id):
+    """Base input every step gets (client config + seed data)"""
+    return {
+        "current_date": datetime.now().strftime("%Y-%m-%d"),
+        "icp_config_compressed": client.get('icp_config_compressed'),
+        "industry_research_compressed": client.get('industry_research_compressed'),
+        "research_context_compressed": client.get('research_context_compressed'),
+        "client_specific_research": client.get('client_specific_research'),
+        "seed_data": run.get('seed_data'),
+        "dossier_id": dossier_id
+    }
 
 
 # ============================================================================
@@ -254,11 +155,11 @@ async def get_configs(client_id: str):
             icp_config = {{1.client.icp_config_compressed}}
             search_builder_prompt = {{1.prompts[0].template}}
     """
-    client = repo.get_client(client_id)
+    client = await arepo.get_client(client_id)
     if not client:
         raise HTTPException(status_code=404, detail=f"Client not found: {client_id}")
 
-    prompts = repo.get_all_prompts()
+    prompts = await arepo.get_all_prompts()
 
     return ConfigsResponse(
         client=ClientConfig(**client),
@@ -266,10 +167,31 @@ async def get_configs(client_id: str):
     )
 
 
+# Declared before /prompts/{slug} so "cache" isn't treated as a slug
+@router.get("/prompts/cache")
+async def get_prompt_cache_stats():
+    """Prompt cache stats: v2_prompts registry + prompts/*.md file cache"""
+    return {
+        "registry": prompt_registry.stats(),
+        "files": file_prompts.stats()
+    }
+
+
+@router.post("/prompts/cache/refresh")
+async def refresh_prompt_cache():
+    """Reload v2_prompts now and drop cached prompt files (after editing prompts)"""
+    file_prompts.clear()
+    return {
+        "success": True,
+        "registry": await arepo.run(prompt_registry.refresh),
+        "files": file_prompts.stats()
+    }
+
+
 @router.get("/prompts/{slug}", response_model=PromptConfig)
 async def get_prompt(slug: str):
     """Get specific prompt by slug"""
-    prompt = repo.get_prompt_by_slug(slug)
+    prompt = await arepo.get_prompt_by_slug(slug)
     if not prompt:
         raise HTTPException(status_code=404, detail=f"Prompt not found: {slug}")
 
@@ -294,7 +216,7 @@ async def get_outputs(
             search_queries = {{1.outputs.1_SEARCH_BUILDER.output.queries}}
     """
     step_names = steps.split(',') if steps else None
-    outputs = repo.get_completed_outputs(run_id, step_names)
+    outputs = await arepo.get_completed_outputs(run_id, step_names)
 
     # Convert to StepOutput models
     step_outputs = {}
@@ -347,7 +269,7 @@ async def start_run(request: RunStartRequest):
     dossier_id = f"DOSS_{datetime.now().strftime('%Y%m%d')}_{random.randint(1000, 9999)}"
 
     # Verify client exists
-    client = repo.get_client(request.client_id)
+    client = await arepo.get_client(request.client_id)
     if not client:
         raise HTTPException(status_code=404, detail=f"Client not found: {request.client_id}")
 
@@ -362,7 +284,7 @@ async def start_run(request: RunStartRequest):
         "config_snapshot": None  # Could snapshot client config here
     }
 
-    result = repo.create_run(run_data)
+    result = await arepo.create_run(run_data)
 
     return RunStartResponse(
         success=True,
@@ -386,7 +308,7 @@ async def create_run(run: RunCreate):
         [2] HTTP POST /columnline/runs
             Body: {run_id, client_id, status: "running", seed}
     """
-    result = repo.create_run(run.dict())
+    result = await arepo.create_run(run.dict())
 
     return SuccessResponse(
         success=True,
@@ -404,7 +326,7 @@ async def update_run(run_id: str, updates: RunUpdate):
         HTTP PUT /columnline/runs/{{run_id}}
         Body: {status: "completed", completed_at: {{now}}}
     """
-    result = repo.update_run(run_id, updates.dict(exclude_unset=True))
+    result = await arepo.update_run(run_id, updates.dict(exclude_unset=True))
 
     return SuccessResponse(
         success=True,
@@ -424,7 +346,7 @@ async def get_run_status(run_id: str):
         [3] HTTP GET /columnline/runs/{{run_id}}/status
         [4] Router: If status = "completed" → Continue
     """
-    status = repo.get_run_status(run_id)
+    status = await arepo.get_run_status(run_id)
     if not status:
         raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
 
@@ -465,7 +387,7 @@ async def log_pipeline_step(step: PipelineStepCreate):
                 completed_at: {{now}}
             }
     """
-    result = repo.create_pipeline_step(step.dict(exclude_unset=True))
+    result = await arepo.create_pipeline_step(step.dict(exclude_unset=True))
 
     return SuccessResponse(
         success=True,
@@ -481,7 +403,9 @@ async def update_pipeline_step(step_id: str, updates: PipelineStepUpdate):
 
     See log_pipeline_step for usage example
     """
-    result = repo.update_pipeline_step(step_id, updates.dict(exclude_unset=True))
+    result = await arepo.update_pipeline_step(step_id, updates.dict(exclude_unset=True))
+    # The step's output may have changed - later prepare/transition calls must re-read it
+    step_cache.invalidate(result['run_id'], result['step_name'])
 
     return SuccessResponse(
         success=True,
@@ -507,7 +431,7 @@ async def check_step_completed(
             - If {{4.found}} = true → Continue
             - Else → Back to [2]
     """
-    step = repo.get_completed_step(run_id, step_name)
+    step = await arepo.get_completed_step(run_id, step_name)
 
     if step:
         return PipelineStepComplete(found=True, step=step)
@@ -526,7 +450,7 @@ async def check_step_completed(
 # ============================================================================
 
 @router.post("/steps/prepare", response_model=StepPrepareResponse)
-async def prepare_steps(request: StepPrepareRequest):
+def prepare_steps(request: StepPrepareRequest):
     """
     Prepare inputs for one or more steps - API BUILDS THE INPUTS
 
@@ -589,382 +513,33 @@ async def prepare_steps(request: StepPrepareRequest):
     if not client:
         raise HTTPException(status_code=404, detail=f"Client not found: {request.client_id}")
 
-    # Prepare each step
-    prepared_steps = []
-    for idx, step_name in enumerate(request.step_names, 1):
-        # Get prompt for this step
-        prompt = repo.get_prompt_by_step(step_name)
-        if not prompt:
+    # ONE query for every completed step - all auto-fetched inputs come from this
+    snapshot = load_run_snapshot(repo, request.run_id)
+
+    # Fetch every prompt in one query - fail before reserving IDs or logging anything
+    prompts = repo.get_prompts_by_steps(request.step_names)
+    for step_name in request.step_names:
+        if step_name not in prompts:
             raise HTTPException(status_code=404, detail=f"Prompt not found for step: {step_name}")
 
-        # Generate step_id (use actual step count from DB to avoid conflicts)
-        existing_steps = repo.client.table('v2_pipeline_logs').select('step_id').eq('run_id', request.run_id).execute()
-        step_num = len(existing_steps.data) + 1
-        step_id = f"STEP_{request.run_id}_{step_num:02d}"
+    # Reserve one step_id per step in a single atomic call (safe for parallel prepares)
+    step_ids = repo.allocate_step_ids(request.run_id, len(request.step_names))
 
-        # Build base input (client config + seed data)
-        step_input = {
-            "current_date": datetime.now().strftime("%Y-%m-%d"),
-            "icp_config_compressed": client.get('icp_config_compressed'),
-            "industry_research_compressed": client.get('industry_research_compressed'),
-            "research_context_compressed": client.get('research_context_compressed'),
-            "client_specific_research": client.get('client_specific_research'),
-            "seed_data": run.get('seed_data'),
-            "dossier_id": request.dossier_id
-        }
+    # Prepare each step
+    prepared_steps = []
+    step_rows = []
+    started_at = datetime.now().isoformat()
+    for step_name, step_id in zip(request.step_names, step_ids):
+        prompt = prompts[step_name]
 
-        # AUTO-FETCH: Get outputs from previous steps that this step depends on
-        # Extract clean content (no metadata) for LLM consumption
-
-        # Signal Discovery needs Search Builder output
-        if step_name == "2_SIGNAL_DISCOVERY":
-            search_output = repo.get_completed_step(request.run_id, "1_SEARCH_BUILDER")
-            if search_output:
-                step_input["search_builder_output"] = extract_clean_content(search_output.get('output'))
-
-        # Entity Research needs Signal Discovery output
-        if step_name == "3_ENTITY_RESEARCH":
-            signal_output = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal_output:
-                step_input["signal_discovery_output"] = extract_clean_content(signal_output.get('output'))
-
-        # Claims extraction needs the previous research/enrich output
-        if "CLAIM" in step_name.upper() or step_name == "CLAIMS_EXTRACTION":
-            # Try to get most recent research/enrich output (could be signal, entity, contact, or enrich steps)
-            for research_step in ["5C_CLIENT_SPECIFIC", "5B_ENRICH_OPPORTUNITY", "5A_ENRICH_LEAD", "4_CONTACT_DISCOVERY", "3_ENTITY_RESEARCH", "2_SIGNAL_DISCOVERY"]:
-                research_output = repo.get_completed_step(request.run_id, research_step)
-                if research_output:
-                    step_input[f"{research_step.lower()}_output"] = extract_clean_content(research_output.get('output'))
-                    break  # Use most recent research/enrich step
-
-        # Context Pack needs ALL claims extracted so far
-        if step_name == "CONTEXT_PACK":
-            # Find all completed claims extraction steps and get their outputs
-            all_claims = []
-
-            # Check for claims from Signal Discovery
-            signal_claims_step = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-            for claims_step in signal_claims_step.data:
-                # Figure out which research step this came from by looking at the input
-                step_input_data = claims_step.get('input', {})
-                claims_output = extract_clean_content(claims_step.get('output'))
-
-                # Add with descriptive key
-                if '2_signal_discovery_output' in step_input_data:
-                    step_input["signal_discovery_claims"] = claims_output
-                elif '3_entity_research_output' in step_input_data:
-                    step_input["entity_research_claims"] = claims_output
-                elif '4_contact_discovery_output' in step_input_data:
-                    step_input["contact_discovery_claims"] = claims_output
-
-        # Enrich steps need signal, entity, contact outputs AND available claims
-        if step_name in ["5A_ENRICH_LEAD", "5B_ENRICH_OPPORTUNITY", "5C_CLIENT_SPECIFIC"]:
-            # Fetch signal discovery output
-            signal_output = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal_output:
-                step_input["signal_discovery_output"] = extract_clean_content(signal_output.get('output'))
-
-            # Fetch entity research output
-            entity_output = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            if entity_output:
-                step_input["entity_research_output"] = extract_clean_content(entity_output.get('output'))
-
-            # Fetch contact discovery output
-            contact_output = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            if contact_output:
-                step_input["contact_discovery_output"] = extract_clean_content(contact_output.get('output'))
-
-            # Add all available claims (signal, entity, contact)
-            all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-            for claims_step in all_claims_steps.data:
-                step_input_data = claims_step.get('input', {})
-                claims_output = extract_clean_content(claims_step.get('output'))
-
-                if '2_signal_discovery_output' in step_input_data:
-                    step_input["signal_discovery_claims"] = claims_output
-                elif '3_entity_research_output' in step_input_data:
-                    step_input["entity_research_claims"] = claims_output
-                elif '4_contact_discovery_output' in step_input_data:
-                    step_input["contact_discovery_claims"] = claims_output
-
-        # Contact Discovery needs Signal Discovery + Entity Research outputs
-        if step_name == "4_CONTACT_DISCOVERY":
-            print(f"[PREPARE 4_CONTACT_DISCOVERY] Fetching dependencies for run {request.run_id}")
-            signal_output = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            print(f"[PREPARE 4_CONTACT_DISCOVERY] 2_SIGNAL_DISCOVERY found: {bool(signal_output)}")
-            if signal_output:
-                step_input["signal_discovery_output"] = extract_clean_content(signal_output.get('output'))
-                print(f"[PREPARE 4_CONTACT_DISCOVERY] Added signal_discovery_output")
-            entity_output = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            print(f"[PREPARE 4_CONTACT_DISCOVERY] 3_ENTITY_RESEARCH found: {bool(entity_output)}")
-            if entity_output:
-                step_input["entity_research_output"] = extract_clean_content(entity_output.get('output'))
-                print(f"[PREPARE 4_CONTACT_DISCOVERY] Added entity_research_output")
-
-        # Insight needs ALL research narratives (not claims)
-        if step_name == "07B_INSIGHT":
-            print(f"[PREPARE 07B_INSIGHT] Fetching research narratives for run {request.run_id}")
-
-            # Fetch all research narratives
-            signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            print(f"[PREPARE 07B_INSIGHT] 2_SIGNAL_DISCOVERY found: {bool(signal)}")
-            if signal:
-                step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-            entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            print(f"[PREPARE 07B_INSIGHT] 3_ENTITY_RESEARCH found: {bool(entity)}")
-            if entity:
-                step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-            contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            print(f"[PREPARE 07B_INSIGHT] 4_CONTACT_DISCOVERY found: {bool(contacts)}")
-            if contacts:
-                step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-            # Enrichment outputs
-            for step, key in [
-                ("5A_ENRICH_LEAD", "enrich_lead_output"),
-                ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-                ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-            ]:
-                output = repo.get_completed_step(request.run_id, step)
-                print(f"[PREPARE 07B_INSIGHT] {step} found: {bool(output)}")
-                if output:
-                    step_input[key] = extract_clean_content(output.get('output'))
-
-        # Dossier Plan needs context pack + ALL individual claims
-        if step_name == "9_DOSSIER_PLAN":
-            context_pack_output = repo.get_completed_step(request.run_id, "CONTEXT_PACK")
-            if context_pack_output:
-                step_input["context_pack"] = extract_clean_content(context_pack_output.get('output'))
-
-            # Pass ALL individual claims (not merged)
-            all_claims = fetch_all_individual_claims(repo, request.run_id)
-            step_input.update(all_claims)
-
-        # Enrich Contacts needs ALL research narratives (V2 pipeline)
-        # CRITICAL: contact_discovery_narrative contains the key_contacts to extract from!
-        if step_name == "6_ENRICH_CONTACTS":
-            # Fetch all research narratives up to this point
-            signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal:
-                step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-            entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            if entity:
-                step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-            # CRITICAL: This contains key_contacts from contact discovery research!
-            contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            if contacts:
-                step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-            # Enrichment outputs that may exist at this point
-            for step, key in [
-                ("5A_ENRICH_LEAD", "enrich_lead_output"),
-                ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-                ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-            ]:
-                output = repo.get_completed_step(request.run_id, step)
-                if output:
-                    step_input[key] = extract_clean_content(output.get('output'))
-
-            # Backwards compatibility: still try old claims method
-            context_pack_output = repo.get_completed_step(request.run_id, "CONTEXT_PACK")
-            if context_pack_output:
-                step_input["context_pack"] = extract_clean_content(context_pack_output.get('output'))
-            all_claims = fetch_all_individual_claims(repo, request.run_id)
-            step_input.update(all_claims)
-
-        # Individual contact enrichment needs ALL research narratives (V2 pipeline)
-        if step_name == "6_ENRICH_CONTACT_INDIVIDUAL":
-            # Fetch all research narratives for context
-            signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal:
-                step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-            entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            if entity:
-                step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-            contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            if contacts:
-                step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-            # Enrichment outputs for context
-            for step, key in [
-                ("5A_ENRICH_LEAD", "enrich_lead_output"),
-                ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-            ]:
-                output = repo.get_completed_step(request.run_id, step)
-                if output:
-                    step_input[key] = extract_clean_content(output.get('output'))
-
-            # Backwards compatibility
-            all_claims = fetch_all_individual_claims(repo, request.run_id)
-            step_input.update(all_claims)
-
-        # Media enrichment needs all research narratives (V2 pipeline)
-        if step_name == "8_MEDIA":
-            # Fetch all research narratives up to this point
-            signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal:
-                signal_data = extract_clean_content(signal.get('output'))
-                step_input["signal_discovery_narrative"] = signal_data
-                # Extract company name and domain from signal discovery
-                if isinstance(signal_data, dict) and 'lead' in signal_data:
-                    step_input["target_company_name"] = signal_data['lead'].get('company_name', '')
-                    step_input["target_company_domain"] = signal_data['lead'].get('company_domain', '')
-
-            entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            if entity:
-                step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-            contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            if contacts:
-                step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-            # Enrichment outputs
-            for step, key in [
-                ("5A_ENRICH_LEAD", "enrich_lead_output"),
-                ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-                ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-                ("6_ENRICH_CONTACTS", "enriched_contacts"),
-                ("07B_INSIGHT", "insight_output")
-            ]:
-                output = repo.get_completed_step(request.run_id, step)
-                if output:
-                    step_input[key] = extract_clean_content(output.get('output'))
-
-            # Backwards compatibility: still try old claims method
-            context_pack_output = repo.get_completed_step(request.run_id, "CONTEXT_PACK")
-            if context_pack_output:
-                step_input["context_pack"] = extract_clean_content(context_pack_output.get('output'))
-            all_claims = fetch_all_individual_claims(repo, request.run_id)
-            step_input.update(all_claims)
-
-        # Copy needs enriched contact data (will be passed via transition or Make.com)
-        # 10A_COPY and 10B_COPY_CLIENT_OVERRIDE auto-fetch handled in transition logic
-
-        # All section writers need: dossier_plan + context_pack + ALL individual claims
-        if step_name in ["10_WRITER_INTRO", "10_WRITER_SIGNALS", "10_WRITER_LEAD_INTELLIGENCE", "10_WRITER_STRATEGY", "10_WRITER_OPPORTUNITY", "10_WRITER_CLIENT_SPECIFIC"]:
-            # Fetch dossier plan
-            dossier_plan_output = repo.get_completed_step(request.run_id, "9_DOSSIER_PLAN")
-            if dossier_plan_output:
-                step_input["dossier_plan"] = extract_clean_content(dossier_plan_output.get('output'))
-
-            # Fetch context pack
-            context_pack_output = repo.get_completed_step(request.run_id, "CONTEXT_PACK")
-            if context_pack_output:
-                step_input["context_pack"] = extract_clean_content(context_pack_output.get('output'))
-
-            # Pass ALL individual claims (not merged)
-            all_claims = fetch_all_individual_claims(repo, request.run_id)
-            step_input.update(all_claims)
-
-        # Dossier Composer needs ALL research narratives (not claims)
-        if step_name == "11_DOSSIER_COMPOSER":
-            # Fetch all research narratives directly
-            signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-            if signal:
-                step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-            entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-            if entity:
-                step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-            contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-            if contacts:
-                step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-            # Enrichment outputs + Insight
-            for step, key in [
-                ("5A_ENRICH_LEAD", "enrich_lead_output"),
-                ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-                ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-                ("07B_INSIGHT", "insight_output"),
-                ("6_ENRICH_CONTACTS", "enriched_contacts")
-            ]:
-                output = repo.get_completed_step(request.run_id, step)
-                if output:
-                    step_input[key] = extract_clean_content(output.get('output'))
-
-            # Try to get pre-calculated lead_score from 5A_ENRICH_LEAD or seed_data
-            # If not available, composer will calculate (fallback)
-            enrich_lead = step_input.get("enrich_lead_output", {})
-            if isinstance(enrich_lead, dict):
-                if enrich_lead.get("lead_score"):
-                    step_input["lead_score"] = enrich_lead["lead_score"]
-                if enrich_lead.get("timing_urgency"):
-                    step_input["timing_urgency"] = enrich_lead["timing_urgency"]
-                if enrich_lead.get("score_explanation"):
-                    step_input["score_explanation"] = enrich_lead["score_explanation"]
-
-            # Fallback to seed_data if available
-            run = repo.get_run(request.run_id)
-            if run:
-                seed = run.get("seed_data", {}) or {}
-                if not step_input.get("lead_score") and seed.get("lead_score"):
-                    step_input["lead_score"] = seed["lead_score"]
-                if not step_input.get("timing_urgency") and seed.get("timing_urgency"):
-                    step_input["timing_urgency"] = seed["timing_urgency"]
-
-        # Merge Claims needs ALL claims including insight claims
-        if step_name == "MERGE_CLAIMS":
-            # Find all completed claims extraction steps
-            all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-            for claims_step in all_claims_steps.data:
-                # Figure out which research step this came from
-                step_input_data = claims_step.get('input', {})
-                claims_output = extract_clean_content(claims_step.get('output'))
-
-                # Add with descriptive key based on which step produced these claims
-                if '2_signal_discovery_output' in step_input_data:
-                    step_input["signal_discovery_claims"] = claims_output
-                elif '3_entity_research_output' in step_input_data:
-                    step_input["entity_research_claims"] = claims_output
-                elif '4_contact_discovery_output' in step_input_data:
-                    step_input["contact_discovery_claims"] = claims_output
-                elif '5a_enrich_lead_output' in step_input_data:
-                    step_input["enrich_lead_claims"] = claims_output
-                elif '5b_enrich_opportunity_output' in step_input_data:
-                    step_input["enrich_opportunity_claims"] = claims_output
-                elif '5c_client_specific_output' in step_input_data:
-                    step_input["client_specific_claims"] = claims_output
-                elif '07b_insight_output' in step_input_data:
-                    step_input["insight_claims"] = claims_output
-
-        # Get model from prompt (defaulting to gpt-4.1)
-        model_map = {
-            "1_SEARCH_BUILDER": "o4-mini",
-            "2_SIGNAL_DISCOVERY": "gpt-4.1",
-            "3_ENTITY_RESEARCH": "o4-mini-deep-research",
-            "4_CONTACT_DISCOVERY": "o4-mini-deep-research",
-            "5A_ENRICH_LEAD": "gpt-4.1",
-            "5B_ENRICH_OPPORTUNITY": "gpt-4.1",
-            "5C_CLIENT_SPECIFIC": "gpt-4.1",
-            "07B_INSIGHT": "gpt-4.1",
-            "MERGE_CLAIMS": "gpt-4.1",
-            "CLAIMS_EXTRACTION": "gpt-4.1",
-            "CONTEXT_PACK": "gpt-4.1",
-            "8_MEDIA": "gpt-5.2",
-            "9_DOSSIER_PLAN": "gpt-4.1",
-            "10_WRITER_INTRO": "gpt-4.1",
-            "10_WRITER_SIGNALS": "gpt-4.1",
-            "10_WRITER_LEAD_INTELLIGENCE": "gpt-4.1",
-            "10_WRITER_STRATEGY": "gpt-4.1",
-            "10_WRITER_OPPORTUNITY": "gpt-4.1",
-            "10_WRITER_CLIENT_SPECIFIC": "gpt-4.1",
-            "6_ENRICH_CONTACTS": "gpt-4.1",
-            "6_ENRICH_CONTACT_INDIVIDUAL": "gpt-4.1",
-            "10A_COPY": "gpt-4.1",
-            "10B_COPY_CLIENT_OVERRIDE": "gpt-4.1",
-            "11_DOSSIER_COMPOSER": "gpt-4.1"  # Make.com can override this
-        }
-        model_used = model_map.get(step_name, "gpt-4.1")
+        # AUTO-FETCH: outputs/claims of the previous steps this step depends on
+        # (see STEP_DEPENDENCIES) - clean content, no metadata
+        step_input = _base_step_input(run, client, request.dossier_id)
+        step_input.update(resolve_step_inputs(step_name, snapshot))
+        add_derived_inputs(step_name, step_input, run, client)
+        print(f"[PREPARE {step_name}] Resolved inputs: {sorted(k for k in step_input if k not in BASE_INPUT_KEYS)}")
+
+        model_used = STEP_MODELS.get(step_name, DEFAULT_MODEL)
 
         prepared_steps.append(PreparedStep(
             step_id=step_id,
@@ -976,8 +551,7 @@ async def prepare_steps(request: StepPrepareRequest):
             input=step_input
         ))
 
-        # Log step as "running" in database
-        repo.create_pipeline_step({
+        step_rows.append({
             "step_id": step_id,
             "run_id": request.run_id,
             "prompt_id": prompt['prompt_id'],
@@ -985,9 +559,15 @@ async def prepare_steps(request: StepPrepareRequest):
             "status": "running",
             "input": step_input,
             "model_used": model_used,
-            "started_at": datetime.now().isoformat()
+            "started_at": started_at
         })
 
+        # Step is being re-run - drop cached outputs of earlier attempts
+        step_cache.invalidate(request.run_id, step_name)
+
+    # Log all steps as "running" in one bulk insert
+    repo.create_pipeline_steps(step_rows)
+
     return StepPrepareResponse(
         run_id=request.run_id,
         steps=prepared_steps
@@ -995,7 +575,7 @@ async def prepare_steps(request: StepPrepareRequest):
 
 
 @router.post("/steps/complete", response_model=StepCompleteResponse)
-async def complete_steps(request: StepCompleteRequest):
+def complete_steps(request: StepCompleteRequest):
     """
     Store outputs for completed steps - JUST PASS THE ENTIRE OPENAI RESPONSE
 
@@ -1046,7 +626,7 @@ async def complete_steps(request: StepCompleteRequest):
         if output_item.step_id:
             result = repo.client.table('v2_pipeline_logs').select('*').eq('step_id', output_item.step_id).eq('run_id', request.run_id).execute()
             if result.data:
-                step = result.data[0]
+                step = hydrate_rows(result.data[:1])[0]
                 print(f"[COMPLETE] Found by step_id: {step['step_id']}")
             else:
                 print(f"[COMPLETE] NOT FOUND by step_id: {output_item.step_id}")
@@ -1061,7 +641,7 @@ async def complete_steps(request: StepCompleteRequest):
                     # WARN if multiple running steps found
                     if len(result.data) > 1:
                         print(f"[COMPLETE] WARNING: Found {len(result.data)} running steps for {output_item.step_name}! Picking first one.")
-                    step = result.data[0]
+                    step = hydrate_rows(result.data[:1])[0]
                     print(f"[COMPLETE] Found running step: {step['step_id']}")
             else:
                 print(f"[COMPLETE] Found completed step: {step['step_id']}")
@@ -1094,7 +674,7 @@ async def complete_steps(request: StepCompleteRequest):
             estimated_cost = calculate_cost(model_used, input_tokens, output_tokens)
 
         # Update step to completed with cost tracking
-        repo.update_pipeline_step(step['step_id'], {
+        step_updates = {
             "status": "completed",
             "output": output_to_store,
             "input_tokens": input_tokens,
@@ -1103,7 +683,13 @@ async def complete_steps(request: StepCompleteRequest):
             "estimated_cost": estimated_cost,
             "runtime_seconds": runtime_seconds,
             "completed_at": datetime.now().isoformat()
-        })
+        }
+        if step.get('step_name') == 'CLAIMS_EXTRACTION':
+            step_updates["source_step"] = detect_claims_source(step.get('input'))
+        repo.update_pipeline_step(step['step_id'], step_updates)
+
+        # Later prepares read this output from the cache instead of Supabase
+        step_cache.put(request.run_id, step['step_name'], step['step_id'], extract_clean_content(output_to_store))
 
         # Increment run totals
         if total_tokens > 0 or estimated_cost > 0:
@@ -1191,7 +777,7 @@ async def complete_steps(request: StepCompleteRequest):
 
 
 @router.post("/steps/transition", response_model=StepTransitionResponse)
-async def transition_step(request: StepTransitionRequest):
+def transition_step(request: StepTransitionRequest):
     """
     STORE PREVIOUS OUTPUT + PREPARE NEXT INPUT - ONE API CALL
 
@@ -1248,7 +834,7 @@ async def transition_step(request: StepTransitionRequest):
 
     # If we found the step, update it to completed with cost tracking
     if result.data:
-        completed_step = result.data[0]
+        completed_step = hydrate_rows(result.data[:1])[0]
 
         # Extract detailed token info and model for cost calculation
         input_tokens = parsed['input_tokens']
@@ -1261,7 +847,7 @@ async def transition_step(request: StepTransitionRequest):
         if model_used and total_tokens > 0:
             estimated_cost = calculate_cost(model_used, input_tokens, output_tokens)
 
-        repo.update_pipeline_step(completed_step['step_id'], {
+        step_updates = {
             "status": "completed",
             "output": parsed['full_output'],
             "input_tokens": input_tokens,
@@ -1270,7 +856,12 @@ async def transition_step(request: StepTransitionRequest):
             "estimated_cost": estimated_cost,
             "runtime_seconds": parsed['runtime_seconds'],
             "completed_at": datetime.now().isoformat()
-        })
+        }
+        # Record which research step the claims came from (read by fetch_all_individual_claims)
+        if completed_step.get('step_name') == 'CLAIMS_EXTRACTION':
+            step_updates["source_step"] = detect_claims_source(completed_step.get('input'))
+        repo.update_pipeline_step(completed_step['step_id'], step_updates)
+        step_cache.put(request.run_id, completed_step['step_name'], completed_step['step_id'], extract_clean_content(parsed['full_output']))
 
         # Increment run totals
         if total_tokens > 0 or estimated_cost > 0:
@@ -1291,294 +882,34 @@ async def transition_step(request: StepTransitionRequest):
     if not prompt:
         raise HTTPException(status_code=404, detail=f"Prompt not found for step: {request.next_step_name}")
 
-    # Generate step_id
-    existing_steps = repo.client.table('v2_pipeline_logs').select('step_id').eq('run_id', request.run_id).execute()
-    step_num = len(existing_steps.data) + 1
-    next_step_id = f"STEP_{request.run_id}_{step_num:02d}"
+    # Reserve step_id atomically
+    next_step_id = repo.allocate_step_ids(request.run_id)[0]
 
-    # Build input
-    step_input = {
-        "current_date": datetime.now().strftime("%Y-%m-%d"),
-        "icp_config_compressed": client.get('icp_config_compressed'),
-        "industry_research_compressed": client.get('industry_research_compressed'),
-        "research_context_compressed": client.get('research_context_compressed'),
-        "client_specific_research": client.get('client_specific_research'),
-        "seed_data": run.get('seed_data'),
-        "dossier_id": request.dossier_id
-    }
-
-    # AUTO-FETCH: Add previous step output based on the transition
+    # AUTO-FETCH: Add previous step outputs based on the transition (see TRANSITION_DEPENDENCIES)
     # Use just-completed output when possible (cleaner than fetching from DB)
     # Extract CLEAN content (no metadata) for next step's input
-
     clean_output = extract_clean_content(request.completed_step_output)
 
-    if request.next_step_name == "2_SIGNAL_DISCOVERY":
-        # Signal Discovery needs Search Builder (just completed)
-        step_input["search_builder_output"] = clean_output
-
-    if request.next_step_name == "CLAIMS_EXTRACTION":
-        # Claims needs the research/enrich/insight output (just completed)
-        if request.completed_step_name in ["3_ENTITY_RESEARCH", "4_CONTACT_DISCOVERY", "2_SIGNAL_DISCOVERY", "5A_ENRICH_LEAD", "5B_ENRICH_OPPORTUNITY", "5C_CLIENT_SPECIFIC", "07B_INSIGHT"]:
-            step_input[f"{request.completed_step_name.lower()}_output"] = clean_output
-
-    if request.next_step_name == "MERGE_CLAIMS":
-        # Merge Claims needs ALL claims including insight claims
-        all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-        for claims_step in all_claims_steps.data:
-            # Figure out which research step this came from
-            step_input_data = claims_step.get('input', {})
-            claims_output = extract_clean_content(claims_step.get('output'))
-
-            # Add with descriptive key
-            if '2_signal_discovery_output' in step_input_data:
-                step_input["signal_discovery_claims"] = claims_output
-            elif '3_entity_research_output' in step_input_data:
-                step_input["entity_research_claims"] = claims_output
-            elif '4_contact_discovery_output' in step_input_data:
-                step_input["contact_discovery_claims"] = claims_output
-            elif '5a_enrich_lead_output' in step_input_data:
-                step_input["enrich_lead_claims"] = claims_output
-            elif '5b_enrich_opportunity_output' in step_input_data:
-                step_input["enrich_opportunity_claims"] = claims_output
-            elif '5c_client_specific_output' in step_input_data:
-                step_input["client_specific_claims"] = claims_output
-            elif '07b_insight_output' in step_input_data:
-                step_input["insight_claims"] = claims_output
-
-    if request.next_step_name == "CONTEXT_PACK":
-        # Context Pack logic depends on what came before it
-        if request.completed_step_name == "MERGE_CLAIMS":
-            # After merge claims, just pass the merged output
-            step_input["merged_claims_output"] = clean_output
-        else:
-            # Legacy: Context pack after individual claims (not in 07B flow)
-            # Context pack needs ALL claims extracted so far, not just the most recent
-            # Find all completed claims extraction steps
-            all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-            for claims_step in all_claims_steps.data:
-                # Figure out which research step this came from
-                step_input_data = claims_step.get('input', {})
-                claims_output = extract_clean_content(claims_step.get('output'))
-
-                # Add with descriptive key
-                if '2_signal_discovery_output' in step_input_data:
-                    step_input["signal_discovery_claims"] = claims_output
-                elif '3_entity_research_output' in step_input_data:
-                    step_input["entity_research_claims"] = claims_output
-                elif '4_contact_discovery_output' in step_input_data:
-                    step_input["contact_discovery_claims"] = claims_output
-
-            # Also add the just-completed claims (in case the above query didn't catch it yet)
-            if request.completed_step_name == "CLAIMS_EXTRACTION":
-                # Need to figure out which research step this came from the transition request
-                # We can look at what we just stored to figure this out
-                # For now, just add it as "latest_claims"
-                step_input["latest_claims"] = clean_output
-
-    if request.next_step_name == "4_CONTACT_DISCOVERY":
-        # Contact discovery needs signal + entity research outputs
-        signal_output = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-        if signal_output:
-            step_input["signal_discovery_output"] = extract_clean_content(signal_output.get('output'))
-        # Entity research just completed - pass as entity_research_output (not context pack)
-        step_input["entity_research_output"] = clean_output
-
-    if request.next_step_name in ["5A_ENRICH_LEAD", "5B_ENRICH_OPPORTUNITY", "5C_CLIENT_SPECIFIC"]:
-        # Enrich steps need signal, entity, contact outputs AND available claims
-        # Fetch signal discovery output
-        signal_output = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-        if signal_output:
-            step_input["signal_discovery_output"] = extract_clean_content(signal_output.get('output'))
-
-        # Fetch entity research output
-        entity_output = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-        if entity_output:
-            step_input["entity_research_output"] = extract_clean_content(entity_output.get('output'))
-
-        # Fetch contact discovery output
-        contact_output = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-        if contact_output:
-            step_input["contact_discovery_output"] = extract_clean_content(contact_output.get('output'))
-
-        # Add all available claims (signal, entity, contact)
-        all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-        for claims_step in all_claims_steps.data:
-            step_input_data = claims_step.get('input', {})
-            claims_output = extract_clean_content(claims_step.get('output'))
-
-            if '2_signal_discovery_output' in step_input_data:
-                step_input["signal_discovery_claims"] = claims_output
-            elif '3_entity_research_output' in step_input_data:
-                step_input["entity_research_claims"] = claims_output
-            elif '4_contact_discovery_output' in step_input_data:
-                step_input["contact_discovery_claims"] = claims_output
-
-    if request.next_step_name == "07B_INSIGHT":
-        # Insight (merge claims) needs ALL claims extracted so far
-        all_claims_steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', request.run_id).eq('step_name', 'CLAIMS_EXTRACTION').eq('status', 'completed').execute()
-
-        for claims_step in all_claims_steps.data:
-            # Figure out which research step this came from
-            step_input_data = claims_step.get('input', {})
-            claims_output = extract_clean_content(claims_step.get('output'))
-
-            # Add with descriptive key
-            if '2_signal_discovery_output' in step_input_data:
-                step_input["signal_discovery_claims"] = claims_output
-            elif '3_entity_research_output' in step_input_data:
-                step_input["entity_research_claims"] = claims_output
-            elif '4_contact_discovery_output' in step_input_data:
-                step_input["contact_discovery_claims"] = claims_output
-            elif '5a_enrich_lead_output' in step_input_data:
-                step_input["enrich_lead_claims"] = claims_output
-            elif '5b_enrich_opportunity_output' in step_input_data:
-                step_input["enrich_opportunity_claims"] = claims_output
-            elif '5c_client_specific_output' in step_input_data:
-                step_input["client_specific_claims"] = claims_output
-
-    # Contact enrichment flow transitions
-    if request.next_step_name == "10A_COPY":
-        # Copy needs enriched contact data (just completed)
-        if request.completed_step_name == "6_ENRICH_CONTACT_INDIVIDUAL":
-            step_input["enriched_contact_data"] = clean_output
-
-    if request.next_step_name == "10B_COPY_CLIENT_OVERRIDE":
-        # Client override copy needs the base copy (just completed)
-        if request.completed_step_name == "10A_COPY":
-            step_input["base_copy"] = clean_output
-
-    if request.next_step_name == "6_ENRICH_CONTACTS":
-        # Enrich contacts needs ALL research narratives (V2 pipeline)
-        # CRITICAL: contact_discovery_narrative contains the key_contacts!
-        signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-        if signal:
-            step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-        entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-        if entity:
-            step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-        # CRITICAL: This contains key_contacts from contact discovery research!
-        contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-        if contacts:
-            step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-        # Enrichment outputs that may exist at this point
-        for step, key in [
-            ("5A_ENRICH_LEAD", "enrich_lead_output"),
-            ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-            ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-        ]:
-            output = repo.get_completed_step(request.run_id, step)
-            if output:
-                step_input[key] = extract_clean_content(output.get('output'))
-
-    if request.next_step_name == "6_ENRICH_CONTACT_INDIVIDUAL":
-        # Individual contact enrichment needs ALL research narratives (V2 pipeline)
-        signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-        if signal:
-            step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-        entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-        if entity:
-            step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-        contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-        if contacts:
-            step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-        # Enrichment outputs for context
-        for step, key in [
-            ("5A_ENRICH_LEAD", "enrich_lead_output"),
-            ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-        ]:
-            output = repo.get_completed_step(request.run_id, step)
-            if output:
-                step_input[key] = extract_clean_content(output.get('output'))
-
-    if request.next_step_name == "11_DOSSIER_COMPOSER":
-        # Dossier composer needs all research narratives and enrichment outputs
-        # Fetch research narratives
-        signal = repo.get_completed_step(request.run_id, "2_SIGNAL_DISCOVERY")
-        if signal:
-            step_input["signal_discovery_narrative"] = extract_clean_content(signal.get('output'))
-
-        entity = repo.get_completed_step(request.run_id, "3_ENTITY_RESEARCH")
-        if entity:
-            step_input["entity_research_narrative"] = extract_clean_content(entity.get('output'))
-
-        contacts = repo.get_completed_step(request.run_id, "4_CONTACT_DISCOVERY")
-        if contacts:
-            step_input["contact_discovery_narrative"] = extract_clean_content(contacts.get('output'))
-
-        # Enrichment outputs + Insight
-        for step, key in [
-            ("5A_ENRICH_LEAD", "enrich_lead_output"),
-            ("5B_ENRICH_OPPORTUNITY", "enrich_opportunity_output"),
-            ("5C_CLIENT_SPECIFIC", "client_specific_output"),
-            ("07B_INSIGHT", "insight_output"),
-            ("6_ENRICH_CONTACTS", "enriched_contacts")
-        ]:
-            output = repo.get_completed_step(request.run_id, step)
-            if output:
-                step_input[key] = extract_clean_content(output.get('output'))
-
-        # Client context for composer prompt
-        step_input["client_name"] = client.get('client_name', '')
-        step_input["client_services"] = client.get('services', client.get('client_services', ''))
-        step_input["client_differentiators"] = client.get('differentiators', client.get('client_differentiators', ''))
-
-        # Pre-calculated scores from enrich_lead
-        enrich_lead = step_input.get("enrich_lead_output", {})
-        if isinstance(enrich_lead, dict):
-            if enrich_lead.get("lead_score"):
-                step_input["lead_score"] = enrich_lead["lead_score"]
-            if enrich_lead.get("timing_urgency"):
-                step_input["timing_urgency"] = enrich_lead["timing_urgency"]
-            if enrich_lead.get("score_explanation"):
-                step_input["score_explanation"] = enrich_lead["score_explanation"]
-
-        # Fallback to seed_data if scores not in enrich_lead
-        seed = run.get("seed_data", {}) or {}
-        if not step_input.get("lead_score") and seed.get("lead_score"):
-            step_input["lead_score"] = seed["lead_score"]
-        if not step_input.get("timing_urgency") and seed.get("timing_urgency"):
-            step_input["timing_urgency"] = seed["timing_urgency"]
-
-    # Get model
-    model_map = {
-        "1_SEARCH_BUILDER": "o4-mini",
-        "2_SIGNAL_DISCOVERY": "gpt-4.1",
-        "3_ENTITY_RESEARCH": "o4-mini-deep-research",
-        "4_CONTACT_DISCOVERY": "o4-mini-deep-research",
-        "5A_ENRICH_LEAD": "gpt-4.1",
-        "5B_ENRICH_OPPORTUNITY": "gpt-4.1",
-        "5C_CLIENT_SPECIFIC": "gpt-4.1",
-        "07B_INSIGHT": "gpt-4.1",
-        "MERGE_CLAIMS": "gpt-4.1",
-        "CLAIMS_EXTRACTION": "gpt-4.1",
-        "CONTEXT_PACK": "gpt-4.1",
-        "8_MEDIA": "gpt-5.2",
-        "9_DOSSIER_PLAN": "gpt-4.1",
-        "10_WRITER_INTRO": "gpt-4.1",
-        "10_WRITER_SIGNALS": "gpt-4.1",
-        "10_WRITER_LEAD_INTELLIGENCE": "gpt-4.1",
-        "10_WRITER_STRATEGY": "gpt-4.1",
-        "10_WRITER_OPPORTUNITY": "gpt-4.1",
-        "10_WRITER_CLIENT_SPECIFIC": "gpt-4.1",
-        "6_ENRICH_CONTACTS": "gpt-4.1",
-        "6_ENRICH_CONTACT_INDIVIDUAL": "gpt-4.1",
-        "10A_COPY": "gpt-4.1",
-        "10B_COPY_CLIENT_OVERRIDE": "gpt-4.1",
-        "11_DOSSIER_COMPOSER": "gpt-4.1"
-    }
-    model_used = model_map.get(request.next_step_name, "gpt-4.1")
+    # Snapshot is loaded AFTER the update above so it includes the just-completed step
+    if needs_snapshot(request.next_step_name, TRANSITION_DEPENDENCIES):
+        snapshot = load_run_snapshot(repo, request.run_id)
+    else:
+        snapshot = RunSnapshot([])
+
+    step_input = _base_step_input(run, client, request.dossier_id)
+    step_input.update(resolve_step_inputs(
+        request.next_step_name,
+        snapshot,
+        graph=TRANSITION_DEPENDENCIES,
+        completed_step=request.completed_step_name,
+        completed_output=clean_output
+    ))
+    add_derived_inputs(request.next_step_name, step_input, run, client)
+
+    model_used = STEP_MODELS.get(request.next_step_name, DEFAULT_MODEL)
 
-    # Log next step as "running"
+    # Log next step as "running" (drop cached outputs of earlier attempts)
+    step_cache.invalidate(request.run_id, request.next_step_name)
     repo.create_pipeline_step({
         "step_id": next_step_id,
         "run_id": request.run_id,
@@ -1626,7 +957,7 @@ STAGE_NAMES = {
 
 
 @router.post("/stages/start", response_model=StageStartResponse)
-async def stage_start(request: StageStartRequest):
+def stage_start(request: StageStartRequest):
     """
     Log the start of a pipeline stage.
 
@@ -1674,7 +1005,7 @@ async def stage_start(request: StageStartRequest):
 
 
 @router.post("/stages/complete", response_model=StageCompleteResponse)
-async def stage_complete(request: StageCompleteRequest):
+def stage_complete(request: StageCompleteRequest):
     """
     Log the completion of a pipeline stage.
 
@@ -1791,7 +1122,7 @@ async def stage_complete(request: StageCompleteRequest):
 @router.get("/contacts/{run_id}")
 async def get_contacts(run_id: str):
     """Get all contacts for a run"""
-    contacts = repo.get_contacts(run_id)
+    contacts = await arepo.get_contacts(run_id)
 
     return {
         "run_id": run_id,
@@ -1810,7 +1141,8 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "columnline-api",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "step_cache": step_cache.stats()
     }
 
 
@@ -1819,7 +1151,7 @@ async def health_check():
 # ============================================================================
 
 @router.post("/batches/start", response_model=BatchStartResponse)
-async def start_batch(request: BatchStartRequest):
+def start_batch(request: BatchStartRequest):
     """
     Start a new batch for generating seed directions.
 
@@ -1876,7 +1208,7 @@ async def start_batch(request: BatchStartRequest):
 
 
 @router.post("/batches/prepare", response_model=BatchPrepareResponse)
-async def prepare_batch(request: BatchPrepareRequest):
+def prepare_batch(request: BatchPrepareRequest):
     """
     Prepare inputs for batch composer LLM call.
 
@@ -1966,7 +1298,7 @@ async def prepare_batch(request: BatchPrepareRequest):
 
 
 @router.post("/batches/complete", response_model=BatchCompleteResponse)
-async def complete_batch(request: BatchCompleteRequest):
+def complete_batch(request: BatchCompleteRequest):
     """
     Complete batch with LLM output containing directions.
 
@@ -2365,7 +1697,7 @@ def assemble_media(step_outputs: dict) -> dict:
 
 
 @router.post("/publish/{run_id}", response_model=PublishResponse)
-async def publish_to_production(run_id: str, request: PublishRequest = None):
+def publish_to_production(run_id: str, request: PublishRequest = None):
     """
     Publish a v2 dossier to production tables.
 
@@ -2395,7 +1727,7 @@ async def publish_to_production(run_id: str, request: PublishRequest = None):
     import traceback
 
     try:
-        return await _publish_to_production_impl(run_id, request)
+        return _publish_to_production_impl(run_id, request)
     except HTTPException:
         raise
     except Exception as e:
@@ -2409,7 +1741,7 @@ async def publish_to_production(run_id: str, request: PublishRequest = None):
         raise HTTPException(status_code=500, detail=f"Publish failed{line_info}: {str(e)}")
 
 
-async def _publish_to_production_impl(run_id: str, request: PublishRequest = None):
+def _publish_to_production_impl(run_id: str, request: PublishRequest = None):
     """Internal implementation of publish_to_production"""
     import uuid
 
@@ -2439,7 +1771,7 @@ async def _publish_to_production_impl(run_id: str, request: PublishRequest = Non
     # 4. Fetch all completed step outputs
     step_outputs = {}
     steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', run_id).eq('status', 'completed').execute()
-    for step in steps.data:
+    for step in hydrate_rows(steps.data):
         step_outputs[step['step_name']] = step
 
     # Validate we have minimum required outputs (either composers OR writers)
@@ -2695,7 +2027,7 @@ async def _publish_to_production_impl(run_id: str, request: PublishRequest = Non
 
     # Also build index-based lookup for reliable matching (names can vary)
     individual_enrichments_by_index = {}
-    for step in individual_steps.data:
+    for step in hydrate_rows(individual_steps.data, fields=('output',)):
         enrichment = extract_clean_content(step.get('output', {}))
         if isinstance(enrichment, dict):
             # Try multiple field name patterns (uppercase from old prompts, lowercase from new)
@@ -2718,7 +2050,7 @@ async def _publish_to_production_impl(run_id: str, request: PublishRequest = Non
         'run_id', run_id
     ).eq('step_name', '10A_COPY').eq('status', 'completed').execute()
 
-    for step in copy_steps.data:
+    for step in hydrate_rows(copy_steps.data, fields=('output',)):
         copy_output = extract_clean_content(step.get('output', {}))
         if isinstance(copy_output, dict):
             copy_outputs = copy_output.get('copy_outputs') or []
@@ -2734,7 +2066,7 @@ async def _publish_to_production_impl(run_id: str, request: PublishRequest = Non
         'run_id', run_id
     ).eq('step_name', '10B_COPY_CLIENT_OVERRIDE').eq('status', 'completed').execute()
 
-    for step in override_steps.data:
+    for step in hydrate_rows(override_steps.data, fields=('output',)):
         copy_output = extract_clean_content(step.get('output', {}))
         if isinstance(copy_output, dict):
             copy_outputs = copy_output.get('copy_outputs') or copy_output.get('override_copy') or []
@@ -3300,7 +2632,7 @@ async def _publish_to_production_impl(run_id: str, request: PublishRequest = Non
 # ============================================================================
 
 @router.delete("/dossiers/{dossier_id}")
-async def delete_production_dossier(dossier_id: str):
+def delete_production_dossier(dossier_id: str):
     """
     Delete a production dossier and its contacts.
 
@@ -3332,7 +2664,7 @@ async def delete_production_dossier(dossier_id: str):
 # ============================================================================
 
 @router.get("/debug/{run_id}")
-async def debug_dump(run_id: str):
+def debug_dump(run_id: str):
     """
     Get a complete debug dump of everything for a run.
 
@@ -3379,9 +2711,9 @@ async def debug_dump(run_id: str):
     dump["v2"]["run"] = run
     dump["summary"]["status"] = run.get("status")
 
-    # 2. Get all v2 pipeline steps with full output
+    # 2. Get all v2 pipeline steps with full output (blob references hydrated)
     steps = repo.client.table('v2_pipeline_logs').select('*').eq('run_id', run_id).order('started_at').execute()
-    dump["v2"]["pipeline_steps"] = steps.data
+    dump["v2"]["pipeline_steps"] = hydrate_rows(steps.data)
     dump["summary"]["v2_steps_completed"] = len([s for s in steps.data if s.get('status') == 'completed'])
 
     # 3. Get v2 contacts (observability)
@@ -3452,7 +2784,7 @@ PREP_STEP_CONFIG = {
 
 
 @router.post("/clients/prep/start", response_model=PrepStartResponse)
-async def start_prep(request: PrepStartRequest):
+def start_prep(request: PrepStartRequest):
     """
     Start config compression for a client.
 
@@ -3505,7 +2837,7 @@ async def start_prep(request: PrepStartRequest):
 
 
 @router.post("/clients/prep/prepare", response_model=PrepPrepareResponse)
-async def prepare_prep_step(request: PrepPrepareRequest):
+def prepare_prep_step(request: PrepPrepareRequest):
     """
     Prepare a compression step with prompt and full config to compress.
 
@@ -3564,7 +2896,7 @@ async def prepare_prep_step(request: PrepPrepareRequest):
 
 
 @router.post("/clients/prep/complete", response_model=PrepCompleteResponse)
-async def complete_prep_step(request: PrepCompleteRequest):
+def complete_prep_step(request: PrepCompleteRequest):
     """
     Complete a compression step and store the compressed config.
 
@@ -3645,7 +2977,7 @@ ONBOARD_STEPS = ["consolidate_intake", "generate_configs"]
 
 
 @router.post("/clients/onboard/start", response_model=OnboardStartResponse)
-async def start_onboarding(request: OnboardStartRequest):
+def start_onboarding(request: OnboardStartRequest):
     """
     Start client onboarding from raw intake data.
 
@@ -3713,7 +3045,7 @@ async def start_onboarding(request: OnboardStartRequest):
 
 
 @router.post("/clients/onboard/prepare", response_model=OnboardPrepareResponse)
-async def prepare_onboarding_step(request: OnboardPrepareRequest):
+def prepare_onboarding_step(request: OnboardPrepareRequest):
     """
     Prepare an onboarding step with prompt and inputs.
 
@@ -3782,7 +3114,7 @@ async def prepare_onboarding_step(request: OnboardPrepareRequest):
 
 
 @router.post("/clients/onboard/complete", response_model=OnboardCompleteResponse)
-async def complete_onboarding_step(request: OnboardCompleteRequest):
+def complete_onboarding_step(request: OnboardCompleteRequest):
     """
     Complete an onboarding step and store results.
 
@@ -0,0 +1,192 @@
+"""
+Step Output Cache
+
+Cleaned step outputs keyed by (run_id, step_name, step_id), so the research
+narratives every later prepare/transition needs aren't re-downloaded from
+Supabase and re-parsed with extract_clean_content() on each call.
+
+- Populated on /steps/complete and /steps/transition (and on snapshot misses)
+- Invalidated for (run_id, step_name) when that step is prepared again
+- LRU + TTL, bounded by total JSON size in bytes, with hit/miss counters
+
+Backends:
+    memory (default)  per-process OrderedDict
+    redis             shared by all uvicorn workers (REDIS_URL, same instance as RQ);
+                      one hash per (run_id, step_name), bounded by TTL only
+
+Environment:
+    COLUMNLINE_STEP_CACHE_BACKEND     memory | redis | off (default memory)
+    COLUMNLINE_STEP_CACHE_MAX_BYTES   memory backend size limit (default 64MB)
+    COLUMNLINE_STEP_CACHE_TTL         seconds an entry lives (default 21600 = 6h)
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+MISSING = object()
+
+
+def _size_of(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class StepOutputCache:
+    """In-memory LRU/TTL cache of cleaned step outputs"""
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 21600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, run_id: str, step_name: str, step_id: str) -> Any:
+        """Cleaned content, or MISSING"""
+        key = (run_id, step_name, step_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, run_id: str, step_name: str, step_id: str, content: Any) -> None:
+        size = _size_of(content)
+        if size > self.max_bytes:
+            return
+
+        key = (run_id, step_name, step_id)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (content, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, run_id: str, step_name: str) -> None:
+        """Forget every cached output of a step in a run (it's being re-run)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == run_id and k[1] == step_name]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions
+        }
+
+
+class RedisStepOutputCache(StepOutputCache):
+    """Same interface, stored in Redis so every API worker shares it"""
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str, ttl_seconds: float = 21600, prefix: str = "columnline:steps"):
+        super().__init__(max_bytes=0, ttl_seconds=ttl_seconds)
+        from redis import Redis
+        self.redis = Redis.from_url(redis_url)
+        self.prefix = prefix
+
+    def _key(self, run_id: str, step_name: str) -> str:
+        return f"{self.prefix}:{run_id}:{step_name}"
+
+    def get(self, run_id: str, step_name: str, step_id: str) -> Any:
+        try:
+            raw = self.redis.hget(self._key(run_id, step_name), step_id)
+        except Exception as e:
+            print(f"[STEP CACHE] Redis get failed: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return json.loads(raw)
+
+    def put(self, run_id: str, step_name: str, step_id: str, content: Any) -> None:
+        key = self._key(run_id, step_name)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, step_id, json.dumps(content, default=str))
+            pipe.expire(key, int(self.ttl_seconds))
+            pipe.execute()
+        except Exception as e:
+            print(f"[STEP CACHE] Redis put failed: {e}")
+
+    def invalidate(self, run_id: str, step_name: str) -> None:
+        try:
+            self.redis.delete(self._key(run_id, step_name))
+        except Exception as e:
+            print(f"[STEP CACHE] Redis invalidate failed: {e}")
+
+    def clear(self) -> None:
+        for key in self.redis.scan_iter(match=f"{self.prefix}:*"):
+            self.redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        for field in ("entries", "bytes", "max_bytes", "evictions"):
+            stats.pop(field)
+        return stats
+
+
+class NullStepOutputCache(StepOutputCache):
+    """Caching disabled - every lookup misses"""
+
+    backend = "off"
+
+    def get(self, run_id: str, step_name: str, step_id: str) -> Any:
+        self.misses += 1
+        return MISSING
+
+    def put(self, run_id: str, step_name: str, step_id: str, content: Any) -> None:
+        pass
+
+
+def _from_env() -> StepOutputCache:
+    backend = os.environ.get("COLUMNLINE_STEP_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("COLUMNLINE_STEP_CACHE_TTL", 21600))
+
+    if backend == "off":
+        return NullStepOutputCache()
+    if backend == "redis":
+        return RedisStepOutputCache(os.environ.get("REDIS_URL", "redis://localhost:6379"), ttl_seconds=ttl)
+    return StepOutputCache(
+        max_bytes=int(os.environ.get("COLUMNLINE_STEP_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        ttl_seconds=ttl
+    )
+
+
+step_cache = _from_env()
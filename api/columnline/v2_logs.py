@@ -5,21 +5,13 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from datetime import datetime
-import os
-from supabase import create_client
+from workers.db import get_supabase
+from workers.blobs import offload_row
+from api.log_queries import list_logs
 
 router = APIRouter()
 
 
-def get_supabase():
-    """Get Supabase client"""
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
-    return create_client(url, key)
-
-
 class StepLogRequest(BaseModel):
     """Request body for logging a step execution"""
     step_name: str
@@ -45,6 +37,7 @@ def log_step(request: StepLogRequest):
     # Build log entry
     log_entry = {
         "worker_name": f"makecom.{request.step_name}",
+        "step_name": request.step_name,
         "automation_slug": request.prompt_id or request.step_name,
         "input": request.input_data or {},
         "output": request.output_data or {},
@@ -61,7 +54,8 @@ def log_step(request: StepLogRequest):
         log_entry["tags"].append(request.model)
     
     # Insert into execution_logs table
-    result = supabase.table("execution_logs").insert(log_entry).execute()
+    # Large input/output values go to the blob store; the row keeps references
+    result = supabase.table("execution_logs").insert(offload_row(log_entry)).execute()
     
     return {
         "log_id": result.data[0]["id"],
@@ -71,45 +65,24 @@ def log_step(request: StepLogRequest):
 
 
 @router.get("/v2/logs/run/{run_id}")
-def get_run_logs(run_id: str, limit: int = 100):
+def get_run_logs(run_id: str, limit: int = 100, fields: Optional[str] = None, cursor: Optional[str] = None):
     """
-    Get all logs for a Make.com run.
-    Uses automation_slug or tags to filter by run_id.
+    Get all logs for a Make.com run, oldest first.
+    Uses automation_slug to filter by run_id.
+
+    Summary columns by default - ?fields=input,output (or fields=all) for the
+    payloads; follow next_cursor with ?cursor= for the next page.
     """
-    supabase = get_supabase()
-    
-    # Query logs by run_id (could be in tags or automation_slug)
-    # For now, match automation_slug (Make.com can pass run_id as automation_slug)
-    # Tags matching would require post-processing
-    query = supabase.table("execution_logs").select("*")
-    query = query.eq("automation_slug", run_id)
-    query = query.order("started_at", desc=False).limit(limit)
-    
-    result = query.execute()
-    
-    return {
-        "run_id": run_id,
-        "logs": result.data,
-        "count": len(result.data),
-    }
+    # Make.com passes its run_id as automation_slug (tags matching would
+    # need post-processing)
+    page = list_logs(lambda query: query.eq("automation_slug", run_id), fields=fields, cursor=cursor, limit=limit, desc=False)
+    return {"run_id": run_id, **page}
 
 
 @router.get("/v2/logs/step/{step_name}")
-def get_step_logs(step_name: str, limit: int = 50):
+def get_step_logs(step_name: str, limit: int = 50, fields: Optional[str] = None, cursor: Optional[str] = None):
     """
-    Get recent logs for a specific step.
+    Get recent logs for a specific step (exact step_name match, newest first).
     """
-    supabase = get_supabase()
-    
-    query = supabase.table("execution_logs").select("*")
-    query = query.ilike("worker_name", f"%{step_name}%")
-    query = query.order("started_at", desc=True).limit(limit)
-    
-    result = query.execute()
-    
-    return {
-        "step_name": step_name,
-        "logs": result.data,
-        "count": len(result.data),
-    }
-
+    page = list_logs(lambda query: query.eq("step_name", step_name), fields=fields, cursor=cursor, limit=limit)
+    return {"step_name": step_name, **page}
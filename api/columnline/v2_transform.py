@@ -4,7 +4,7 @@ Transformation endpoints for Make.com integration
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-from workers.ai import prompt
+from workers.ai import prompt_async
 from workers.logger import ExecutionLogger
 
 router = APIRouter()
@@ -28,14 +28,14 @@ class ContextPackRequest(BaseModel):
 
 
 @router.post("/v2/transform/claims-extract")
-def extract_claims(request: ClaimsExtractRequest):
+async def extract_claims(request: ClaimsExtractRequest):
     """
     Extract atomic claims from narrative research output.
     Uses the claims-extraction prompt to parse narrative into structured claims.
     """
     try:
         # Call claims extraction prompt
-        result = prompt(
+        result = await prompt_async(
             name="claims-extraction",
             variables={
                 "narrative": request.narrative,
@@ -77,7 +77,7 @@ def extract_claims(request: ClaimsExtractRequest):
 
 
 @router.post("/v2/transform/context-pack")
-def build_context_pack(request: ContextPackRequest):
+async def build_context_pack(request: ContextPackRequest):
     """
     Build a context pack from merged claims.
     Uses the context-pack prompt to create a focused summary for downstream steps.
@@ -87,7 +87,7 @@ def build_context_pack(request: ContextPackRequest):
         from datetime import datetime
         
         # Call context pack prompt
-        result = prompt(
+        result = await prompt_async(
             name="context-pack",
             variables={
                 "merged_claims": json.dumps(request.merged_claims, indent=2),
@@ -0,0 +1,306 @@
+"""
+Job Endpoints
+=============
+Submit, list and follow RQ jobs.
+
+    POST /jobs                  enqueue one of JOB_FUNCTIONS
+    GET  /jobs                  list jobs (?status=queued|started|finished|failed|...)
+    GET  /jobs/{id}             status, progress (job meta), result or error
+    GET  /jobs/{id}/stream      Server-Sent Events from the job's event stream
+    POST /run                   enqueue run_automation for a slug
+
+The stream replays the job's history from its Redis Stream
+(workers/job_events.py), then follows it with a blocking XREAD, so a
+dashboard neither polls nor misses what happened before it connected. Every
+SSE event carries its stream entry id; a reconnecting EventSource sends it
+back as Last-Event-ID (or pass ?last_id=) and the stream resumes right after
+it. The response ends after a "finished"/"failed" event. If the job ended
+without one (worker killed, stream expired), the job's final status is sent
+as the terminal event instead.
+
+Only the functions in JOB_FUNCTIONS can be submitted - the API never imports
+or enqueues an arbitrary path from a request.
+
+Environment:
+    JOBS_TIMEOUT          RQ job timeout for submitted jobs (default 1h)
+    JOBS_RESULT_TTL       seconds a finished job's result is kept (default 86400)
+    JOBS_HEARTBEAT        seconds between SSE keep-alive comments (default 15)
+"""
+
+import os
+import json
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from workers import job_events
+
+router = APIRouter()
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
+JOB_TIMEOUT = os.environ.get("JOBS_TIMEOUT", "1h")
+RESULT_TTL = int(os.environ.get("JOBS_RESULT_TTL", 86400))
+HEARTBEAT = float(os.environ.get("JOBS_HEARTBEAT", 15))
+
+# name -> import path RQ runs
+JOB_FUNCTIONS = {
+    "research.entity_research": "workers.research.entity_research.run_entity_research",
+    "automations.run": "workers.runner.run_automation",
+}
+
+STATUSES = ("queued", "started", "finished", "failed", "deferred", "scheduled", "canceled")
+FINAL_STATUSES = ("finished", "failed", "stopped", "canceled")
+MAX_LIMIT = 200
+
+_redis = None
+_async_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        from redis import Redis
+        _redis = Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def get_async_redis():
+    global _async_redis
+    if _async_redis is None:
+        from redis.asyncio import Redis
+        _async_redis = Redis.from_url(REDIS_URL)
+    return _async_redis
+
+
+def enqueue(name: str, kwargs: Dict[str, Any], queue: str = "default", description: Optional[str] = None) -> dict:
+    """Enqueue a JOB_FUNCTIONS job with terminal-event callbacks and record its "queued" event."""
+    from rq import Queue
+    from rq.job import Callback
+
+    if name not in JOB_FUNCTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown function: {name} (allowed: {', '.join(JOB_FUNCTIONS)})")
+
+    redis = get_redis()
+    job = Queue(queue, connection=redis).enqueue(
+        JOB_FUNCTIONS[name],
+        kwargs=kwargs,
+        job_timeout=JOB_TIMEOUT,
+        result_ttl=RESULT_TTL,
+        failure_ttl=RESULT_TTL,
+        description=description or name,
+        meta={"function": name},
+        on_success=Callback(job_events.on_success),
+        on_failure=Callback(job_events.on_failure),
+    )
+    job_events.publish(redis, job.id, "queued", {"status": "queued", "function": name, "queue": queue})
+
+    return {
+        "job_id": job.id,
+        "status": "queued",
+        "function": name,
+        "queue": queue,
+        "status_url": f"/jobs/{job.id}",
+        "stream_url": f"/jobs/{job.id}/stream",
+    }
+
+
+def fetch_job(job_id: str):
+    from rq.job import Job
+    from rq.exceptions import NoSuchJobError
+
+    try:
+        return Job.fetch(job_id, connection=get_redis())
+    except NoSuchJobError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def job_summary(job) -> dict:
+    meta = job.meta or {}
+    return {
+        "id": job.id,
+        "status": job.get_status(refresh=False),
+        "function": meta.get("function") or job.func_name,
+        "description": job.description,
+        "queue": job.origin,
+        "enqueued_at": _iso(job.enqueued_at),
+        "started_at": _iso(job.started_at),
+        "ended_at": _iso(job.ended_at),
+        "message": meta.get("message"),
+        "percent": meta.get("percent"),
+    }
+
+
+# =============================================================================
+# Submit / list / status
+# =============================================================================
+
+class JobRequest(BaseModel):
+    function: str
+    params: Optional[dict] = None
+    queue: str = "default"
+    description: Optional[str] = None
+
+
+class RunRequest(BaseModel):
+    slug: str
+    override_config: Optional[dict] = None
+    queue: str = "default"
+
+
+@router.post("/jobs")
+def submit_job(request: JobRequest):
+    """Submit a job (function is a JOB_FUNCTIONS name, e.g. research.entity_research)."""
+    return enqueue(request.function, request.params or {}, request.queue, request.description)
+
+
+@router.post("/run")
+def run_automation_job(request: RunRequest):
+    """Run an automation by slug in the background."""
+    return enqueue(
+        "automations.run",
+        {"slug": request.slug, "override_config": request.override_config},
+        request.queue,
+        description=f"run {request.slug}",
+    )
+
+
+def _job_ids(status: str, queue, limit: int) -> List[str]:
+    """Newest job ids with this status (registries are ordered oldest first)."""
+    from rq.registry import (
+        StartedJobRegistry, FinishedJobRegistry, FailedJobRegistry,
+        DeferredJobRegistry, ScheduledJobRegistry, CanceledJobRegistry,
+    )
+
+    if status == "queued":
+        return list(reversed(queue.get_job_ids(max(0, queue.count - limit))))
+    registry = {
+        "started": StartedJobRegistry,
+        "finished": FinishedJobRegistry,
+        "failed": FailedJobRegistry,
+        "deferred": DeferredJobRegistry,
+        "scheduled": ScheduledJobRegistry,
+        "canceled": CanceledJobRegistry,
+    }[status](queue=queue)
+    return list(reversed(registry.get_job_ids(-limit, -1)))
+
+
+@router.get("/jobs")
+def list_jobs(status: Optional[str] = None, queue: str = "default", limit: int = 50):
+    """List jobs, newest first (all statuses unless status= is given)."""
+    from rq import Queue
+    from rq.job import Job
+
+    if status and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {status} (allowed: {', '.join(STATUSES)})")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    redis = get_redis()
+    rq_queue = Queue(queue, connection=redis)
+    ids = []
+    for name in ([status] if status else STATUSES):
+        ids.extend(_job_ids(name, rq_queue, limit))
+
+    jobs = [job_summary(job) for job in Job.fetch_many(list(dict.fromkeys(ids)), connection=redis) if job]
+    jobs.sort(key=lambda job: job["enqueued_at"] or "", reverse=True)
+    jobs = jobs[:limit]
+
+    return {"jobs": jobs, "count": len(jobs), "queue": queue}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status, full progress meta, and the result or error."""
+    job = fetch_job(job_id)
+    status = job.get_status()
+
+    response = job_summary(job)
+    response.update({
+        "status": status,
+        "progress": job.meta or {},
+        "result": job.return_value() if status == "finished" else None,
+        "error": job.exc_info if status == "failed" else None,
+        "stream_url": f"/jobs/{job.id}/stream",
+    })
+    return response
+
+
+# =============================================================================
+# SSE stream
+# =============================================================================
+
+def _sse(event_id: Optional[str], event_type: str, data: Any) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _final_status(job_id: str) -> Optional[dict]:
+    """The job's status if it has ended (None while it's queued or running)."""
+    from rq.job import Job
+    from rq.exceptions import NoSuchJobError
+
+    try:
+        job = Job.fetch(job_id, connection=get_redis())
+    except NoSuchJobError:
+        return {"status": "expired"}
+    status = job.get_status(refresh=False)
+    if status not in FINAL_STATUSES:
+        return None
+    return {"status": status, "error": job.exc_info if status == "failed" else None}
+
+
+async def stream_events(job_id: str, last_id: str):
+    redis = get_async_redis()
+    key = job_events.stream_key(job_id)
+    yield "retry: 3000\n\n"
+
+    if last_id == "$":
+        # Only new events - pin "$" to the current last entry so nothing
+        # published between two reads is skipped
+        latest = await redis.xrevrange(key, count=1)
+        last_id = job_events.decode(*latest[0])[0] if latest else "0-0"
+
+    while True:
+        response = await redis.xread({key: last_id}, count=100, block=int(HEARTBEAT * 1000))
+        entries = [job_events.decode(event_id, fields) for _, items in response or [] for event_id, fields in items]
+
+        for event_id, event in entries:
+            last_id = event_id
+            yield _sse(event_id, event["type"], {**event["data"], "at": event["at"]})
+            if job_events.is_terminal(event):
+                return
+
+        if not entries:
+            # Nothing new - make sure the job hasn't ended without a terminal event
+            final = await asyncio.to_thread(_final_status, job_id)
+            if final and not await redis.xread({key: last_id}, count=1):
+                yield _sse(None, "failed" if final["status"] != "finished" else "finished", final)
+                return
+            yield ": keep-alive\n\n"
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, last_id: Optional[str] = None, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events for a job: its history, then live events until it ends.
+
+    Resumes after Last-Event-ID (sent by EventSource on reconnect) or
+    ?last_id=; "$" skips the history.
+    """
+    await asyncio.to_thread(fetch_job, job_id)
+
+    return StreamingResponse(
+        stream_events(job_id, last_event_id or last_id or "0"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
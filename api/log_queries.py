@@ -0,0 +1,123 @@
+"""
+Log List Queries
+================
+Shared query builder for the execution_logs list endpoints (/logs,
+/v2/logs/run/{run_id}, /v2/logs/step/{step_name}).
+
+- Projection: lists return SUMMARY_FIELDS by default. input/output/error/
+  metadata (the large JSON columns) only come back when asked for with
+  fields=, e.g. ?fields=status,runtime_seconds,output - and only then are
+  blob references hydrated (workers/blobs.py).
+- Keyset pagination on (started_at, id): every page returns next_cursor,
+  an opaque token for the last row; ?cursor= continues after it. Each page
+  is an index range scan, however deep into the table it is.
+- step_name is an exact-match, indexed column (migration 011) instead of
+  ilike '%name%' on worker_name, which scanned every row.
+
+Usage:
+    page = list_logs(lambda q: q.eq("step_name", "1_SEARCH_BUILDER"), fields=fields, cursor=cursor)
+    # {"logs": [...], "count": 20, "next_cursor": "..." or None}
+"""
+
+import json
+import base64
+import binascii
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from workers.db import get_supabase
+from workers.blobs import hydrate_rows
+
+
+SUMMARY_FIELDS = (
+    "id", "started_at", "completed_at", "status", "worker_name", "step_name",
+    "automation_slug", "runtime_seconds", "notes", "tags",
+)
+DETAIL_FIELDS = ("input", "output", "error", "metadata")
+ALL_FIELDS = SUMMARY_FIELDS + DETAIL_FIELDS
+CURSOR_FIELDS = ("started_at", "id")
+MAX_LIMIT = 500
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Columns for a fields= parameter (summary by default, "all" for everything)."""
+    if not fields:
+        return list(SUMMARY_FIELDS)
+    if fields.strip() in ("*", "all"):
+        return list(ALL_FIELDS)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in ALL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(ALL_FIELDS)})")
+
+    # The cursor needs started_at and id in every row
+    return list(dict.fromkeys([*CURSOR_FIELDS, *requested]))
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["started_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[str]:
+    try:
+        started_at, log_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return [str(started_at), str(log_id)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(query, cursor: str, desc: bool = True):
+    """Rows strictly after the cursor row in (started_at, id) order."""
+    started_at, log_id = decode_cursor(cursor)
+    op = "lt" if desc else "gt"
+    # postgrest-py 0.13 (supabase 2.3) has no or_() - add the or= param directly
+    query.params = query.params.add(
+        "or", f'(started_at.{op}."{started_at}",and(started_at.eq."{started_at}",id.{op}.{log_id}))'
+    )
+    return query
+
+
+def list_logs(
+    where: Callable = lambda query: query,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    desc: bool = True,
+    table: str = "execution_logs"
+) -> Dict[str, Any]:
+    """
+    One keyset page of logs.
+
+    Args:
+        where: Applies the endpoint's filters to the query
+        fields: Comma-separated columns (default SUMMARY_FIELDS)
+        cursor: next_cursor of the previous page
+        limit: Page size (capped at MAX_LIMIT)
+        desc: Newest first (default) or oldest first
+    """
+    columns = parse_fields(fields)
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    query = where(get_supabase().table(table).select(", ".join(columns)))
+    if cursor:
+        query = after_cursor(query, cursor, desc)
+    # One order param "started_at.desc,id.desc" - postgrest-py would send two
+    # separate order params for two .order() calls
+    query = query.order(f"started_at{'.desc' if desc else ''},id", desc=desc).limit(limit + 1)
+
+    rows = query.execute().data
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    offloaded = [field for field in ("input", "output") if field in columns]
+    if offloaded:
+        hydrate_rows(rows, fields=offloaded)
+
+    return {
+        "logs": rows,
+        "count": len(rows),
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
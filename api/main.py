@@ -11,6 +11,10 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from workers.db import get_supabase, pool_stats, ping
+from workers.blobs import hydrate_rows
+from api.log_queries import list_logs
+
 app = FastAPI(title="Automations API")
 
 # CORS middleware for dashboard
@@ -41,6 +45,10 @@ app.include_router(transform_router)
 from api.columnline import router as columnline_router
 app.include_router(columnline_router)
 
+# Job submission, status and SSE progress streams (/jobs, /run)
+from api.jobs import router as jobs_router
+app.include_router(jobs_router)
+
 
 class PromptRequest(BaseModel):
     prompt_name: str
@@ -62,7 +70,14 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    """Service health plus Supabase connection pool metrics."""
+    database = ping()
+    return {
+        "status": "healthy" if database["status"] == "connected" else "degraded",
+        "timestamp": datetime.now().isoformat(),
+        "database": database,
+        "supabase_pool": pool_stats(),
+    }
 
 
 @app.get("/prompts")
@@ -78,9 +93,9 @@ def list_prompts():
 
 
 @app.post("/test/prompt")
-def test_prompt(request: PromptRequest):
+async def test_prompt(request: PromptRequest):
     """Test a prompt with full logging to Supabase."""
-    from workers.ai import prompt, DEEP_RESEARCH_MODELS
+    from workers.ai import prompt_async, DEEP_RESEARCH_MODELS
 
     try:
         is_deep_research = (
@@ -99,7 +114,7 @@ def test_prompt(request: PromptRequest):
         tags = request.tags or []
         tags.extend(["api", request.model, request.prompt_name])
 
-        result = prompt(
+        result = await prompt_async(
             name=request.prompt_name,
             variables=request.variables,
             model=request.model,
@@ -125,9 +140,9 @@ def test_prompt(request: PromptRequest):
 
 
 @app.post("/research/start")
-def start_research(request: PromptRequest):
+async def start_research(request: PromptRequest):
     """Start deep research in background mode."""
-    from workers.ai import prompt
+    from workers.ai import prompt_async
 
     try:
         if not request.model.startswith("o"):
@@ -136,7 +151,7 @@ def start_research(request: PromptRequest):
         tags = request.tags or []
         tags.extend(["api", "research", request.model, request.prompt_name])
 
-        result = prompt(
+        result = await prompt_async(
             name=request.prompt_name,
             variables=request.variables,
             model=request.model,
@@ -155,58 +170,61 @@ def start_research(request: PromptRequest):
 
 
 @app.post("/research/poll")
-def poll_research(request: ResearchPollRequest):
+async def poll_research(request: ResearchPollRequest):
     """Poll for deep research completion."""
-    from workers.ai import poll_research as poll_fn
+    from workers.ai import poll_research_async
 
     try:
-        result = poll_fn(request.response_id)
+        result = await poll_research_async(request.response_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/logs")
-def get_logs(limit: int = 20, status: Optional[str] = None, prompt_name: Optional[str] = None):
-    """View recent execution logs."""
-    from supabase import create_client
-
-    supabase = create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-    )
+def get_logs(
+    limit: int = 20,
+    status: Optional[str] = None,
+    step_name: Optional[str] = None,
+    prompt_name: Optional[str] = None,
+    worker_name: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """
+    View recent execution logs (newest first).
 
-    query = supabase.table("execution_logs").select("*").order("started_at", desc=True).limit(limit)
+    Summary columns by default - add ?fields=output,... (or fields=all) for
+    the JSON columns. Pass the returned next_cursor as ?cursor= for the next
+    page. step_name (or its old alias prompt_name) and worker_name are exact
+    matches.
+    """
+    step_name = step_name or prompt_name
 
-    if status:
-        query = query.eq("status", status)
-    if prompt_name:
-        query = query.ilike("worker_name", f"%{prompt_name}%")
+    def where(query):
+        if status:
+            query = query.eq("status", status)
+        if step_name:
+            query = query.eq("step_name", step_name)
+        if worker_name:
+            query = query.eq("worker_name", worker_name)
+        return query
 
-    result = query.execute()
-
-    return {
-        "logs": result.data,
-        "count": len(result.data)
-    }
+    return list_logs(where, fields=fields, cursor=cursor, limit=limit)
 
 
 @app.get("/logs/{log_id}")
 def get_log(log_id: str):
     """Get a specific log entry with full input/output."""
-    from supabase import create_client
-
-    supabase = create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-    )
+    supabase = get_supabase()
 
     result = supabase.table("execution_logs").select("*").eq("id", log_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Log not found")
 
-    return result.data[0]
+    # Large input/output values are stored as blob references - put them back
+    return hydrate_rows(result.data)[0]
 
 
 @app.get("/workers")
@@ -222,6 +240,27 @@ def list_workers():
     }
 
 
+@app.get("/workers/templates")
+def worker_templates():
+    """
+    Discovered automation templates, plus what each warm RQ worker
+    (workers/worker.py) loaded at startup and how long each import took.
+    """
+    from workers.template_registry import templates
+
+    workers = {}
+    try:
+        import json
+        from redis import Redis
+        redis = Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+        for key in redis.scan_iter(match="template_registry:*"):
+            workers[key.decode().split(":", 1)[1]] = json.loads(redis.get(key) or "{}")
+    except Exception as e:
+        workers = {"error": str(e)}
+
+    return {"templates": templates.names(), "workers": workers}
+
+
 # =============================================================================
 # AUTOMATION REGISTRY ENDPOINTS
 # =============================================================================
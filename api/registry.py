@@ -6,22 +6,14 @@ Claude's interface for managing the automation catalog.
 Query, create, update, and run automations from a single API.
 """
 
-import os
 from datetime import datetime
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from supabase import create_client, Client
+from workers.db import get_supabase
 
 router = APIRouter(prefix="/registry", tags=["Registry"])
 
-# Supabase client
-def get_supabase() -> Client:
-    return create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-    )
-
 
 # =============================================================================
 # Models
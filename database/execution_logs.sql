@@ -10,6 +10,7 @@ CREATE TABLE execution_logs (
     -- What ran
     automation_slug VARCHAR(200),          -- Reference to automation (optional)
     worker_name VARCHAR(200),              -- e.g., "scrapers.permits", "research.entity"
+    step_name VARCHAR(200),                -- prompt / Make.com step name (exact-match filter, migration 011)
     
     -- Timing
     started_at TIMESTAMPTZ DEFAULT NOW(),
@@ -34,7 +35,9 @@ CREATE TABLE execution_logs (
 CREATE INDEX idx_logs_automation ON execution_logs(automation_slug);
 CREATE INDEX idx_logs_worker ON execution_logs(worker_name);
 CREATE INDEX idx_logs_status ON execution_logs(status);
-CREATE INDEX idx_logs_started ON execution_logs(started_at DESC);
+CREATE INDEX idx_logs_started ON execution_logs(started_at DESC, id DESC);
+CREATE INDEX idx_logs_step_started ON execution_logs(step_name, started_at DESC, id DESC);
+CREATE INDEX idx_logs_automation_started ON execution_logs(automation_slug, started_at, id);
 CREATE INDEX idx_logs_tags ON execution_logs USING GIN(tags);
 
 -- =============================================================================
@@ -0,0 +1,31 @@
+-- =============================================================================
+-- Migration: 005_pipeline_logs_source_step.sql
+-- Purpose: Record which research step a CLAIMS_EXTRACTION row was extracted from
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- 1. Explicit source column (written by /steps/complete and /steps/transition)
+-- Previously the source was inferred by scanning input for keys like
+-- '2_signal_discovery_output', which forced every reader to fetch input JSONB.
+ALTER TABLE v2_pipeline_logs
+ADD COLUMN IF NOT EXISTS source_step TEXT;
+
+COMMENT ON COLUMN v2_pipeline_logs.source_step IS 'For CLAIMS_EXTRACTION rows: research step the claims came from (e.g. 2_SIGNAL_DISCOVERY)';
+
+-- 2. Backfill existing claims rows from their input keys
+UPDATE v2_pipeline_logs
+SET source_step = CASE
+    WHEN input ? '2_signal_discovery_output' THEN '2_SIGNAL_DISCOVERY'
+    WHEN input ? '3_entity_research_output' THEN '3_ENTITY_RESEARCH'
+    WHEN input ? '4_contact_discovery_output' THEN '4_CONTACT_DISCOVERY'
+    WHEN input ? '5a_enrich_lead_output' THEN '5A_ENRICH_LEAD'
+    WHEN input ? '5b_enrich_opportunity_output' THEN '5B_ENRICH_OPPORTUNITY'
+    WHEN input ? '5c_client_specific_output' THEN '5C_CLIENT_SPECIFIC'
+    WHEN input ? '07b_insight_output' THEN '07B_INSIGHT'
+END
+WHERE step_name = 'CLAIMS_EXTRACTION'
+  AND source_step IS NULL;
+
+-- 3. Claims/narrative lookups filter by run + step_name + status
+CREATE INDEX IF NOT EXISTS idx_v2_pipeline_logs_run_step_status
+ON v2_pipeline_logs(run_id, step_name, status);
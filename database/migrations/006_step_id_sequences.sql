@@ -0,0 +1,47 @@
+-- =============================================================================
+-- Migration: 006_step_id_sequences.sql
+-- Purpose: Atomic per-run step number allocation for v2_pipeline_logs step_ids
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- /steps/prepare and /steps/transition used to count every v2_pipeline_logs
+-- row of the run and use count+1, which raced when Make.com fired parallel
+-- prepares (duplicate STEP_{run_id}_NN ids). Each run now has a counter that
+-- is bumped atomically; N steps reserve N numbers in one round trip.
+
+-- 1. Last allocated step number per run
+CREATE TABLE IF NOT EXISTS v2_run_step_sequences (
+    run_id TEXT PRIMARY KEY,
+    last_step INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE v2_run_step_sequences IS 'Per-run step number counter used to build STEP_{run_id}_NN ids (see allocate_step_ids)';
+
+-- 2. Reserve p_count consecutive step numbers, returns them in order
+-- First call for a run seeds the counter from the rows already logged, so
+-- runs started before this migration keep numbering where they left off.
+CREATE OR REPLACE FUNCTION allocate_step_ids(p_run_id TEXT, p_count INTEGER DEFAULT 1)
+RETURNS SETOF INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_last INTEGER;
+BEGIN
+    IF p_count < 1 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO v2_run_step_sequences (run_id, last_step)
+    VALUES (
+        p_run_id,
+        (SELECT COUNT(*) FROM v2_pipeline_logs WHERE run_id = p_run_id) + p_count
+    )
+    ON CONFLICT (run_id) DO UPDATE
+        SET last_step = v2_run_step_sequences.last_step + p_count,
+            updated_at = NOW()
+    RETURNING last_step INTO v_last;
+
+    RETURN QUERY SELECT generate_series(v_last - p_count + 1, v_last);
+END;
+$$;
@@ -0,0 +1,31 @@
+-- =============================================================================
+-- Migration: 007_v2_prompts_updated_at.sql
+-- Purpose: Reliable change stamp on v2_prompts for the API prompt registry cache
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- The API caches v2_prompts in memory and reloads when any row's
+-- (prompt_id, updated_at, current_version) changes. Make sure both columns
+-- exist and updated_at moves on every edit, including version bumps.
+
+ALTER TABLE v2_prompts
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW(),
+ADD COLUMN IF NOT EXISTS current_version INTEGER DEFAULT 1;
+
+COMMENT ON COLUMN v2_prompts.updated_at IS 'Last update time (maintained by trigger; API prompt cache invalidates on change)';
+COMMENT ON COLUMN v2_prompts.current_version IS 'Active v2_prompt_versions.version_number';
+
+CREATE OR REPLACE FUNCTION update_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_v2_prompts_updated ON v2_prompts;
+
+CREATE TRIGGER trigger_v2_prompts_updated
+BEFORE UPDATE ON v2_prompts
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at();
@@ -0,0 +1,35 @@
+-- =============================================================================
+-- Migration: 008_incremental_ingestion.sql
+-- Purpose: Per-automation cursor and seen-record index for incremental scrapers
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- Scrapers used to re-download and re-emit their whole result set on every
+-- run (records_new was just len(records)). Each successful run now stores a
+-- high-water mark (e.g. max edit date / objectId) that the next run starts
+-- from, and every emitted record is remembered by key + content hash so only
+-- new or changed records come out again.
+
+-- 1. Cursor for the next run (template-specific JSON, e.g.
+--    {"edit_date_field": "EditDate", "max_edit_date": 1718000000000, "max_object_id": 48213})
+ALTER TABLE automation_runs
+ADD COLUMN IF NOT EXISTS cursor JSONB;
+
+COMMENT ON COLUMN automation_runs.cursor IS 'High-water mark written by the template; passed to the next run of the automation';
+
+-- Latest successful run with a cursor, per automation
+CREATE INDEX IF NOT EXISTS idx_runs_automation_cursor
+ON automation_runs(automation_id, started_at DESC)
+WHERE status = 'success' AND cursor IS NOT NULL;
+
+-- 2. Records already emitted, per automation
+CREATE TABLE IF NOT EXISTS automation_seen_records (
+    automation_id UUID NOT NULL REFERENCES automations(id) ON DELETE CASCADE,
+    record_key TEXT NOT NULL,            -- sha1 of (case_number, jurisdiction)
+    content_hash TEXT NOT NULL,          -- sha1 of the emitted record
+    first_seen_at TIMESTAMPTZ DEFAULT NOW(),
+    last_seen_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (automation_id, record_key)
+);
+
+COMMENT ON TABLE automation_seen_records IS 'Seen-record index for incremental scrapers (see workers/seen_index.py)';
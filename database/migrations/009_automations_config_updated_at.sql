@@ -0,0 +1,36 @@
+-- =============================================================================
+-- Migration: 009_automations_config_updated_at.sql
+-- Purpose: Change stamp for an automation's definition (for the runner's config cache)
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- run_automation caches automation rows by slug and, once the TTL is up,
+-- only re-checks a change stamp before reusing them. automations.updated_at
+-- can't be that stamp: update_automation_stats() touches the row after every
+-- run, so it changes constantly. config_updated_at only moves when a column
+-- the runner uses changes.
+
+ALTER TABLE automations
+ADD COLUMN IF NOT EXISTS config_updated_at TIMESTAMPTZ DEFAULT NOW();
+
+COMMENT ON COLUMN automations.config_updated_at IS 'Last change to template/config/geography/status (maintained by trigger; runner config cache invalidates on change)';
+
+CREATE OR REPLACE FUNCTION update_automation_config_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.template IS DISTINCT FROM OLD.template
+       OR NEW.config IS DISTINCT FROM OLD.config
+       OR NEW.geography IS DISTINCT FROM OLD.geography
+       OR NEW.status IS DISTINCT FROM OLD.status
+       OR NEW.name IS DISTINCT FROM OLD.name THEN
+        NEW.config_updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_automations_config_updated ON automations;
+CREATE TRIGGER trigger_automations_config_updated
+BEFORE UPDATE ON automations
+FOR EACH ROW
+EXECUTE FUNCTION update_automation_config_updated_at();
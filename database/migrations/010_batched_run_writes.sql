@@ -0,0 +1,45 @@
+-- =============================================================================
+-- Migration: 010_batched_run_writes.sql
+-- Purpose: Keep automation stats right when run rows are written in bulk upserts
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- The runner now buffers automation_runs rows and writes them with bulk
+-- upserts (workers/run_writer.py). A short run arrives as a single INSERT
+-- that is already finished. A long run is inserted as 'running' and later
+-- UPDATEd to its final status.
+--
+-- Before this migration the stats trigger fired on INSERT only, so it
+-- recorded last_run_status = 'running' and never counted a success or a
+-- failure. It now also fires when an update changes the status, and it
+-- counts successes and failures on the transition to a final status. The
+-- automation's last_run_* columns are then updated in the same statement
+-- (the same flush) as the run rows.
+
+CREATE OR REPLACE FUNCTION update_automation_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    finished BOOLEAN := NEW.status IN ('success', 'failed', 'timeout');
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+        RETURN NEW;
+    END IF;
+
+    UPDATE automations SET
+        last_run_at = NEW.started_at,
+        last_run_status = NEW.status,
+        last_run_result = CASE WHEN finished THEN NEW.result ELSE last_run_result END,
+        run_count = run_count + CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE 0 END,
+        success_count = success_count + CASE WHEN NEW.status = 'success' THEN 1 ELSE 0 END,
+        fail_count = fail_count + CASE WHEN NEW.status = 'failed' THEN 1 ELSE 0 END,
+        updated_at = NOW()
+    WHERE id = NEW.automation_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_automation_stats ON automation_runs;
+CREATE TRIGGER trigger_update_automation_stats
+AFTER INSERT OR UPDATE OF status ON automation_runs
+FOR EACH ROW
+EXECUTE FUNCTION update_automation_stats();
@@ -0,0 +1,31 @@
+-- =============================================================================
+-- Migration: 011_execution_logs_keyset.sql
+-- Purpose: Exact-match step_name and keyset indexes for the log list endpoints
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- /logs, /v2/logs/run/{run_id} and /v2/logs/step/{step_name} page with a
+-- keyset on (started_at, id) instead of one unbounded limit, and filter on
+-- step_name = ... instead of worker_name ILIKE '%name%', which no index
+-- could serve (see api/log_queries.py).
+
+ALTER TABLE execution_logs
+ADD COLUMN IF NOT EXISTS step_name VARCHAR(200);
+
+COMMENT ON COLUMN execution_logs.step_name IS 'Prompt / Make.com step name - exact-match filter for log lists';
+
+-- Backfill: Make.com rows are worker_name = 'makecom.<step>', prompt/agent
+-- logs carry the prompt name in their input
+UPDATE execution_logs
+SET step_name = substring(worker_name FROM length('makecom.') + 1)
+WHERE step_name IS NULL AND worker_name LIKE 'makecom.%';
+
+UPDATE execution_logs
+SET step_name = input->>'prompt_name'
+WHERE step_name IS NULL AND input ? 'prompt_name';
+
+-- Keyset pagination: newest first overall, per step, and per run (oldest first)
+DROP INDEX IF EXISTS idx_logs_started;
+CREATE INDEX IF NOT EXISTS idx_logs_started ON execution_logs(started_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_logs_step_started ON execution_logs(step_name, started_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_logs_automation_started ON execution_logs(automation_slug, started_at, id);
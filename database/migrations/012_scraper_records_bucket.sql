@@ -0,0 +1,18 @@
+-- =============================================================================
+-- Migration: 012_scraper_records_bucket.sql
+-- Purpose: Storage bucket for columnar scraper record files
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- Streaming templates (arcgis_permits) write their records as part files
+-- to Supabase Storage (workers/records.py, workers/sink.py) and the run row
+-- keeps only the pointer. Uploads fail until the bucket exists, which made
+-- every run fail at its first part file.
+--
+-- Private: records are read with the service role key (load_records). A
+-- different RECORDS_BUCKET needs its own row here; RECORDS_BACKEND=local
+-- writes to RECORDS_DIR instead and needs no bucket.
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('scraper-records', 'scraper-records', false)
+ON CONFLICT (id) DO NOTHING;
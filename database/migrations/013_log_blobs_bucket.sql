@@ -0,0 +1,19 @@
+-- =============================================================================
+-- Migration: 013_log_blobs_bucket.sql
+-- Purpose: Storage bucket for content-addressed log blobs
+-- Run this in Supabase SQL Editor
+-- =============================================================================
+
+-- Large input/output values of execution_logs and v2_pipeline_logs are
+-- stored once per distinct content in Supabase Storage, and the rows keep
+-- {"$blob": "sha256:..."} references (workers/blobs.py). Without the
+-- bucket every large log write made a failing upload and then stored the
+-- value inline after all.
+--
+-- Private: blobs are read back with the service role key (hydrate). A
+-- different BLOB_BUCKET needs its own row here; BLOB_BACKEND=local or off
+-- needs no bucket.
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('log-blobs', 'log-blobs', false)
+ON CONFLICT (id) DO NOTHING;
@@ -84,6 +84,7 @@ CREATE TABLE automations (
     tags TEXT[] DEFAULT '{}',            -- Freeform tags for searching
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
+    config_updated_at TIMESTAMPTZ DEFAULT NOW(),  -- definition changes only (runner config cache, migration 009)
     created_by VARCHAR(100),
     notes TEXT
 );
@@ -121,7 +122,20 @@ CREATE TABLE automation_runs (
     result JSONB,
     
     -- RQ Job ID (for linking to queue system)
-    rq_job_id VARCHAR(100)
+    rq_job_id VARCHAR(100),
+    
+    -- Incremental scrapers: high-water mark for the next run (migration 008)
+    cursor JSONB
+);
+
+-- Records already emitted per automation, so re-runs only emit new/changed ones
+CREATE TABLE automation_seen_records (
+    automation_id UUID NOT NULL REFERENCES automations(id) ON DELETE CASCADE,
+    record_key TEXT NOT NULL,            -- sha1 of (case_number, jurisdiction)
+    content_hash TEXT NOT NULL,          -- sha1 of the emitted record
+    first_seen_at TIMESTAMPTZ DEFAULT NOW(),
+    last_seen_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (automation_id, record_key)
 );
 
 -- =============================================================================
@@ -175,6 +189,8 @@ CREATE INDEX idx_automations_tags ON automations USING GIN(tags);
 CREATE INDEX idx_runs_automation ON automation_runs(automation_id);
 CREATE INDEX idx_runs_status ON automation_runs(status);
 CREATE INDEX idx_runs_started ON automation_runs(started_at DESC);
+CREATE INDEX idx_runs_automation_cursor ON automation_runs(automation_id, started_at DESC)
+    WHERE status = 'success' AND cursor IS NOT NULL;
 
 -- =============================================================================
 -- VIEWS for common queries
@@ -231,15 +247,22 @@ ORDER BY a.last_run_at DESC;
 -- FUNCTIONS
 -- =============================================================================
 
--- Update automation stats after a run
+-- Update automation stats after a run (rows arrive via bulk upserts, either
+-- already finished or inserted as running and updated later - migration 010)
 CREATE OR REPLACE FUNCTION update_automation_stats()
 RETURNS TRIGGER AS $$
+DECLARE
+    finished BOOLEAN := NEW.status IN ('success', 'failed', 'timeout');
 BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+        RETURN NEW;
+    END IF;
+
     UPDATE automations SET
         last_run_at = NEW.started_at,
         last_run_status = NEW.status,
-        last_run_result = NEW.result,
-        run_count = run_count + 1,
+        last_run_result = CASE WHEN finished THEN NEW.result ELSE last_run_result END,
+        run_count = run_count + CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE 0 END,
         success_count = success_count + CASE WHEN NEW.status = 'success' THEN 1 ELSE 0 END,
         fail_count = fail_count + CASE WHEN NEW.status = 'failed' THEN 1 ELSE 0 END,
         updated_at = NOW()
@@ -249,7 +272,7 @@ END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trigger_update_automation_stats
-AFTER INSERT ON automation_runs
+AFTER INSERT OR UPDATE OF status ON automation_runs
 FOR EACH ROW
 EXECUTE FUNCTION update_automation_stats();
 
@@ -267,6 +290,25 @@ BEFORE UPDATE ON automations
 FOR EACH ROW
 EXECUTE FUNCTION update_updated_at();
 
+CREATE OR REPLACE FUNCTION update_automation_config_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.template IS DISTINCT FROM OLD.template
+       OR NEW.config IS DISTINCT FROM OLD.config
+       OR NEW.geography IS DISTINCT FROM OLD.geography
+       OR NEW.status IS DISTINCT FROM OLD.status
+       OR NEW.name IS DISTINCT FROM OLD.name THEN
+        NEW.config_updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_automations_config_updated
+BEFORE UPDATE ON automations
+FOR EACH ROW
+EXECUTE FUNCTION update_automation_config_updated_at();
+
 CREATE TRIGGER trigger_clients_updated
 BEFORE UPDATE ON clients
 FOR EACH ROW
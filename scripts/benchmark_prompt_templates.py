@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Prompt Interpolation Benchmark
+==============================
+Compare the old str.replace loop against the compiled single-pass template
+(workers/prompt_template.py) on realistic prompt sizes: a ~15KB template with
+~20 placeholders and a few {{#if}} blocks (left as-is by both, as prompt()
+renders them), fed multi-hundred-KB narratives and claims JSON.
+
+Usage:
+    python3 scripts/benchmark_prompt_templates.py
+    python3 scripts/benchmark_prompt_templates.py --input-kb 800 --runs 50
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workers.prompt_template import CompiledTemplate, compile_template
+
+VARIABLE_NAMES = [
+    "current_date", "icp_config_compressed", "industry_research_compressed",
+    "research_context_compressed", "client_specific_research", "seed_data",
+    "signal_discovery_narrative", "entity_research_narrative", "contact_discovery_narrative",
+    "enrich_lead_output", "enrich_opportunity_output", "client_specific_output",
+    "signal_discovery_claims", "entity_research_claims", "contact_discovery_claims",
+    "insight_output", "enriched_contacts", "client_name", "client_services", "dossier_id",
+]
+
+
+def build_template(size_kb: int = 15) -> str:
+    """Instruction prose with every variable referenced, some inside {{#if}} blocks."""
+    filler = "Follow the research guidelines carefully and cite every source. " * 8
+    sections = []
+    for i, name in enumerate(VARIABLE_NAMES):
+        block = f"## {name.upper()}\n{filler}\n{{{{{name}}}}}\n"
+        if i % 5 == 4:
+            block = f"{{{{#if {name}}}}}{block}{{{{/if}}}}"
+        sections.append(block)
+    template = "\n".join(sections)
+    while len(template) < size_kb * 1024:
+        template += "\n" + filler
+    return template
+
+
+def build_variables(input_kb: int) -> dict:
+    """Narratives and claims lists adding up to roughly input_kb of JSON."""
+    per_value = max(1, (input_kb * 1024) // 9)
+    claim = {"claim": "Company announced a 250MW data center campus expansion", "source": "https://example.com/news", "confidence": 0.82}
+    claims = [claim] * max(1, per_value // len(json.dumps(claim, indent=2)))
+    narrative = {"summary": "x" * per_value, "lead": {"company_name": "Acme", "company_domain": "acme.com"}}
+
+    variables = {name: f"value for {name}" for name in VARIABLE_NAMES}
+    for name in VARIABLE_NAMES:
+        if name.endswith("_claims"):
+            variables[name] = list(claims)
+        elif name.endswith(("_narrative", "_output")):
+            variables[name] = dict(narrative)
+    return variables
+
+
+def replace_loop(template: str, variables: dict) -> str:
+    """The previous workers/ai.py:prompt() interpolation."""
+    for key, value in variables.items():
+        placeholder = "{{" + key + "}}"
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, indent=2)
+        template = template.replace(placeholder, str(value))
+    return template
+
+
+def timed(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt interpolation")
+    parser.add_argument("--template-kb", type=int, default=15, help="Template size in KB")
+    parser.add_argument("--input-kb", type=int, default=400, help="Total size of variable values in KB")
+    parser.add_argument("--runs", type=int, default=20, help="Renders per measurement")
+    args = parser.parse_args()
+
+    template = build_template(args.template_kb)
+    variables = build_variables(args.input_kb)
+
+    compiled = compile_template(template)
+    rendered = compiled.render(variables)
+    if rendered != replace_loop(template, variables):
+        sys.exit("Compiled render differs from the str.replace loop")
+
+    print(f"Template: {len(template) / 1024:.0f}KB, {len(compiled.variables)} variables")
+    print(f"Inputs:   {sum(len(json.dumps(v)) for v in variables.values()) / 1024:.0f}KB")
+    print(f"Output:   {len(rendered) / 1024:.0f}KB\n")
+
+    results = [
+        ("str.replace loop", timed(lambda: replace_loop(template, variables), args.runs)),
+        ("compile every call", timed(lambda: CompiledTemplate(template).render(variables), args.runs)),
+        ("cached compiled render", timed(lambda: compile_template(template).render(variables), args.runs)),
+    ]
+
+    baseline = results[0][1]
+    print(f"{'Method':<26} {'ms/render':>10} {'speedup':>9}")
+    print("-" * 47)
+    for name, ms in results:
+        print(f"{name:<26} {ms:>10.2f} {baseline / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
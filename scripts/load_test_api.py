@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+API Load Test
+=============
+Fire concurrent requests at a running API and report throughput and latency.
+
+Used to compare the columnline routes / prompt endpoints before and after a
+change (e.g. sync handlers vs the async OpenAI + repository layer): with
+blocking handlers throughput flattens at the threadpool size, with async
+handlers it keeps rising with concurrency. scripts/stub_backend.py serves
+fake OpenAI/Supabase endpoints with fixed latency for repeatable runs.
+
+Usage:
+    python3 scripts/load_test_api.py
+    python3 scripts/load_test_api.py --url http://localhost:8000 --path /columnline/configs
+    python3 scripts/load_test_api.py --path /columnline/runs/RUN_123/status --concurrency 10 50 100
+    python3 scripts/load_test_api.py --method POST --path /test/prompt \\
+        --body '{"prompt_name": "model-test", "variables": {"question": "hi"}, "model": "gpt-4.1-mini"}'
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+
+async def run_level(client: httpx.AsyncClient, method: str, path: str, body: dict, concurrency: int, total: int) -> dict:
+    """Send `total` requests with at most `concurrency` in flight."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "req_per_sec": round(total / elapsed, 1),
+        "p50_ms": round(pct(0.50), 1),
+        "p95_ms": round(pct(0.95), 1),
+        "p99_ms": round(pct(0.99), 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+async def main_async(args) -> list:
+    body = json.loads(args.body) if args.body else None
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for concurrency in args.concurrency:
+            total = args.requests or concurrency * 10
+            result = await run_level(client, args.method, args.path, body, concurrency, total)
+            results.append(result)
+            print(
+                f"  c={result['concurrency']:<5} {result['req_per_sec']:>8} req/s  "
+                f"p50 {result['p50_ms']:>8}ms  p95 {result['p95_ms']:>8}ms  "
+                f"p99 {result['p99_ms']:>8}ms  errors {result['errors']}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test against a running API")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--path", default="/columnline/health", help="Endpoint path")
+    parser.add_argument("--method", default="GET", help="HTTP method")
+    parser.add_argument("--body", help="JSON request body")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50, 100], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, help="Requests per level (default 10x concurrency)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout (seconds)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    print(f"{args.method} {args.url}{args.path}")
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    return 0 if all(r["errors"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
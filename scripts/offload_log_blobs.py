@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Offload Log Blobs
+=================
+Move large input/output values of existing execution_logs and
+v2_pipeline_logs rows into the blob store (workers/blobs.py) and report the
+difference: inline JSON bytes before/after, distinct blobs, and the time to
+fetch the same page of rows before and after.
+
+New rows are offloaded as they're written; this is for the rows written
+before that. Rows already holding references are left as they are.
+
+Usage:
+    python3 scripts/offload_log_blobs.py --dry-run            # measure only
+    python3 scripts/offload_log_blobs.py --table v2_pipeline_logs --limit 5000
+    BLOB_BACKEND=local python3 scripts/offload_log_blobs.py
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workers.db import get_supabase
+from workers.blobs import BlobStore, blob_store, canonical_json, offload_row, REF_KEY
+
+TABLE_KEYS = {
+    "execution_logs": "id",
+    "v2_pipeline_logs": "step_id",
+}
+
+
+class DryRunStore(BlobStore):
+    """Computes references without storing anything"""
+
+    def __init__(self):
+        super().__init__(backend="dry-run")
+        self.distinct = {}
+
+    def put(self, value, data=None):
+        data = data if data is not None else canonical_json(value)
+        digest = hashlib.sha256(data).hexdigest()
+        self.distinct[digest] = len(data)
+        return {REF_KEY: f"sha256:{digest}", "bytes": len(data)}
+
+
+def row_bytes(row: dict) -> int:
+    return len(canonical_json({field: row.get(field) for field in ("input", "output")}))
+
+
+def timed_page(table: str, key: str, page_size: int) -> float:
+    start = time.perf_counter()
+    get_supabase().table(table).select("*").order(key).limit(page_size).execute()
+    return time.perf_counter() - start
+
+
+def offload_table(table: str, limit: int, page_size: int, dry_run: bool) -> dict:
+    supabase = get_supabase()
+    key = TABLE_KEYS[table]
+    store = DryRunStore() if dry_run else blob_store
+
+    before_fetch = timed_page(table, key, page_size)
+    before = after = rows_changed = seen = 0
+    last = None
+
+    while seen < limit:
+        query = supabase.table(table).select(f"{key}, input, output").order(key).limit(min(page_size, limit - seen))
+        if last is not None:
+            query = query.gt(key, last)
+        rows = query.execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            new = offload_row(row, store=store)
+            size_before, size_after = row_bytes(row), row_bytes(new)
+            before += size_before
+            after += size_after
+            if size_after < size_before:
+                rows_changed += 1
+                if not dry_run:
+                    supabase.table(table).update({"input": new["input"], "output": new["output"]}).eq(key, row[key]).execute()
+
+        seen += len(rows)
+        last = rows[-1][key]
+        print(f"  {table}: {seen} rows scanned, {rows_changed} offloaded")
+
+    report = {
+        "rows": seen,
+        "rows_offloaded": rows_changed,
+        "inline_mb_before": round(before / 1e6, 2),
+        "inline_mb_after": round(after / 1e6, 2),
+        "page_fetch_seconds_before": round(before_fetch, 3),
+    }
+    if dry_run:
+        report["distinct_blobs"] = len(store.distinct)
+        report["distinct_blob_mb"] = round(sum(store.distinct.values()) / 1e6, 2)
+    else:
+        report["page_fetch_seconds_after"] = round(timed_page(table, key, page_size), 3)
+        report["blobs"] = store.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", choices=sorted(TABLE_KEYS), action="append", help="Table(s) to process (default both)")
+    parser.add_argument("--limit", type=int, default=100000, help="Max rows per table")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Measure only - store and update nothing")
+    args = parser.parse_args()
+
+    for table in args.table or sorted(TABLE_KEYS):
+        print(f"\n{table}{' (dry run)' if args.dry_run else ''}")
+        report = offload_table(table, args.limit, args.page_size, args.dry_run)
+        for name, value in report.items():
+            print(f"  {name:28} {value}")
+
+
+if __name__ == "__main__":
+    main()
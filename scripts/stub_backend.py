@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Stub Backend for Load Tests
+===========================
+Fake OpenAI and Supabase (PostgREST) endpoints with fixed artificial
+latency, so scripts/load_test_api.py can measure the API's own concurrency
+without spending tokens or touching the real database.
+
+    POST /v1/chat/completions      answers "ok" after STUB_LATENCY seconds
+    GET/POST/PATCH /rest/v1/{t}    echoes written rows after STUB_DB_LATENCY
+
+Usage:
+    STUB_LATENCY=1.0 uvicorn scripts.stub_backend:app --port 9100
+
+    # point the API at it (prompts/model-test.md must exist)
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 SUPABASE_URL=http://127.0.0.1:9100 \\
+        uvicorn api.main:app --port 8000
+
+    python3 scripts/load_test_api.py --method POST --path /test/prompt \\
+        --body '{"prompt_name": "model-test", "variables": {"question": "hi"}, "model": "gpt-4.1-mini"}'
+
+Environment:
+    STUB_LATENCY      seconds per chat completion (default 0.2)
+    STUB_DB_LATENCY   seconds per PostgREST request (default 0.03)
+"""
+
+import os
+import time
+import uuid
+import asyncio
+
+from fastapi import FastAPI, Request
+
+LATENCY = float(os.environ.get("STUB_LATENCY", 0.2))
+DB_LATENCY = float(os.environ.get("STUB_DB_LATENCY", 0.03))
+
+app = FastAPI(title="Load test stub backend")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    await asyncio.sleep(LATENCY)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+    }
+
+
+@app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH"])
+async def postgrest(table: str, request: Request):
+    await asyncio.sleep(DB_LATENCY)
+    if request.method == "GET":
+        return []
+    body = await request.json()
+    rows = body if isinstance(body, list) else [body]
+    return [{"id": str(uuid.uuid4()), **row} for row in rows]
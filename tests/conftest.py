@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Same as the scripts: make `workers` / `api` importable from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+"""
+Automation config cache (workers/automation_cache.py): rows handed over by
+a caller are checked against config_updated_at before they're used.
+"""
+
+import pytest
+
+from workers import automation_cache as cache_module
+from workers.automation_cache import AutomationCache
+
+ROW = {"id": "1", "slug": "s", "status": "active", "config": {"a": 1}, "config_updated_at": "2026-01-01T00:00:00"}
+
+
+class FakeSupabase:
+    def __init__(self, row):
+        self.row = row
+        self.selects = []
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        self.selects.append(columns)
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def execute(self):
+        columns = [c.strip() for c in self.selects[-1].split(",")]
+        self.data = [{c: self.row[c] for c in columns if c in self.row}] if self.row else []
+        return self
+
+
+@pytest.fixture
+def db(monkeypatch):
+    supabase = FakeSupabase(dict(ROW))
+    monkeypatch.setattr(cache_module, "get_supabase", lambda: supabase)
+    return supabase
+
+
+def test_current_row_is_used_and_cached(db):
+    cache = AutomationCache(ttl=300)
+
+    assert cache.validate(dict(ROW)) == ROW
+    assert db.selects == ["config_updated_at"]
+    assert cache.get("s") == ROW
+    assert db.selects == ["config_updated_at"]
+
+
+def test_stale_row_is_replaced(db):
+    cache = AutomationCache(ttl=300)
+    db.row = {**ROW, "status": "paused", "config_updated_at": "2026-02-01T00:00:00"}
+
+    assert cache.validate(dict(ROW))["status"] == "paused"
+    assert cache.get("s")["status"] == "paused"
+
+
+def test_deleted_automation(db):
+    db.row = None
+
+    assert AutomationCache(ttl=300).validate(dict(ROW)) is None
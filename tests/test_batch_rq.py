@@ -0,0 +1,118 @@
+"""
+RQ batch backend (workers/batch.py) against fakeredis: dispatch under caps,
+slots freed by finished / failed / killed / abandoned jobs, no stalls.
+"""
+
+import time
+
+import fakeredis
+import pytest
+from rq import Queue, SimpleWorker
+from rq.job import Job, JobStatus
+from rq.registry import FailedJobRegistry, StartedJobRegistry
+from rq.results import Result
+
+from workers import batch
+
+HOST_A = {"template": "arcgis_permits", "config": {"permit_endpoint": "https://gis.a.example/arcgis"}}
+HOST_B = {"template": "arcgis_permits", "config": {"permit_endpoint": "https://gis.b.example/arcgis"}}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    connection = fakeredis.FakeRedis()
+    monkeypatch.setattr(batch, "_redis", lambda: connection)
+    monkeypatch.setattr(batch, "_execute", lambda slug, automation=None: {"slug": slug, "status": "success", "result": {}})
+    return connection
+
+
+def start(slugs, rows, **limits):
+    automations = {slug: {"slug": slug, **row} for slug, row in zip(slugs, rows)}
+    return batch.enqueue_batch(slugs, automations=automations, **limits)["batch_id"]
+
+
+def running(redis, batch_id):
+    return {k.decode(): int(v) for k, v in redis.hgetall(batch._key(batch_id, "running")).items() if int(v)}
+
+
+def queued_jobs(redis):
+    return Queue("default", connection=redis).get_jobs()
+
+
+def work(redis):
+    SimpleWorker([Queue("default", connection=redis)], connection=redis).work(burst=True)
+
+
+def test_dispatch_respects_host_cap(redis):
+    batch_id = start(["a1", "a2", "b1"], [HOST_A, HOST_A, HOST_B], max_per_host=1)
+
+    assert sorted(job.args[1]["slug"] for job in queued_jobs(redis)) == ["a1", "b1"]
+    assert running(redis, batch_id) == {"template:arcgis_permits": 2, "host:gis.a.example": 1, "host:gis.b.example": 1}
+    assert redis.llen(batch._key(batch_id, "pending")) == 1
+
+
+def test_finished_jobs_free_slots_and_batch_completes(redis, monkeypatch):
+    monkeypatch.setattr(
+        batch, "_execute",
+        lambda slug, automation=None: {"slug": slug, "status": "failed" if slug == "a2" else "success", "error": "boom"}
+    )
+    batch_id = start(["a1", "a2", "a3"], [HOST_A] * 3, max_per_host=1)
+
+    work(redis)
+
+    summary = batch.get_batch(batch_id)
+    assert summary["done"]
+    assert (summary["success"], summary["failed"]) == (2, 1)
+    # The failed job's on_failure callback must not free its slot a second time
+    assert running(redis, batch_id) == {}
+    assert redis.hlen(batch._key(batch_id, "jobs")) == 0
+
+
+def test_killed_work_horse_does_not_stall_batch(redis, monkeypatch):
+    batch_id = start(["a1", "a2"], [HOST_A] * 2, max_per_host=1)
+    queue = Queue("default", connection=redis)
+    job = queued_jobs(redis)[0]
+
+    # What the worker does when its horse is SIGKILLed: job failed, no callback
+    queue.remove(job)
+    job.set_status(JobStatus.FAILED)
+    Result.create_failure(job, ttl=600, exc_string="Work-horse terminated unexpectedly; waitpid returned 9")
+    FailedJobRegistry(queue=queue).add(job, ttl=600)
+
+    # A worker picks up whatever is queued while iter_results waits
+    monkeypatch.setattr(batch.time, "sleep", lambda seconds: work(redis))
+    results = list(batch.iter_results(batch_id, timeout=5))
+
+    assert [(r["slug"], r["status"]) for r in results] == [("a1", "failed"), ("a2", "success")]
+    assert "terminated unexpectedly" in results[0]["error"]
+    assert running(redis, batch_id) == {}
+    assert batch.reconcile(batch_id, redis) == 0
+
+
+def test_abandoned_started_job_is_released(redis):
+    batch_id = start(["a1", "a2"], [HOST_A] * 2, max_per_host=1)
+    queue = Queue("default", connection=redis)
+    job = queued_jobs(redis)[0]
+
+    # Worker died mid-job (cold shutdown): still "started", heartbeat expired
+    queue.remove(job)
+    job.set_status(JobStatus.STARTED)
+    redis.zadd(StartedJobRegistry(queue=queue).key, {job.id: time.time() - 10})
+
+    summary = batch.get_batch(batch_id)
+
+    assert Job.fetch(job.id, connection=redis).get_status() == JobStatus.FAILED
+    assert [(r["slug"], r["status"]) for r in summary["results"]] == [("a1", "failed")]
+    assert [j.args[1]["slug"] for j in queued_jobs(redis)] == ["a2"]
+    assert running(redis, batch_id) == {"template:arcgis_permits": 1, "host:gis.a.example": 1}
+
+
+def test_stopped_callback_releases_once(redis):
+    batch_id = start(["a1"], [HOST_A], max_per_host=1)
+    job = queued_jobs(redis)[0]
+
+    batch.on_batch_job_stopped(job, redis)
+    batch.on_batch_job_failure(job, redis, RuntimeError, RuntimeError("late"), None)
+
+    assert [r["error"] for r in batch.get_batch(batch_id)["results"]] == ["job stopped"]
+    assert running(redis, batch_id) == {}
@@ -0,0 +1,38 @@
+"""
+Log blob store (workers/blobs.py): a failing upload keeps values inline and
+pauses offloading instead of failing again on every write.
+"""
+
+from workers.blobs import BlobStore, offload_row, is_ref
+
+BIG = {"input": {"config": "x" * 5000, "name": "step"}}
+
+
+class FailingStore(BlobStore):
+    def __init__(self):
+        super().__init__(backend="supabase")
+        self.attempts = 0
+
+    def put(self, value, data=None):
+        self.attempts += 1
+        raise RuntimeError("Bucket not found")
+
+
+def test_failed_upload_stores_inline_and_pauses():
+    store = FailingStore()
+
+    assert offload_row(BIG, store=store) == BIG
+    assert offload_row(BIG, store=store) == BIG
+    assert store.attempts == 1
+    assert store.stats()["paused"]
+
+    store._paused_until = 0
+    assert store.enabled
+
+
+def test_local_backend_offloads(tmp_path):
+    store = BlobStore(backend="local", directory=tmp_path)
+
+    row = offload_row(BIG, store=store)
+
+    assert is_ref(row["input"]["config"]) and row["input"]["name"] == "step"
@@ -0,0 +1,80 @@
+"""
+Log list endpoints (api/log_queries.py): keyset pages follow next_cursor
+through the real postgrest client, against an in-memory PostgREST.
+"""
+
+import re
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from postgrest import SyncPostgrestClient
+
+from api import log_queries
+from api.main import app
+
+ROWS = [
+    {
+        "id": f"00000000-0000-0000-0000-00000000000{n}", "started_at": started_at, "step_name": step,
+        "automation_slug": "run-1", "status": "success",
+    }
+    for n, (started_at, step) in enumerate([
+        ("2026-01-01T10:00:00", "1_SEARCH"),
+        ("2026-01-01T10:00:00", "1_SEARCH"),   # same started_at - id breaks the tie
+        ("2026-01-01T10:00:00", "2_ENRICH"),
+        ("2026-01-01T11:00:00", "1_SEARCH"),
+        ("2026-01-01T12:00:00", "1_SEARCH"),
+    ])
+]
+KEYSET = re.compile(r'^\(started_at\.(lt|gt)\."([^"]+)",and\(started_at\.eq\."([^"]+)",id\.(lt|gt)\.([^)]+)\)\)$')
+
+
+def postgrest(request: httpx.Request) -> httpx.Response:
+    """Just enough of PostgREST for list_logs: eq filters, the keyset or=, order, limit."""
+    params = request.url.params
+    rows = list(ROWS)
+    for column, value in params.multi_items():
+        if value.startswith("eq.") and column in ROWS[0]:
+            rows = [row for row in rows if row[column] == value[3:]]
+    if "or" in params:
+        op, started_at, _, _, log_id = KEYSET.match(params["or"]).groups()
+        after = (lambda key: key < (started_at, log_id)) if op == "lt" else (lambda key: key > (started_at, log_id))
+        rows = [row for row in rows if after((row["started_at"], row["id"]))]
+    rows.sort(key=lambda row: (row["started_at"], row["id"]), reverse=params["order"].endswith(".desc"))
+    return httpx.Response(200, json=rows[:int(params["limit"])])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = SyncPostgrestClient("http://postgrest.test")
+    db.session = httpx.Client(base_url="http://postgrest.test", transport=httpx.MockTransport(postgrest))
+    monkeypatch.setattr(log_queries, "get_supabase", lambda: db)
+    return TestClient(app)
+
+
+def pages(client, path):
+    seen, cursor = [], None
+    while True:
+        response = client.get(path, params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        seen.append([row["id"][-1] for row in body["logs"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_logs_newest_first_across_pages(client):
+    assert pages(client, "/logs") == [["4", "3"], ["2", "1"], ["0"]]
+
+
+def test_run_logs_oldest_first_across_pages(client):
+    assert pages(client, "/v2/logs/run/run-1") == [["0", "1"], ["2", "3"], ["4"]]
+
+
+def test_step_logs_across_pages(client):
+    assert pages(client, "/v2/logs/step/1_SEARCH") == [["4", "3"], ["1", "0"]]
+
+
+def test_invalid_cursor(client):
+    assert client.get("/logs", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,99 @@
+"""
+Buffered execution logs (workers/logger.py): a finished logger whose write
+failed is written by the next flush even when the queue is full, and one
+bad row doesn't hold back the others.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from workers import logger as logger_module
+from workers.logger import ExecutionLogger, LogFlusher
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.fail = 0
+        self.reject = set()
+        self.rows = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.pending = rows
+        return self
+
+    def execute(self):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("supabase down")
+        json.dumps(self.pending)   # what the real client does first
+        if any(row.get("worker_name") in self.reject for row in self.pending):
+            raise ValueError("400 Bad Request")
+        self.rows.extend(self.pending)
+        return self
+
+
+@pytest.fixture
+def db(monkeypatch):
+    supabase = FakeSupabase()
+    monkeypatch.setattr(logger_module, "get_supabase", lambda: supabase)
+    return supabase
+
+
+@pytest.fixture
+def flusher(monkeypatch):
+    flusher = LogFlusher(interval=3600, maxsize=1)
+    monkeypatch.setattr(logger_module, "_flusher", flusher)
+    return flusher
+
+
+@pytest.fixture
+def roomy_flusher(monkeypatch):
+    flusher = LogFlusher(interval=3600, maxsize=100)
+    monkeypatch.setattr(logger_module, "_flusher", flusher)
+    return flusher
+
+
+def test_failed_final_write_is_retried_with_a_full_queue(db, flusher):
+    log = ExecutionLogger("tests.worker", {"q": 1})
+    ExecutionLogger("tests.other", {})   # queue (size 1) is full now
+    log.success({"answer": 42})
+
+    db.fail = 1
+    assert flusher.write([log]) == 0
+    assert flusher.stats()["retrying"] == 1
+
+    flusher.flush()
+
+    assert flusher.stats()["retrying"] == 0
+    assert {row["id"]: row["status"] for row in db.rows}[log.log_id] == "success"
+
+
+def test_unencodable_input_is_stored_as_json(db, roomy_flusher):
+    bad = ExecutionLogger("tests.dates", {"since": datetime(2026, 1, 1), "score": float("nan")})
+    good = ExecutionLogger("tests.worker", {"q": 1})
+
+    assert roomy_flusher.flush() == 2
+
+    stored = {row["id"]: row for row in db.rows}
+    assert stored[bad.log_id]["input"] == {"since": "2026-01-01 00:00:00", "score": None}
+    assert good.log_id in stored
+
+
+def test_rejected_row_does_not_hold_back_the_group(db, roomy_flusher):
+    db.reject.add("tests.rejected")
+    bad = ExecutionLogger("tests.rejected", {})
+    good = ExecutionLogger("tests.worker", {"q": 1})
+    bad.success({"ok": False})
+    good.success({"ok": True})
+
+    for _ in range(logger_module.MAX_ATTEMPTS):
+        roomy_flusher.flush()
+
+    assert {row["id"] for row in db.rows} == {good.log_id}
+    stats = roomy_flusher.stats()
+    assert (stats["dropped"], stats["retrying"], stats["queued"]) == (1, 0, 0)
@@ -0,0 +1,161 @@
+"""
+RunWriter (workers/run_writer.py): bulk upserts, on_written after the row
+is stored, nothing lost when a flush fails, one bad row fails only its run.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from postgrest.exceptions import APIError
+
+from workers import run_writer as run_writer_module
+from workers.run_writer import RunWriter
+
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+
+    def upsert(self, rows, **kwargs):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.db.fail:
+            self.db.fail -= 1
+            raise ConnectionError("supabase down")
+        json.dumps(self.rows)   # what the real client does first
+        if any(row["id"] in self.db.reject for row in self.rows):
+            raise APIError({"code": "23502", "message": "null value in column violates not-null constraint"})
+        self.db.upserts.append(self.rows)
+        return self
+
+
+class FakeSupabase:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.reject = set()
+        self.upserts = []
+
+    def table(self, name):
+        return FakeTable(self)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    supabase = FakeSupabase()
+    monkeypatch.setattr(run_writer_module, "get_supabase", lambda: supabase)
+    return supabase
+
+
+@pytest.fixture
+def writer():
+    writer = RunWriter(flush_size=50, flush_interval=3600)
+    yield writer
+    writer._stop.set()
+
+
+def test_on_written_runs_after_the_row_is_stored(db, writer):
+    written = []
+    with writer.batch():
+        run_id = writer.start({"automation_id": "a", "status": "running"})
+        writer.finish(run_id, status="success", on_written=lambda: written.append(run_id))
+        assert written == []
+
+    assert written == [run_id]
+    assert db.upserts[-1][0]["status"] == "success"
+
+
+def test_on_written_waits_for_a_failed_flush(db, writer):
+    written = []
+    db.fail = 1
+    with writer.batch():
+        run_id = writer.start({"automation_id": "a", "status": "running"})
+        writer.finish(run_id, status="success", on_written=lambda: written.append(run_id))
+        assert writer.flush() == 0
+
+    assert written == [run_id]
+    assert writer.stats()["pending"] == 0
+
+
+def test_unbatched_finish_retries_the_write(db, writer, monkeypatch):
+    monkeypatch.setattr(run_writer_module.time, "sleep", lambda seconds: None)
+    db.fail = 2
+    run_id = writer.start({"automation_id": "a", "status": "running"})
+
+    writer.finish(run_id, status="success")
+
+    assert [row["status"] for rows in db.upserts for row in rows] == ["success"]
+
+
+def test_unbatched_finish_raises_when_the_row_cannot_be_written(db, writer, monkeypatch):
+    monkeypatch.setattr(run_writer_module.time, "sleep", lambda seconds: None)
+    written = []
+    db.fail = 3
+    run_id = writer.start({"automation_id": "a", "status": "running"})
+
+    with pytest.raises(RuntimeError):
+        writer.finish(run_id, status="success", on_written=lambda: written.append(run_id))
+    # A failed run doesn't inherit the success callback
+    writer.finish(run_id, status="failed")
+
+    assert [row["status"] for rows in db.upserts for row in rows] == ["failed"]
+    assert written == []
+
+
+def statuses(db):
+    return {row["id"]: row.get("status") for rows in db.upserts for row in rows}
+
+
+def test_unencodable_values_are_stored_as_json(db, writer):
+    run_id = writer.start({"automation_id": "a", "status": "running"})
+    writer.finish(run_id, status="success", result={"at": datetime(2026, 1, 1), "score": float("nan")})
+
+    assert db.upserts[-1][0]["result"] == {"at": "2026-01-01 00:00:00", "score": None}
+
+
+def test_rejected_row_fails_only_its_own_run(db, writer, monkeypatch):
+    monkeypatch.setattr(run_writer_module.time, "sleep", lambda seconds: None)
+    with writer.batch():
+        bad = writer.start({"automation_id": "a", "status": "running"})
+        good = writer.start({"automation_id": "b", "status": "running"})
+        db.reject.add(bad)
+        writer.finish(bad, status="success")
+        writer.finish(good, status="success")
+    assert statuses(db) == {good: "success"}
+
+    later = writer.start({"automation_id": "c", "status": "running"})
+    writer.finish(later, status="success")
+    assert statuses(db)[later] == "success"
+
+    # A constraint error is the row's own - dropped after max_row_failures
+    with pytest.raises(RuntimeError, match="dropped"):
+        writer.finish(bad, status="failed")
+    assert writer.stats()["dropped"] == 1
+    assert writer.stats()["pending"] == 0
+
+
+def test_outage_never_drops_rows(db, writer):
+    with writer.batch():
+        run_id = writer.start({"automation_id": "a", "status": "running"})
+        writer.finish(run_id, status="success")
+        for _ in range(5):
+            db.fail = 1
+            writer.flush()
+
+    assert statuses(db) == {run_id: "success"}
+    assert writer.stats()["dropped"] == 0
+
+
+def test_rows_are_not_padded_with_nulls(db, writer):
+    with writer.batch():
+        started = writer.start({"automation_id": "a", "status": "running", "rq_job_id": "job-1"})
+        # finish() of a run whose row was already written and released
+        writer.finish("already-written", status="failed", error_message="boom")
+        writer.finish(started, status="success")
+
+    requests = [{row["id"]: set(row) for row in rows} for rows in db.upserts]
+    assert {"id", "status", "error_message"} in [columns for request in requests for columns in request.values()]
+    for request in requests:
+        assert len({frozenset(columns) for columns in request.values()}) == 1
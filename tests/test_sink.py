@@ -0,0 +1,56 @@
+"""
+Record sinks (workers/sink.py): a failed chunk flush keeps the chunk, and
+the pointer counts only stored records.
+"""
+
+import pytest
+
+from workers.sink import RecordSink
+
+
+class FlakySink(RecordSink):
+    kind = "flaky"
+
+    def __init__(self, chunk_size=2, fail=0):
+        super().__init__(chunk_size)
+        self.fail = fail
+        self.stored_chunks = []
+
+    def _flush(self, records):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("upload failed")
+        self.stored_chunks.append(list(records))
+
+
+def test_failed_flush_keeps_the_chunk_for_the_next_try():
+    sink = FlakySink(fail=1)
+    sink.write({"n": 1})
+    with pytest.raises(ConnectionError):
+        sink.write({"n": 2})
+
+    sink.write({"n": 3})
+
+    assert sink.stored_chunks == [[{"n": 1}, {"n": 2}, {"n": 3}]]
+    assert sink.close() == {"sink": "flaky", "count": 3, "chunks": 1}
+
+
+def test_partial_close_counts_only_stored_records():
+    sink = FlakySink(chunk_size=2)
+    sink.write_many([{"n": 1}, {"n": 2}, {"n": 3}])
+    sink.fail = 1
+
+    summary = sink.close(partial=True)
+
+    assert sink.closed
+    assert (summary["count"], summary["unflushed"], summary["partial"]) == (2, 1, True)
+
+
+def test_failed_close_can_be_retried_as_partial():
+    sink = FlakySink(chunk_size=10, fail=2)
+    sink.write({"n": 1})
+
+    with pytest.raises(ConnectionError):
+        sink.close()
+    assert not sink.closed
+    assert sink.close(partial=True)["count"] == 0
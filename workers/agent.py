@@ -661,23 +661,10 @@ def agent_prompt(
         dict with prompt_name, model, agent_type, input, output, elapsed_seconds
     """
     import time
-    from pathlib import Path
+    from workers.prompt_cache import load_template
 
-    prompts_dir = Path(__file__).parent.parent / "prompts"
-    prompt_path = prompts_dir / f"{name}.md"
-
-    if not prompt_path.exists():
-        raise FileNotFoundError(f"Prompt not found: {prompt_path}")
-
-    prompt_template = prompt_path.read_text()
-
-    # Interpolate variables
-    if variables:
-        for key, value in variables.items():
-            placeholder = "{{" + key + "}}"
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, indent=2)
-            prompt_template = prompt_template.replace(placeholder, str(value))
+    # Interpolate variables in one pass (same output as the old replace loop)
+    prompt_template = load_template(name).render(variables)
 
     # Optional logging
     logger = None
@@ -689,6 +676,7 @@ def agent_prompt(
             input_data={"prompt_name": name, "model": model, "agent_type": agent_type, "variables": variables},
             tags=tags or [model, agent_type, name.split(".")[0]],
             notes=notes,
+            step_name=name,
         )
 
     # Run with agent
@@ -2,13 +2,12 @@
 Universal AI Module - Updated with proper Responses API for deep research
 """
 import os
-import json
 import time
-from pathlib import Path
-from openai import OpenAI
+import asyncio
+import weakref
+from openai import OpenAI, AsyncOpenAI
 
-# Prompts directory
-PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+from workers.prompt_cache import load_template
 
 # Initialize clients
 openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
@@ -28,6 +27,14 @@ OPENAI_MODELS = {
 DEEP_RESEARCH_MODELS = ["o4-mini-deep-research", "o3-deep-research", "o4-mini-deep-research-2025-06-26", "o3-deep-research-2025-06-26"]
 
 
+def _chat_messages(prompt: str, system: str = None) -> list:
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
 def ai(prompt: str, model: str = "gpt-4.1", system: str = None, temperature: float = 0.7) -> str:
     """
     Universal AI completion - routes to appropriate provider/model.
@@ -35,38 +42,17 @@ def ai(prompt: str, model: str = "gpt-4.1", system: str = None, temperature: flo
     """
     model_id = OPENAI_MODELS.get(model, model)
 
-    messages = []
-    if system:
-        messages.append({"role": "system", "content": system})
-    messages.append({"role": "user", "content": prompt})
-
     response = openai_client.chat.completions.create(
         model=model_id,
-        messages=messages,
+        messages=_chat_messages(prompt, system),
         temperature=temperature,
     )
 
     return response.choices[0].message.content
 
 
-def research(prompt: str, model: str = "o4-mini-deep-research", background: bool = True) -> dict:
-    """
-    Deep research using OpenAI Responses API with web search.
-
-    Uses /v1/responses endpoint with web_search_preview tool.
-    Defaults to background mode since these take 5-10 minutes.
-
-    Args:
-        prompt: Research query/task
-        model: Deep research model (o4-mini-deep-research or o3-deep-research)
-        background: If True (default), returns immediately with response ID for polling
-
-    Returns:
-        dict with output, sources, usage info (or response_id if background)
-    """
-    model_id = OPENAI_MODELS.get(model, model)
-
-    # Build request for Responses API
+def _research_params(prompt: str, model_id: str, background: bool) -> dict:
+    """Request for the Responses API with web search."""
     request_params = {
         "model": model_id,
         "input": prompt,
@@ -79,18 +65,11 @@ def research(prompt: str, model: str = "o4-mini-deep-research", background: bool
     if background:
         request_params["background"] = True
 
-    # Use responses endpoint with long timeout
-    response = openai_client.responses.create(**request_params)
+    return request_params
 
-    # If background mode, return response ID for polling
-    if background:
-        return {
-            "response_id": response.id,
-            "status": response.status,
-            "model": model_id,
-        }
 
-    # Synchronous mode - extract output
+def _research_output(response) -> tuple:
+    """(output_text, annotations) from a completed Responses API response."""
     output_text = ""
     annotations = []
 
@@ -105,14 +84,70 @@ def research(prompt: str, model: str = "o4-mini-deep-research", background: bool
                     if hasattr(content, 'annotations'):
                         annotations.extend(content.annotations)
 
+    return output_text, annotations
+
+
+def _usage(response):
+    return response.usage.model_dump() if hasattr(response, 'usage') and response.usage else None
+
+
+def _research_result(response, model_id: str, background: bool) -> dict:
+    # If background mode, return response ID for polling
+    if background:
+        return {
+            "response_id": response.id,
+            "status": response.status,
+            "model": model_id,
+        }
+
+    # Synchronous mode - extract output
+    output_text, annotations = _research_output(response)
     return {
         "output": output_text,
         "annotations": annotations,
         "model": model_id,
-        "usage": response.usage.model_dump() if hasattr(response, 'usage') and response.usage else None,
+        "usage": _usage(response),
     }
 
 
+def _poll_result(response_id: str, response) -> dict:
+    result = {
+        "response_id": response_id,
+        "status": response.status,
+    }
+
+    if response.status == "completed":
+        output_text, annotations = _research_output(response)
+        result["output"] = output_text
+        result["annotations"] = [str(a) for a in annotations]  # Serialize
+        result["usage"] = _usage(response)
+
+    return result
+
+
+def research(prompt: str, model: str = "o4-mini-deep-research", background: bool = True) -> dict:
+    """
+    Deep research using OpenAI Responses API with web search.
+
+    Uses /v1/responses endpoint with web_search_preview tool.
+    Defaults to background mode since these take 5-10 minutes.
+
+    Args:
+        prompt: Research query/task
+        model: Deep research model (o4-mini-deep-research or o3-deep-research)
+        background: If True (default), returns immediately with response ID for polling
+
+    Returns:
+        dict with output, sources, usage info (or response_id if background)
+    """
+    model_id = OPENAI_MODELS.get(model, model)
+
+    # Use responses endpoint with long timeout
+    response = openai_client.responses.create(**_research_params(prompt, model_id, background))
+
+    return _research_result(response, model_id, background)
+
+
 def poll_research(response_id: str) -> dict:
     """
     Poll for background research completion.
@@ -124,32 +159,64 @@ def poll_research(response_id: str) -> dict:
         dict with status, and output if completed
     """
     response = openai_client.responses.retrieve(response_id)
+    return _poll_result(response_id, response)
 
-    result = {
-        "response_id": response_id,
-        "status": response.status,
-    }
 
-    if response.status == "completed":
-        output_text = ""
-        annotations = []
-
-        if hasattr(response, 'output_text'):
-            output_text = response.output_text
-        elif hasattr(response, 'output'):
-            for item in response.output:
-                if hasattr(item, 'content'):
-                    for content in item.content:
-                        if hasattr(content, 'text'):
-                            output_text += content.text
-                        if hasattr(content, 'annotations'):
-                            annotations.extend(content.annotations)
+def is_deep_research(model: str) -> bool:
+    return model in DEEP_RESEARCH_MODELS or model.startswith("o4-mini-deep") or model.startswith("o3-deep")
 
-        result["output"] = output_text
-        result["annotations"] = [str(a) for a in annotations]  # Serialize
-        result["usage"] = response.usage.model_dump() if hasattr(response, 'usage') and response.usage else None
 
-    return result
+def _prompt_logger(name: str, model: str, variables: dict, tags: list, notes: str, automation_slug: str):
+    from workers.logger import ExecutionLogger
+    # Derive slug from prompt name if not provided (e.g., "entity-research" from "entity-research.md")
+    slug = automation_slug or name.split(".")[0]
+    return ExecutionLogger(
+        worker_name=f"ai.prompt.{model}",
+        automation_slug=slug,
+        input_data={"prompt_name": name, "model": model, "variables": variables},
+        tags=tags or [model, slug],
+        notes=notes,
+        step_name=name,
+    )
+
+
+def _prepare_prompt(name: str, variables: dict, model: str, log: bool, tags: list, notes: str, automation_slug: str) -> tuple:
+    """(prompt text, logger or None) - the part of prompt()/prompt_async() before the model call."""
+    # Load compiled prompt (cached, recompiled only when the file changes)
+    # and interpolate variables in one pass (same output as the old replace loop)
+    prompt_text = load_template(name).render(variables)
+    # Logger calls only buffer (workers/logger.py) - safe on the event loop too
+    logger = _prompt_logger(name, model, variables, tags, notes, automation_slug) if log else None
+    return prompt_text, logger
+
+
+def _background_result(name: str, model: str, result: dict, logger) -> dict:
+    """Response for a background deep research call (response_id to poll)."""
+    if logger:
+        logger.meta("background", True)
+        logger.meta("response_id", result.get("response_id"))
+    return {
+        "prompt_name": name,
+        "model": model,
+        "response_id": result.get("response_id"),
+        "status": result.get("status"),
+    }
+
+
+def _prompt_result(name: str, model: str, prompt_text: str, result, start: float) -> dict:
+    """Response for a completed call - result is research()'s dict or ai()'s text."""
+    if isinstance(result, dict):
+        output, usage = result.get("output", ""), result.get("usage")
+    else:
+        output, usage = result, None
+    return {
+        "prompt_name": name,
+        "model": model,
+        "input": prompt_text,
+        "output": output,
+        "elapsed_seconds": round(time.time() - start, 2),
+        "usage": usage,
+    }
 
 
 def prompt(
@@ -181,77 +248,22 @@ def prompt(
         dict with prompt_name, model, input, output, elapsed_seconds, usage
         (or response_id if background mode)
     """
-    # Load prompt file
-    prompt_path = PROMPTS_DIR / f"{name}.md"
-    if not prompt_path.exists():
-        raise FileNotFoundError(f"Prompt not found: {prompt_path}")
-
-    prompt_template = prompt_path.read_text()
-
-    # Interpolate variables
-    if variables:
-        for key, value in variables.items():
-            placeholder = "{{" + key + "}}"
-            # Convert dicts/lists to JSON string
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, indent=2)
-            prompt_template = prompt_template.replace(placeholder, str(value))
-
-    # Optional logging
-    logger = None
-    if log:
-        from workers.logger import ExecutionLogger
-        # Derive slug from prompt name if not provided (e.g., "entity-research" from "entity-research.md")
-        slug = automation_slug or name.split(".")[0]
-        logger = ExecutionLogger(
-            worker_name=f"ai.prompt.{model}",
-            automation_slug=slug,
-            input_data={"prompt_name": name, "model": model, "variables": variables},
-            tags=tags or [model, slug],
-            notes=notes,
-        )
-
-    # Execute
+    prompt_text, logger = _prepare_prompt(name, variables, model, log, tags, notes, automation_slug)
     start = time.time()
 
     try:
         # Route to appropriate function based on model
-        is_deep_research = model in DEEP_RESEARCH_MODELS or model.startswith("o4-mini-deep") or model.startswith("o3-deep")
-
-        if is_deep_research:
-            result = research(prompt_template, model=model, background=background)
+        if is_deep_research(model):
+            result = research(prompt_text, model=model, background=background)
             if background:
                 # Background mode - return response_id for polling
-                background_result = {
-                    "prompt_name": name,
-                    "model": model,
-                    "response_id": result.get("response_id"),
-                    "status": result.get("status"),
-                }
-                if logger:
-                    logger.meta("background", True)
-                    logger.meta("response_id", result.get("response_id"))
-                return background_result
-            output = result.get("output", "")
-            usage = result.get("usage")
+                return _background_result(name, model, result, logger)
         else:
-            output = ai(prompt_template, model=model, system=system)
-            usage = None
-
-        elapsed = time.time() - start
-
-        result_data = {
-            "prompt_name": name,
-            "model": model,
-            "input": prompt_template,
-            "output": output,
-            "elapsed_seconds": round(elapsed, 2),
-            "usage": usage,
-        }
+            result = ai(prompt_text, model=model, system=system)
 
+        result_data = _prompt_result(name, model, prompt_text, result, start)
         if logger:
             logger.success(result_data)
-
         return result_data
 
     except Exception as e:
@@ -260,6 +272,111 @@ def prompt(
         raise
 
 
+# =============================================================================
+# Async provider layer (for FastAPI handlers)
+# =============================================================================
+# One AsyncOpenAI client per event loop, shared by every request, with a
+# semaphore capping in-flight OpenAI calls (OPENAI_MAX_CONCURRENCY, default 64)
+# so a burst of requests queues here instead of exhausting the connection
+# pool or the rate limit. Supabase logging runs in a worker thread so it never
+# blocks the loop.
+
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", 64))
+
+_async_providers = weakref.WeakKeyDictionary()
+
+
+def _async_provider() -> tuple:
+    """(AsyncOpenAI client, semaphore) for the running event loop."""
+    loop = asyncio.get_running_loop()
+    provider = _async_providers.get(loop)
+    if provider is None:
+        provider = (
+            AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY")),
+            asyncio.Semaphore(OPENAI_MAX_CONCURRENCY),
+        )
+        _async_providers[loop] = provider
+    return provider
+
+
+def get_async_openai() -> AsyncOpenAI:
+    """Shared AsyncOpenAI client for the running event loop."""
+    return _async_provider()[0]
+
+
+async def ai_async(prompt: str, model: str = "gpt-4.1", system: str = None, temperature: float = 0.7) -> str:
+    """Async ai() - chat completion without blocking the event loop."""
+    client, slots = _async_provider()
+    model_id = OPENAI_MODELS.get(model, model)
+
+    async with slots:
+        response = await client.chat.completions.create(
+            model=model_id,
+            messages=_chat_messages(prompt, system),
+            temperature=temperature,
+        )
+
+    return response.choices[0].message.content
+
+
+async def research_async(prompt: str, model: str = "o4-mini-deep-research", background: bool = True) -> dict:
+    """Async research() - see research() for args and return value."""
+    client, slots = _async_provider()
+    model_id = OPENAI_MODELS.get(model, model)
+
+    async with slots:
+        response = await client.responses.create(**_research_params(prompt, model_id, background))
+
+    return _research_result(response, model_id, background)
+
+
+async def poll_research_async(response_id: str) -> dict:
+    """Async poll_research()."""
+    client, slots = _async_provider()
+
+    async with slots:
+        response = await client.responses.retrieve(response_id)
+
+    return _poll_result(response_id, response)
+
+
+async def prompt_async(
+    name: str,
+    variables: dict = None,
+    model: str = "gpt-4.1",
+    system: str = None,
+    background: bool = False,
+    log: bool = False,
+    tags: list = None,
+    notes: str = None,
+    automation_slug: str = None,
+) -> dict:
+    """
+    Async prompt() - same args and return value, for use inside async handlers.
+    """
+    prompt_text, logger = _prepare_prompt(name, variables, model, log, tags, notes, automation_slug)
+    start = time.time()
+
+    try:
+        if is_deep_research(model):
+            result = await research_async(prompt_text, model=model, background=background)
+            if background:
+                return _background_result(name, model, result, logger)
+        else:
+            result = await ai_async(prompt_text, model=model, system=system)
+
+        result_data = _prompt_result(name, model, prompt_text, result, start)
+        if logger:
+            # success()/fail() can fall back to a synchronous write under backpressure
+            await asyncio.to_thread(logger.success, result_data)
+        return result_data
+
+    except Exception as e:
+        if logger:
+            await asyncio.to_thread(logger.fail, e)
+        raise
+
+
 # Gemini support (optional)
 try:
     import google.generativeai as genai
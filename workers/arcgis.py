@@ -0,0 +1,244 @@
+"""
+ArcGIS Query Engine
+===================
+Streams every matching feature from an ArcGIS FeatureServer/MapServer layer.
+
+A plain GET {layer}/query silently stops at the server's maxRecordCount
+(often 1000-2000) and, with outFields=*, drags every attribute along. This
+module pages through the full result instead and only asks for the fields
+the caller needs:
+
+- Servers with supportsPagination: resultOffset / resultRecordCount pages,
+  ordered by the objectId field so pages don't overlap or skip.
+- Servers without it (or whose metadata can't be read): returnIdsOnly=true,
+  then the objectIds in chunks of maxRecordCount (POSTed, since id lists
+  get long).
+
+Features are yielded one at a time, so memory stays flat regardless of how
+many permits a jurisdiction has.
+
+Usage:
+    from workers.arcgis import iter_features
+
+    for feature in iter_features(endpoint, where="1=1", out_fields=["CaseNumber", "CaseType"]):
+        ...
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+
+DEFAULT_PAGE_SIZE = 1000
+TIMEOUT = 60
+
+_layer_info: Dict[str, dict] = {}
+_layer_lock = threading.Lock()
+
+
+class ArcGISError(Exception):
+    """ArcGIS returned an error payload (these come back as HTTP 200)."""
+
+
+def _request(session: requests.Session, url: str, params: dict, method: str = "GET") -> dict:
+    if method == "POST":
+        response = session.post(url, data=params, timeout=TIMEOUT)
+    else:
+        response = session.get(url, params=params, timeout=TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        error = data["error"]
+        raise ArcGISError(f"{url}: {error.get('code')} {error.get('message')} {error.get('details') or ''}".strip())
+    return data
+
+
+def layer_info(endpoint: str, session: Optional[requests.Session] = None) -> dict:
+    """Layer metadata (fields, maxRecordCount, pagination support), cached per process."""
+    endpoint = endpoint.rstrip("/")
+    with _layer_lock:
+        if endpoint in _layer_info:
+            return _layer_info[endpoint]
+
+    try:
+        info = _request(session or requests.Session(), endpoint, {"f": "json"})
+    except (requests.RequestException, ValueError, ArcGISError) as e:
+        print(f"[ARCGIS] Layer info unavailable for {endpoint}: {e}")
+        info = {}
+
+    with _layer_lock:
+        _layer_info[endpoint] = info
+    return info
+
+
+def object_id_field(info: dict) -> Optional[str]:
+    if info.get("objectIdField"):
+        return info["objectIdField"]
+    for field in info.get("fields") or []:
+        if field.get("type") == "esriFieldTypeOID":
+            return field.get("name")
+    return None
+
+
+def supports_pagination(info: dict) -> bool:
+    return bool((info.get("advancedQueryCapabilities") or {}).get("supportsPagination"))
+
+
+def resolve_out_fields(info: dict, wanted: Optional[Iterable[str]]) -> str:
+    """
+    outFields value for the wanted field names.
+
+    Names are matched case-insensitively against the layer's fields and
+    missing ones are dropped (configs list CaseNumber and CASE_NUMBER style
+    alternatives). Falls back to "*" when nothing is wanted or the layer
+    doesn't publish its field list.
+    """
+    if not wanted:
+        return "*"
+    wanted = list(wanted)
+    if "*" in wanted:
+        return "*"
+
+    fields = info.get("fields")
+    if not fields:
+        return "*"
+
+    by_upper = {field["name"].upper(): field["name"] for field in fields if field.get("name")}
+    resolved = []
+    for name in wanted:
+        actual = by_upper.get(name.upper())
+        if actual and actual not in resolved:
+            resolved.append(actual)
+
+    oid = object_id_field(info)
+    if oid and oid not in resolved:
+        resolved.append(oid)
+
+    return ",".join(resolved) if resolved else "*"
+
+
+def iter_features(
+    endpoint: str,
+    where: str = "1=1",
+    out_fields: Optional[Iterable[str]] = None,
+    return_geometry: bool = True,
+    page_size: Optional[int] = None,
+    session: Optional[requests.Session] = None,
+    extra_params: Optional[dict] = None
+) -> Iterator[dict]:
+    """
+    Yield every feature matching `where`, page by page.
+
+    Args:
+        endpoint: Layer URL (.../FeatureServer/0)
+        where: SQL where clause
+        out_fields: Field names to return (None = all)
+        return_geometry: Include geometry
+        page_size: Records per request (capped at the server's maxRecordCount)
+        session: requests.Session to reuse connections
+        extra_params: Extra query params (e.g. outSR)
+    """
+    endpoint = endpoint.rstrip("/")
+    session = session or requests.Session()
+    info = layer_info(endpoint, session)
+
+    max_records = info.get("maxRecordCount") or DEFAULT_PAGE_SIZE
+    page_size = min(page_size or max_records, max_records)
+
+    params = {
+        "where": where,
+        "outFields": resolve_out_fields(info, out_fields),
+        "returnGeometry": "true" if return_geometry else "false",
+        "f": "json",
+        **(extra_params or {})
+    }
+
+    if supports_pagination(info):
+        yield from _iter_pages(endpoint, params, page_size, object_id_field(info), session)
+    else:
+        yield from _iter_by_object_ids(endpoint, params, page_size, session)
+
+
+def _iter_pages(endpoint: str, params: dict, page_size: int, oid_field: Optional[str], session: requests.Session) -> Iterator[dict]:
+    offset = 0
+    while True:
+        page_params = {**params, "resultOffset": offset, "resultRecordCount": page_size}
+        if oid_field:
+            page_params["orderByFields"] = oid_field
+
+        data = _request(session, f"{endpoint}/query", page_params)
+        features = data.get("features", [])
+        yield from features
+
+        offset += len(features)
+        # exceededTransferLimit means there's more, even if the server
+        # returned fewer rows than asked for (its own cap was lower)
+        if not features or (len(features) < page_size and not data.get("exceededTransferLimit")):
+            return
+
+
+def _iter_by_object_ids(endpoint: str, params: dict, chunk_size: int, session: requests.Session) -> Iterator[dict]:
+    ids_params = {"where": params["where"], "returnIdsOnly": "true", "f": "json"}
+    data = _request(session, f"{endpoint}/query", ids_params, method="POST")
+    object_ids: List[int] = sorted(data.get("objectIds") or [])
+
+    for start in range(0, len(object_ids), chunk_size):
+        chunk = object_ids[start:start + chunk_size]
+        chunk_params = {key: value for key, value in params.items() if key != "where"}
+        chunk_params["objectIds"] = ",".join(str(oid) for oid in chunk)
+        data = _request(session, f"{endpoint}/query", chunk_params, method="POST")
+        yield from data.get("features", [])
+
+
+# =============================================================================
+# WHERE clause helpers
+# =============================================================================
+
+def resolve_field(info: dict, candidates: Iterable[str]) -> Optional[str]:
+    """First candidate that exists on the layer (case-insensitive), with the layer's spelling."""
+    by_upper = {field["name"].upper(): field["name"] for field in info.get("fields") or [] if field.get("name")}
+    for name in candidates:
+        if name and name.upper() in by_upper:
+            return by_upper[name.upper()]
+    return None
+
+
+def sql_quote(value) -> str:
+    """Single-quoted SQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def in_predicate(field: str, values: Iterable) -> str:
+    return f"{field} IN ({','.join(sql_quote(v) for v in values)})"
+
+
+def date_predicate(field: str, min_date: str, standardized: bool = True) -> str:
+    """field >= min_date (YYYY-MM-DD). Standardized SQL needs the DATE keyword."""
+    if standardized:
+        return f"{field} >= DATE {sql_quote(min_date)}"
+    return f"{field} >= {sql_quote(min_date)}"
+
+
+def timestamp_predicate(field: str, epoch_ms: float, standardized: bool = True) -> str:
+    """field >= the given ArcGIS epoch-milliseconds instant (UTC)."""
+    stamp = datetime.utcfromtimestamp(epoch_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+    if standardized:
+        return f"{field} >= TIMESTAMP {sql_quote(stamp)}"
+    return f"{field} >= {sql_quote(stamp)}"
+
+
+def keyword_predicate(fields: Iterable[str], keywords: Iterable[str]) -> str:
+    """(UPPER(f1) LIKE '%KW1%' OR UPPER(f1) LIKE '%KW2%' OR UPPER(f2) ...)"""
+    terms = []
+    for field in fields:
+        for keyword in keywords:
+            escaped = str(keyword).upper().replace("'", "''")
+            terms.append(f"UPPER({field}) LIKE '%{escaped}%'")
+    return "(" + " OR ".join(terms) + ")"
+
+
+def supports_standardized_sql(info: dict) -> bool:
+    """Standardized queries (DATE literals, UPPER) - default on ArcGIS 10.3+ and hosted layers."""
+    return info.get("useStandardizedQueries", True) is not False
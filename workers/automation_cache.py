@@ -0,0 +1,119 @@
+"""
+Automation Config Cache
+=======================
+Automation rows by slug, so run_automation doesn't re-select the row on
+every run (or retry) of the same automation.
+
+- Only the columns the runner uses are fetched (AUTOMATION_COLUMNS) -
+  select("*") also pulled last_run_result, a copy of the previous run's
+  whole result.
+- Entries are trusted for AUTOMATION_CACHE_TTL seconds. After that a
+  one-column check of config_updated_at (migration 009) decides whether the
+  cached row is still current or needs a refetch.
+- prime() lets run_by_filter seed the cache with the rows it already
+  fetched in one query.
+- validate() checks a row handed over by a caller (a batch item that may
+  have waited in a queue) the same way before it is used or cached.
+
+Callers get deep copies, so merging override_config never touches the cache.
+
+Environment:
+    AUTOMATION_CACHE_TTL   seconds before a cached row is re-checked (default 300, 0 = every call)
+"""
+
+import os
+import copy
+import time
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from workers.db import get_supabase
+
+
+AUTOMATION_COLUMNS = "id, slug, name, template, status, config, geography, config_updated_at"
+TTL = float(os.environ.get("AUTOMATION_CACHE_TTL", 300))
+
+
+class AutomationCache:
+    """slug -> automation row, TTL + config_updated_at validated"""
+
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.checks = 0
+        self.loads = 0
+
+    def _store(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[row["slug"]] = (row, time.monotonic() + self.ttl)
+
+    def _fetch(self, slug: str) -> Optional[Dict[str, Any]]:
+        result = get_supabase().table("automations").select(AUTOMATION_COLUMNS).eq("slug", slug).execute()
+        self.loads += 1
+        if not result.data:
+            return None
+        self._store(result.data[0])
+        return result.data[0]
+
+    def get(self, slug: str) -> Optional[Dict[str, Any]]:
+        """Automation row (deep copy), or None if no such slug."""
+        entry = self._entries.get(slug)
+
+        if entry and time.monotonic() < entry[1]:
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+        if entry:
+            return self._check(entry[0])
+
+        row = self._fetch(slug)
+        return copy.deepcopy(row) if row else None
+
+    def validate(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Current version of a row loaded elsewhere (deep copy), or None if the
+        slug is gone. A live cache entry is used as is; otherwise the row is
+        kept only if its config_updated_at still matches.
+        """
+        entry = self._entries.get(row["slug"])
+        if entry and time.monotonic() < entry[1]:
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+        return self._check(row)
+
+    def _check(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """row if config_updated_at is unchanged (re-cached), else the refetched row."""
+        self.checks += 1
+        result = get_supabase().table("automations").select("config_updated_at").eq("slug", row["slug"]).execute()
+        if result.data and result.data[0].get("config_updated_at") == row.get("config_updated_at"):
+            self._store(row)
+            return copy.deepcopy(row)
+
+        fresh = self._fetch(row["slug"])
+        return copy.deepcopy(fresh) if fresh else None
+
+    def prime(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Seed the cache with rows fetched elsewhere (must include AUTOMATION_COLUMNS)."""
+        for row in rows:
+            self._store(row)
+
+    def invalidate(self, slug: Optional[str] = None) -> None:
+        with self._lock:
+            if slug is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(slug, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "checks": self.checks,
+            "loads": self.loads,
+        }
+
+
+automation_cache = AutomationCache()
@@ -9,6 +9,8 @@ from datetime import datetime
 from typing import Any, Optional
 from rq import get_current_job
 from redis import Redis
+from workers.progress import ProgressReporter
+from workers import job_events
 
 
 class BaseWorker:
@@ -18,6 +20,7 @@ class BaseWorker:
         self.job = get_current_job()
         self.redis = Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
         self.start_time = datetime.utcnow()
+        self.progress = ProgressReporter(self.job)
     
     def update_progress(
         self,
@@ -32,26 +35,11 @@ class BaseWorker:
             self.update_progress("Starting research...", percent=0)
             self.update_progress("Found 5 sources", percent=50, data={"sources": 5})
             self.update_progress("Complete!", percent=100)
-        """
-        if not self.job:
-            print(f"[PROGRESS] {message}")
-            return
-        
-        meta = self.job.meta or {}
-        meta.update({
-            "message": message,
-            "percent": percent,
-            "timestamp": datetime.utcnow().isoformat(),
-            "elapsed_seconds": (datetime.utcnow() - self.start_time).total_seconds()
-        })
-        
-        if data:
-            meta["data"] = data
-        
-        self.job.meta = meta
-        self.job.save_meta()
         
-        print(f"[PROGRESS] {percent}% - {message}")
+        Merged into job.meta (data merges into earlier data) and rate-limited -
+        see workers/progress.py. Final states (100 / -1) are always written.
+        """
+        self.progress.update(message, percent, data=data)
     
     def log(self, message: str, level: str = "info"):
         """Log a message."""
@@ -60,10 +48,15 @@ class BaseWorker:
     
     def publish_event(self, channel: str, event: dict):
         """
-        Publish event to Redis pub/sub for real-time streaming.
-        Your frontend can subscribe to these channels.
+        Publish event for real-time streaming.
+
+        Appended to the job's event stream (served with history and resume at
+        /jobs/{id}/stream, see workers/job_events.py) and published to the
+        pub/sub channel for existing subscribers.
         """
         import json
+        if self.job:
+            job_events.publish(self.redis, self.job.id, event.get("type", "event"), {"channel": channel, **event})
         self.redis.publish(channel, json.dumps(event))
 
 
@@ -81,20 +74,19 @@ def with_progress(func):
     """
     def wrapper(*args, **kwargs):
         job = get_current_job()
+        progress = ProgressReporter(job, echo=False)
         if job:
-            job.meta = {"message": "Starting...", "percent": 0}
-            job.save_meta()
+            progress.update("Starting...", 0)
         
         try:
             result = func(*args, **kwargs)
             if job:
-                job.meta = {"message": "Complete", "percent": 100}
-                job.save_meta()
+                # Merged - keeps whatever the function itself put in meta
+                progress.update("Complete", 100)
             return result
         except Exception as e:
             if job:
-                job.meta = {"message": f"Error: {str(e)}", "percent": -1}
-                job.save_meta()
+                progress.update(f"Error: {str(e)}", -1)
             raise
     
     return wrapper
@@ -0,0 +1,466 @@
+"""
+Batch Runner
+============
+Parallel fan-out for run_batch(parallel=True).
+
+Two backends, same scheduling rules:
+- rq       every slug becomes its own RQ job. Batch state lives in Redis, and
+           each finished job records its result and dispatches the next
+           eligible slugs, so the batch keeps moving with no coordinator process.
+- threads  bounded ThreadPoolExecutor in the current process (no Redis needed).
+
+A slug is only started while its template and its target host are under
+their concurrency caps, so 3000 county scrapers can run wide without 50 of
+them hammering the same ArcGIS server at once.
+
+Redis keys (rq backend), all expiring after BATCH_TTL:
+    batch:{id}           hash   total, limits, created_at
+    batch:{id}:pending   list   JSON items not started yet
+    batch:{id}:running   hash   "template:{t}" / "host:{h}" -> running count
+    batch:{id}:jobs      hash   RQ job id -> JSON item, for jobs holding slots
+    batch:{id}:done      list   JSON results in completion order
+
+A job's slots are freed exactly once, by whichever sees it end first
+(HDEL on batch:{id}:jobs decides): the job itself, its RQ on_failure /
+on_stopped callback, or reconcile(). A work-horse killed outright (OOM,
+SIGKILL, cold shutdown) runs neither the job's own bookkeeping nor a
+callback, so reconcile() - called by iter_results() and get_batch() while
+they wait - frees the slots of jobs RQ reports as failed, stopped, canceled
+or gone (abandoned started jobs are moved to failed first), records them as
+failed and dispatches the next slugs. A capped batch can't stall on a dead
+job.
+
+Usage:
+    from workers.runner import run_batch
+    from workers.batch import get_batch, iter_results
+
+    handle = run_batch(slugs, parallel=True, max_per_host=2)
+    for result in iter_results(handle["batch_id"]):
+        print(result["slug"], result["status"])
+
+Environment:
+    BATCH_BACKEND            rq | threads (default rq when REDIS_URL is set)
+    BATCH_MAX_WORKERS        threads backend pool size (default 8)
+    BATCH_MAX_PER_TEMPLATE   default per-template cap (default unlimited)
+    BATCH_MAX_PER_HOST       default per-host cap (default 4)
+    BATCH_JOB_TIMEOUT        RQ job timeout per slug (default 30m)
+    BATCH_TTL                seconds batch state is kept in Redis (default 86400)
+"""
+
+import os
+import json
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from workers.db import get_supabase
+
+
+MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 8))
+MAX_PER_TEMPLATE = int(os.environ["BATCH_MAX_PER_TEMPLATE"]) if os.environ.get("BATCH_MAX_PER_TEMPLATE") else None
+MAX_PER_HOST = int(os.environ.get("BATCH_MAX_PER_HOST", 4)) or None
+JOB_TIMEOUT = os.environ.get("BATCH_JOB_TIMEOUT", "30m")
+BATCH_TTL = int(os.environ.get("BATCH_TTL", 86400))
+
+# Config keys checked (in order) for the automation's target URL
+HOST_CONFIG_KEYS = ("permit_endpoint", "endpoint", "url", "base_url", "api_url")
+
+
+# =============================================================================
+# Scheduling
+# =============================================================================
+
+def target_host(config: dict) -> Optional[str]:
+    """Hostname an automation talks to, from its config (None if unknown)."""
+    config = config or {}
+    candidates = [config.get(key) for key in HOST_CONFIG_KEYS]
+    candidates += [value for value in config.values() if isinstance(value, str)]
+    for value in candidates:
+        if isinstance(value, str) and value.startswith(("http://", "https://")):
+            return urlparse(value).hostname
+    return None
+
+
+def plan_items(slugs: List[str], automations: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """
+    One {slug, template, host} item per slug, in the order given.
+
+    With automations (slug -> automation row, as loaded by run_by_filter) no
+    query is made and each item carries its row, so the job that runs it
+    doesn't load the automation again.
+    """
+    if automations is None:
+        rows = get_supabase().table("automations").select("slug, template, config").in_("slug", slugs).execute().data
+        by_slug = {row["slug"]: row for row in rows}
+    else:
+        by_slug = automations
+
+    items = []
+    for slug in slugs:
+        row = by_slug.get(slug, {})
+        item = {
+            "slug": slug,
+            "template": row.get("template"),
+            "host": target_host(row.get("config")),
+        }
+        if automations is not None and row:
+            item["automation"] = row
+        items.append(item)
+    return items
+
+
+def _slot_keys(item: dict) -> List[str]:
+    keys = []
+    if item.get("template"):
+        keys.append(f"template:{item['template']}")
+    if item.get("host"):
+        keys.append(f"host:{item['host']}")
+    return keys
+
+
+def _has_slot(item: dict, running: Dict[str, int], limits: dict) -> bool:
+    for key in _slot_keys(item):
+        cap = limits.get("max_per_template") if key.startswith("template:") else limits.get("max_per_host")
+        if cap and running.get(key, 0) >= cap:
+            return False
+    return True
+
+
+def take_eligible(pending: List[dict], running: Dict[str, int], limits: dict, free: Optional[int] = None) -> List[dict]:
+    """
+    Remove and return pending items that can start now, counting them into
+    `running`. Order is preserved; an item blocked by a busy host doesn't hold
+    up items behind it.
+    """
+    started = []
+    for item in list(pending):
+        if free is not None and len(started) >= free:
+            break
+        if _has_slot(item, running, limits):
+            for key in _slot_keys(item):
+                running[key] = running.get(key, 0) + 1
+            pending.remove(item)
+            started.append(item)
+    return started
+
+
+def summarize(results: List[dict], total: int) -> dict:
+    """run_batch-style summary of per-slug results."""
+    return {
+        "total": total,
+        "success": len([r for r in results if r["status"] == "success"]),
+        "failed": len([r for r in results if r["status"] == "failed"]),
+        "results": results
+    }
+
+
+def _execute(slug: str, automation: Optional[dict] = None) -> dict:
+    from workers.runner import run_automation
+
+    try:
+        result = run_automation(slug, automation=automation)
+        return {"slug": slug, "status": "success", "result": result}
+    except Exception as e:
+        return {"slug": slug, "status": "failed", "error": str(e)}
+
+
+def _limits(max_per_template: Optional[int], max_per_host: Optional[int]) -> dict:
+    return {
+        "max_per_template": max_per_template if max_per_template is not None else MAX_PER_TEMPLATE,
+        "max_per_host": max_per_host if max_per_host is not None else MAX_PER_HOST,
+    }
+
+
+# =============================================================================
+# Threads backend
+# =============================================================================
+
+def run_threaded(
+    slugs: List[str],
+    max_workers: int = MAX_WORKERS,
+    max_per_template: Optional[int] = None,
+    max_per_host: Optional[int] = None,
+    on_result: Optional[Callable[[dict], None]] = None,
+    automations: Optional[Dict[str, dict]] = None
+) -> dict:
+    """Run a batch on a bounded thread pool; returns the summary when all finish."""
+    batch_id = uuid.uuid4().hex[:12]
+    limits = _limits(max_per_template, max_per_host)
+    pending = plan_items(slugs, automations)
+    running: Dict[str, int] = {}
+    results = []
+
+    print(f"[BATCH {batch_id}] {len(slugs)} automations on {max_workers} threads {limits}")
+
+    from workers.run_writer import run_writer
+
+    with run_writer.batch(), ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"batch-{batch_id}") as pool:
+        futures = {}
+
+        def fill():
+            for item in take_eligible(pending, running, limits, free=max_workers - len(futures)):
+                futures[pool.submit(_execute, item["slug"], item.get("automation"))] = item
+
+        fill()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item = futures.pop(future)
+                for key in _slot_keys(item):
+                    running[key] -= 1
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            fill()
+
+    summary = summarize(results, len(slugs))
+    summary.update({"batch_id": batch_id, "backend": "threads"})
+    return summary
+
+
+# =============================================================================
+# RQ backend
+# =============================================================================
+
+def _redis():
+    from redis import Redis
+    return Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+
+
+def _key(batch_id: str, suffix: str = "") -> str:
+    return f"batch:{batch_id}{':' + suffix if suffix else ''}"
+
+
+def dispatch(batch_id: str, redis=None) -> int:
+    """Enqueue every pending slug that has a free slot. Returns how many were enqueued."""
+    from rq import Queue
+
+    redis = redis or _redis()
+    with redis.lock(_key(batch_id, "lock"), timeout=30, blocking_timeout=30):
+        meta = redis.hgetall(_key(batch_id))
+        if not meta:
+            return 0
+        limits = json.loads(meta[b"limits"])
+        pending = [json.loads(raw) for raw in redis.lrange(_key(batch_id, "pending"), 0, -1)]
+        running = {k.decode(): int(v) for k, v in redis.hgetall(_key(batch_id, "running")).items()}
+
+        started = take_eligible(pending, running, limits)
+        if not started:
+            return 0
+
+        from rq.job import Callback
+
+        queue = Queue(meta.get(b"queue", b"default").decode(), connection=redis)
+        job_ids = [f"batch-{batch_id}-{uuid.uuid4().hex[:12]}" for _ in started]
+        pipe = redis.pipeline()
+        for job_id, item in zip(job_ids, started):
+            raw = json.dumps(item, sort_keys=True)
+            pipe.lrem(_key(batch_id, "pending"), 1, raw)
+            pipe.hset(_key(batch_id, "jobs"), job_id, raw)
+            for slot in _slot_keys(item):
+                pipe.hincrby(_key(batch_id, "running"), slot, 1)
+        for suffix in ("running", "jobs"):
+            pipe.expire(_key(batch_id, suffix), BATCH_TTL)
+        pipe.execute()
+
+        for job_id, item in zip(job_ids, started):
+            queue.enqueue(
+                run_batch_item, batch_id, item,
+                job_id=job_id,
+                job_timeout=JOB_TIMEOUT,
+                result_ttl=BATCH_TTL,
+                failure_ttl=BATCH_TTL,
+                description=f"batch {batch_id}: {item['slug']}",
+                on_failure=Callback(on_batch_job_failure),
+                on_stopped=Callback(on_batch_job_stopped),
+            )
+        return len(started)
+
+
+def release(batch_id: str, job_id: str, result: Optional[dict] = None, error: Optional[str] = None, redis=None) -> bool:
+    """
+    Record a batch job's result and free its slots - once per job.
+
+    Returns False if the job was already released (or never held slots).
+    Without a result, a failed result with `error` is recorded.
+    """
+    redis = redis or _redis()
+    raw = redis.hget(_key(batch_id, "jobs"), job_id)
+    if raw is None or not redis.hdel(_key(batch_id, "jobs"), job_id):
+        return False
+
+    item = json.loads(raw)
+    if result is None:
+        result = {"slug": item["slug"], "status": "failed", "error": error or "job ended without a result"}
+    result.setdefault("finished_at", datetime.utcnow().isoformat())
+
+    pipe = redis.pipeline()
+    pipe.rpush(_key(batch_id, "done"), json.dumps(result, default=str))
+    pipe.expire(_key(batch_id, "done"), BATCH_TTL)
+    for slot in _slot_keys(item):
+        pipe.hincrby(_key(batch_id, "running"), slot, -1)
+    pipe.execute()
+    return True
+
+
+def reconcile(batch_id: str, redis=None) -> int:
+    """
+    Release jobs RQ reports as ended without having released themselves
+    (killed work-horse, stopped, canceled, expired), then dispatch.
+    Returns how many were released.
+    """
+    from rq import Queue
+    from rq.job import Job, JobStatus
+    from rq.registry import StartedJobRegistry
+
+    redis = redis or _redis()
+    job_ids = [job_id.decode() for job_id in redis.hkeys(_key(batch_id, "jobs"))]
+    if not job_ids:
+        return 0
+
+    # Started jobs whose worker stopped heartbeating are moved to failed
+    queue_name = (redis.hget(_key(batch_id), "queue") or b"default").decode()
+    StartedJobRegistry(queue=Queue(queue_name, connection=redis)).cleanup()
+
+    released = 0
+    for job_id, job in zip(job_ids, Job.fetch_many(job_ids, connection=redis)):
+        if job is None:
+            error = "job expired before it finished"
+        else:
+            status = job.get_status(refresh=False)
+            if status not in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+                continue
+            latest = job.latest_result()
+            exc_string = (latest.exc_string or "").strip() if latest else ""
+            reason = exc_string.splitlines()[-1] if exc_string else "worker died without recording an error"
+            error = f"job {getattr(status, 'value', status)}: {reason}"
+        if release(batch_id, job_id, error=error, redis=redis):
+            released += 1
+
+    if released:
+        print(f"[BATCH {batch_id}] released {released} ended job(s) that never freed their slots")
+        dispatch(batch_id, redis)
+    return released
+
+
+def on_batch_job_failure(job, connection, exc_type, value, traceback):
+    """RQ on_failure: free the slots of a failed batch job (no-op if it already did)."""
+    batch_id = job.args[0]
+    if release(batch_id, job.id, error=f"{getattr(exc_type, '__name__', exc_type)}: {value}", redis=connection):
+        dispatch(batch_id, connection)
+
+
+def on_batch_job_stopped(job, connection):
+    """RQ on_stopped: free the slots of a stopped batch job."""
+    batch_id = job.args[0]
+    if release(batch_id, job.id, error="job stopped", redis=connection):
+        dispatch(batch_id, connection)
+
+
+def run_batch_item(batch_id: str, item: dict) -> dict:
+    """RQ job: run one slug, record its result, free its slots, start the next ones."""
+    from rq import get_current_job
+
+    result = _execute(item["slug"], item.get("automation"))
+    result["finished_at"] = datetime.utcnow().isoformat()
+
+    redis = _redis()
+    release(batch_id, get_current_job().id, result, redis=redis)
+    dispatch(batch_id, redis)
+
+    if result["status"] == "failed":
+        raise RuntimeError(f"{item['slug']}: {result['error']}")
+    return result
+
+
+def enqueue_batch(
+    slugs: List[str],
+    max_per_template: Optional[int] = None,
+    max_per_host: Optional[int] = None,
+    queue: str = "default",
+    automations: Optional[Dict[str, dict]] = None
+) -> dict:
+    """Create a batch in Redis and enqueue its first wave. Returns the batch handle."""
+    batch_id = uuid.uuid4().hex[:12]
+    limits = _limits(max_per_template, max_per_host)
+    items = plan_items(slugs, automations)
+
+    redis = _redis()
+    pipe = redis.pipeline()
+    pipe.hset(_key(batch_id), mapping={
+        "total": len(items),
+        "limits": json.dumps(limits),
+        "queue": queue,
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    if items:
+        pipe.rpush(_key(batch_id, "pending"), *[json.dumps(item, sort_keys=True) for item in items])
+    for suffix in ("", "pending"):
+        pipe.expire(_key(batch_id, suffix), BATCH_TTL)
+    pipe.execute()
+
+    queued = dispatch(batch_id, redis)
+    print(f"[BATCH {batch_id}] {len(items)} automations, {queued} enqueued now {limits}")
+
+    return {
+        "batch_id": batch_id,
+        "backend": "rq",
+        "total": len(items),
+        "queued": queued,
+        "limits": limits,
+    }
+
+
+def get_batch(batch_id: str) -> dict:
+    """Progress and results so far for an RQ batch."""
+    redis = _redis()
+    meta = redis.hgetall(_key(batch_id))
+    if not meta:
+        raise ValueError(f"Batch not found: {batch_id}")
+    reconcile(batch_id, redis)
+
+    total = int(meta[b"total"])
+    results = [json.loads(raw) for raw in redis.lrange(_key(batch_id, "done"), 0, -1)]
+    running = Counter({k.decode(): int(v) for k, v in redis.hgetall(_key(batch_id, "running")).items()})
+
+    summary = summarize(results, total)
+    summary.update({
+        "batch_id": batch_id,
+        "backend": "rq",
+        "pending": redis.llen(_key(batch_id, "pending")),
+        "running": {k: v for k, v in running.items() if v > 0},
+        "done": len(results) >= total,
+        "limits": json.loads(meta[b"limits"]),
+        "created_at": meta[b"created_at"].decode(),
+    })
+    return summary
+
+
+def iter_results(batch_id: str, timeout: Optional[float] = None, poll_interval: float = 2.0) -> Iterator[dict]:
+    """Yield an RQ batch's per-slug results as they finish."""
+    redis = _redis()
+    total = int(redis.hget(_key(batch_id), "total") or 0)
+    deadline = time.monotonic() + timeout if timeout else None
+    seen = 0
+
+    while seen < total:
+        for raw in redis.lrange(_key(batch_id, "done"), seen, -1):
+            seen += 1
+            yield json.loads(raw)
+        if seen >= total:
+            break
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id}: {seen}/{total} finished before timeout")
+        time.sleep(poll_interval)
+        # Nothing new for a while - free the slots of jobs that died without releasing them
+        if redis.llen(_key(batch_id, "done")) <= seen:
+            reconcile(batch_id, redis)
+
+
+def default_backend() -> str:
+    return os.environ.get("BATCH_BACKEND") or ("rq" if os.environ.get("REDIS_URL") else "threads")
@@ -0,0 +1,268 @@
+"""
+Content-Addressed Blob Store
+============================
+Large JSON values moved out of log rows, stored once per distinct content.
+
+execution_logs and v2_pipeline_logs kept every input and output inline.
+The same compressed client configs (icp_config_compressed,
+industry_research_compressed, ...) were copied into the input of every step
+of every run, and each completed step kept the whole raw OpenAI response.
+offload() replaces every top-level value of such a dict that is at least
+BLOB_MIN_BYTES of JSON with a reference:
+
+    {"$blob": "sha256:<hex>", "bytes": 18234}
+
+The value is stored gzipped under its hash, so the tenth step that carries
+the same ICP config adds a 90-byte reference to its row and no new blob.
+hydrate() / hydrate_rows() put the values back - readers that need the
+content call them; list views can keep the references.
+
+Blobs are immutable, so fetched blobs are cached in-process (LRU, as JSON
+bytes - every caller gets its own decoded copy) and a hash already stored
+by this process is never uploaded again.
+
+The Supabase bucket is created by database/migrations/013_log_blobs_bucket.sql.
+If an upload fails anyway (bucket missing, Storage down), offload_row()
+keeps the value inline and offloading pauses for BLOB_RETRY_AFTER seconds,
+so a broken store doesn't cost a failing request on every log write.
+
+Usage:
+    from workers.blobs import offload, hydrate, hydrate_rows
+
+    row["input"] = offload(step_input)
+    rows = hydrate_rows(result.data)            # input/output of each row
+
+Environment:
+    BLOB_BACKEND     supabase | local | off (default supabase; off stores inline)
+    BLOB_BUCKET      Supabase Storage bucket (default log-blobs)
+    BLOB_DIR         local backend directory (default ./tmp/blobs)
+    BLOB_MIN_BYTES   smallest value (JSON bytes) that is offloaded (default 2048)
+    BLOB_RETRY_AFTER seconds offloading pauses after a failed upload (default 60)
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+BACKEND = os.environ.get("BLOB_BACKEND", "supabase")
+BUCKET = os.environ.get("BLOB_BUCKET", "log-blobs")
+BLOB_DIR = Path(os.environ.get("BLOB_DIR", Path(__file__).parent.parent / "tmp" / "blobs"))
+MIN_BYTES = int(os.environ.get("BLOB_MIN_BYTES", 2048))
+RETRY_AFTER = float(os.environ.get("BLOB_RETRY_AFTER", 60))
+
+REF_KEY = "$blob"
+LOG_FIELDS = ("input", "output")
+
+
+def canonical_json(value: Any) -> bytes:
+    """Stable JSON encoding - equal content always hashes the same."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and REF_KEY in value and len(value) <= 2
+
+
+class BlobStore:
+    """hash -> gzipped JSON, in Supabase Storage or a local directory"""
+
+    def __init__(self, backend: str = BACKEND, bucket: str = BUCKET, directory: Path = BLOB_DIR, cache_size: int = 512):
+        self.backend = backend
+        self.bucket = bucket
+        self.directory = Path(directory)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stored = set()
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.dedup_hits = 0
+        self.fetches = 0
+        self.failures = 0
+        self._paused_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "off" and time.monotonic() >= self._paused_until
+
+    def pause(self, seconds: float = RETRY_AFTER) -> None:
+        """Stop offloading for a while (values stay inline) after a failed upload."""
+        self.failures += 1
+        self._paused_until = time.monotonic() + seconds
+
+    @staticmethod
+    def _path(digest: str) -> str:
+        return f"{digest[:2]}/{digest}.json.gz"
+
+    def _remember(self, digest: str, data: bytes) -> None:
+        with self._lock:
+            self._cache[digest] = data
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def put(self, value: Any, data: Optional[bytes] = None) -> Dict[str, Any]:
+        """Store a JSON value; returns its reference."""
+        data = data if data is not None else canonical_json(value)
+        digest = hashlib.sha256(data).hexdigest()
+        ref = {REF_KEY: f"sha256:{digest}", "bytes": len(data)}
+
+        if digest in self._stored:
+            self.dedup_hits += 1
+            return ref
+
+        path = self._path(digest)
+        if self.backend == "local":
+            target = self.directory / path
+            if target.exists():
+                self.dedup_hits += 1
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(gzip.compress(data, compresslevel=6))
+                tmp.replace(target)
+                self.puts += 1
+        else:
+            from workers.db import get_supabase
+            try:
+                get_supabase().storage.from_(self.bucket).upload(
+                    path, gzip.compress(data, compresslevel=6), {"content-type": "application/gzip"}
+                )
+                self.puts += 1
+            except Exception as e:
+                # Same content already stored (by any process) - that's the point
+                if "exist" not in str(e).lower() and "duplicate" not in str(e).lower():
+                    raise
+                self.dedup_hits += 1
+
+        self._stored.add(digest)
+        self._remember(digest, data)
+        return ref
+
+    def get(self, ref: Dict[str, Any]) -> Any:
+        """Value behind a reference."""
+        digest = ref[REF_KEY].split(":", 1)[1]
+        with self._lock:
+            data = self._cache.get(digest)
+            if data is not None:
+                self._cache.move_to_end(digest)
+        if data is not None:
+            return json.loads(data)
+
+        path = self._path(digest)
+        if self.backend == "local":
+            compressed = (self.directory / path).read_bytes()
+        else:
+            from workers.db import get_supabase
+            compressed = get_supabase().storage.from_(self.bucket).download(path)
+        self.fetches += 1
+
+        data = gzip.decompress(compressed)
+        self._stored.add(digest)
+        self._remember(digest, data)
+        return json.loads(data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "cached": len(self._cache),
+            "puts": self.puts,
+            "dedup_hits": self.dedup_hits,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "paused": not self.enabled and self.backend != "off",
+        }
+
+
+blob_store = BlobStore()
+
+
+def offload(value: Any, min_bytes: int = MIN_BYTES, store: Optional[BlobStore] = None) -> Any:
+    """
+    Replace large parts of a value with blob references.
+
+    For a dict, each top-level value of at least min_bytes JSON is offloaded
+    (small keys stay inline and queryable); any other large value is
+    offloaded whole. Values that are already references are left alone.
+    """
+    store = store or blob_store
+    if not store.enabled or value is None or is_ref(value):
+        return value
+
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if is_ref(item) or item is None or isinstance(item, (bool, int, float)):
+                out[key] = item
+                continue
+            data = canonical_json(item)
+            out[key] = store.put(item, data) if len(data) >= min_bytes else item
+        return out
+
+    data = canonical_json(value)
+    return store.put(value, data) if len(data) >= min_bytes else value
+
+
+def _refs(value: Any) -> List[Dict[str, Any]]:
+    if is_ref(value):
+        return [value]
+    if isinstance(value, dict):
+        return [item for item in value.values() if is_ref(item)]
+    return []
+
+
+def hydrate(value: Any, store: Optional[BlobStore] = None) -> Any:
+    """Inverse of offload()."""
+    store = store or blob_store
+    if is_ref(value):
+        return store.get(value)
+    if isinstance(value, dict) and any(is_ref(item) for item in value.values()):
+        return {key: store.get(item) if is_ref(item) else item for key, item in value.items()}
+    return value
+
+
+def hydrate_rows(rows: Iterable[Dict[str, Any]], fields: Iterable[str] = LOG_FIELDS, store: Optional[BlobStore] = None) -> List[Dict[str, Any]]:
+    """
+    Hydrate the given fields of every row in place (and return the rows).
+
+    Distinct blobs are fetched once each, in parallel.
+    """
+    store = store or blob_store
+    rows = list(rows)
+    fields = tuple(fields)
+
+    pending = {}
+    for row in rows:
+        for field in fields:
+            for ref in _refs(row.get(field)):
+                pending.setdefault(ref[REF_KEY], ref)
+    if len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+            list(pool.map(store.get, pending.values()))
+
+    for row in rows:
+        for field in fields:
+            if field in row:
+                row[field] = hydrate(row[field], store)
+    return rows
+
+
+def offload_row(row: Dict[str, Any], fields: Iterable[str] = LOG_FIELDS, store: Optional[BlobStore] = None) -> Dict[str, Any]:
+    """Copy of a log row with the given fields offloaded (kept inline if the store fails)."""
+    store = store or blob_store
+    out = dict(row)
+    for field in fields:
+        if field in out:
+            try:
+                out[field] = offload(out[field], store=store)
+            except Exception as e:
+                store.pause()
+                print(f"[BLOBS] Could not offload {field}, storing inline (offloading paused {RETRY_AFTER:g}s): {e}")
+    return out
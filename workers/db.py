@@ -0,0 +1,233 @@
+"""
+Shared Supabase Client
+======================
+One pooled Supabase client per process instead of a fresh client per call.
+
+Every API request and worker job used to call create_client(), which meant a
+new httpx connection pool (and TLS handshake) each time. This module keeps a
+process-wide client whose PostgREST session uses keep-alive HTTP/2 connections
+with configurable pool limits. After an RQ fork the child drops the inherited
+client and builds its own, so sockets are never shared across processes.
+
+Usage:
+    from workers.db import get_supabase
+
+    supabase = get_supabase()
+    supabase.table("automations").select("slug").execute()
+
+    # Buffered writers store rows as JSON will carry them - one datetime or
+    # NaN must not make a whole bulk request fail to encode
+    row = json_safe(row)
+
+Environment:
+    SUPABASE_POOL_MAX_CONNECTIONS   max open connections (default 20)
+    SUPABASE_POOL_MAX_KEEPALIVE     idle keep-alive connections (default 10)
+    SUPABASE_POOL_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+    SUPABASE_HTTP2                  "false" to disable HTTP/2 (default true)
+    SUPABASE_TIMEOUT                request timeout in seconds (default 120)
+"""
+
+import os
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestSession
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+POOL_MAX_CONNECTIONS = _env_int("SUPABASE_POOL_MAX_CONNECTIONS", 20)
+POOL_MAX_KEEPALIVE = _env_int("SUPABASE_POOL_MAX_KEEPALIVE", 10)
+POOL_KEEPALIVE_EXPIRY = _env_float("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30.0)
+HTTP2_ENABLED = os.environ.get("SUPABASE_HTTP2", "true").lower() not in ("0", "false", "no")
+REQUEST_TIMEOUT = _env_float("SUPABASE_TIMEOUT", 120.0)
+
+
+class _PoolMetrics:
+    """Request counters and latency for the pooled session (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.total_latency = 0.0
+            self.max_latency = 0.0
+            self.last_latency = None
+            self.last_error = None
+
+    def on_request(self, request: httpx.Request):
+        request.extensions["started"] = time.perf_counter()
+
+    def on_response(self, response: httpx.Response):
+        started = response.request.extensions.get("started")
+        latency = time.perf_counter() - started if started else 0.0
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.last_latency = latency
+            if response.status_code >= 500:
+                self.errors += 1
+                self.last_error = f"HTTP {response.status_code}"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.total_latency / self.requests if self.requests else None
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_latency_ms": round(avg * 1000, 1) if avg is not None else None,
+                "max_latency_ms": round(self.max_latency * 1000, 1),
+                "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+                "last_error": self.last_error,
+            }
+
+
+_metrics = _PoolMetrics()
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session is a keep-alive pool with metrics hooks."""
+
+    def create_session(self, base_url, headers, timeout) -> PostgrestSession:
+        return PostgrestSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={
+                "request": [_metrics.on_request],
+                "response": [_metrics.on_response],
+            },
+        )
+
+
+class PooledClient(Client):
+    """Supabase client that builds its PostgREST layer on the pooled session."""
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=REQUEST_TIMEOUT) -> SyncPostgrestClient:
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+
+_lock = threading.Lock()
+_client: Optional[Client] = None
+_client_pid: Optional[int] = None
+_created_at: Optional[str] = None
+_clients_created = 0
+
+
+def _build_client() -> Client:
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+
+    options = ClientOptions(postgrest_client_timeout=REQUEST_TIMEOUT)
+    return PooledClient.create(url, key, options)
+
+
+def get_supabase() -> Client:
+    """
+    Get the process-wide Supabase client.
+
+    Thread-safe. Built lazily on first use and rebuilt if the process was
+    forked (e.g. an RQ work horse) so each process owns its connections.
+    """
+    global _client, _client_pid, _created_at, _clients_created
+
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid:
+        return client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = _build_client()
+            _client_pid = pid
+            _created_at = datetime.utcnow().isoformat()
+            _clients_created += 1
+        return _client
+
+
+def reset_supabase():
+    """Drop the cached client (the next get_supabase() builds a new one)."""
+    global _client, _client_pid
+    with _lock:
+        client, _client, _client_pid = _client, None, None
+    if client is not None and client._postgrest is not None:
+        try:
+            client._postgrest.aclose()
+        except Exception:
+            pass
+
+
+def json_safe(value: Any) -> Any:
+    """value as a JSON request body carries it: datetimes, Decimals, ... as strings, NaN/Infinity as null."""
+    return json.loads(json.dumps(value, default=str), parse_constant=lambda constant: None)
+
+
+def _after_fork_in_child():
+    # Inherited sockets belong to the parent - forget them without closing
+    global _client, _client_pid, _lock, _metrics
+    _lock = threading.Lock()
+    _client = None
+    _client_pid = None
+    _metrics = _PoolMetrics()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def pool_stats() -> dict:
+    """Pool configuration and request metrics for this process."""
+    return {
+        "pid": os.getpid(),
+        "client_ready": _client is not None and _client_pid == os.getpid(),
+        "clients_created": _clients_created,
+        "created_at": _created_at,
+        "http2": HTTP2_ENABLED,
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": POOL_MAX_KEEPALIVE,
+        "keepalive_expiry_seconds": POOL_KEEPALIVE_EXPIRY,
+        **_metrics.snapshot(),
+    }
+
+
+def ping(table: str = "automations") -> dict:
+    """Run a one-row query and report round-trip latency."""
+    start = time.perf_counter()
+    try:
+        get_supabase().table(table).select("id").limit(1).execute()
+        return {"status": "connected", "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        return {"status": "error", "error": str(e), "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
@@ -0,0 +1,120 @@
+"""
+Job Event Streams
+=================
+Per-job event history in a Redis Stream, for /jobs/{id}/stream.
+
+Progress used to be visible only by polling the job's RQ meta, and
+BaseWorker.publish_event() used pub/sub - an event published before the
+dashboard subscribed, or while it was reconnecting, was gone. Every event is
+now appended (XADD) to the job's own stream:
+
+    job_events:{job_id}    entries {"type": "progress", "data": "<json>"}
+
+Readers XREAD from the last entry id they saw, so a subscriber that connects
+late gets the history and one that reconnects with Last-Event-ID gets exactly
+what it missed. Entry ids are the SSE event ids.
+
+Who writes:
+    - the API, when a job is submitted ("queued")
+    - ProgressReporter, on every (throttled) meta write ("progress")
+    - BaseWorker.publish_event() (its own event types)
+    - RQ success/failure callbacks on jobs submitted through the API
+      ("finished" / "failed") - readers stop after a terminal event
+
+Retention: each stream is capped at roughly JOB_EVENTS_MAXLEN entries
+(XADD MAXLEN ~, oldest trimmed first) and expires JOB_EVENTS_TTL seconds
+after its last event. Publishing never raises - a lost event must not fail
+the job.
+
+Usage:
+    from workers import job_events
+
+    job_events.publish(redis, job.id, "progress", {"message": "...", "percent": 40})
+    for event_id, event in job_events.read(redis, job.id, last_id="0"):
+        ...
+
+Environment:
+    JOB_EVENTS_MAXLEN   approximate max entries per job stream (default 1000)
+    JOB_EVENTS_TTL      seconds a stream is kept after its last event (default 86400)
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+MAXLEN = int(os.environ.get("JOB_EVENTS_MAXLEN", 1000))
+TTL = int(os.environ.get("JOB_EVENTS_TTL", 86400))
+
+TERMINAL_TYPES = ("finished", "failed")
+
+
+def stream_key(job_id: str) -> str:
+    return f"job_events:{job_id}"
+
+
+def publish(redis, job_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Append an event to the job's stream. Returns its entry id (None if it failed)."""
+    key = stream_key(job_id)
+    fields = {
+        "type": event_type,
+        "data": json.dumps(data or {}, default=str),
+        "at": datetime.utcnow().isoformat(),
+    }
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.xadd(key, fields, maxlen=MAXLEN, approximate=True)
+        pipe.expire(key, TTL)
+        event_id, _ = pipe.execute()
+    except Exception as e:
+        print(f"[EVENTS] Could not publish {event_type} for job {job_id}: {e}")
+        return None
+    return event_id.decode() if isinstance(event_id, bytes) else event_id
+
+
+def decode(event_id, fields: Dict) -> Tuple[str, Dict[str, Any]]:
+    """(id, {"type", "data", "at"}) for a raw stream entry."""
+    fields = {
+        (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+        for key, value in fields.items()
+    }
+    try:
+        data = json.loads(fields.get("data") or "{}")
+    except ValueError:
+        data = {"raw": fields.get("data")}
+    event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+    return event_id, {"type": fields.get("type", "event"), "data": data, "at": fields.get("at")}
+
+
+def read(redis, job_id: str, last_id: str = "0", count: int = 100, block_ms: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Events after last_id, oldest first ("0" = from the beginning).
+
+    block_ms waits that long for the first new event (XREAD BLOCK); None
+    returns immediately.
+    """
+    response = redis.xread({stream_key(job_id): last_id}, count=count, block=block_ms)
+    return [decode(event_id, fields) for _, entries in response or [] for event_id, fields in entries]
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    return event.get("type") in TERMINAL_TYPES
+
+
+# =============================================================================
+# RQ callbacks (on_success= / on_failure= when enqueuing)
+# =============================================================================
+
+def on_success(job, connection, result, *args, **kwargs):
+    summary = result if isinstance(result, dict) else {"result": result}
+    # Keep the stream entry small - the full result is at /jobs/{id}
+    summary = {key: value for key, value in summary.items() if isinstance(value, (str, int, float, bool, type(None)))}
+    publish(connection, job.id, "finished", {"status": "finished", "result": summary})
+
+
+def on_failure(job, connection, exc_type, value, traceback):
+    publish(connection, job.id, "failed", {
+        "status": "failed",
+        "error": {"type": getattr(exc_type, "__name__", str(exc_type)), "message": str(value)},
+    })
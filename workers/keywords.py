@@ -0,0 +1,116 @@
+"""
+Keyword Matcher
+===============
+Case-insensitive multi-keyword search compiled once per keyword list.
+
+filter_by_keywords used to upper-case every field value and test each
+keyword with `in` - O(fields x keywords) string scans per feature. A
+KeywordMatcher folds the whole list into one regex, so the (upper-cased)
+text is scanned once, and reports which keywords matched.
+
+The regex is built from a trie of the keywords (shared prefixes factored
+out - a flat "A|B|C" alternation is slower than the `in` loop in Python's
+re), wrapped in a lookahead so every position is tried and the longest
+keyword starting there is found. Keywords contained in a matched keyword
+("DATA" in "DATA CENTER") are added from a precomputed table, so the result
+is exactly the set of keywords that occur in the text.
+
+Matchers are cached by keyword list (get_matcher), so 750 jurisdictions
+sharing a list - and every run in a warm worker - compile it once.
+
+Usage:
+    from workers.keywords import get_matcher
+
+    matcher = get_matcher(["WAREHOUSE", "DATA CENTER"])
+    matcher.matches("New data center campus")     # ["DATA CENTER"]
+    matcher.search("single family")                # False
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex matching any of the words, longest first, as a nested trie of groups."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        ends_here = "" in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        # Greedy "?" tries the longer continuation first
+        return group + "?" if ends_here else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Compiled case-insensitive matcher for a fixed keyword list"""
+
+    __slots__ = ("keywords", "pattern", "_canonical", "_contained")
+
+    def __init__(self, keywords: Iterable[str]):
+        # Dedupe case-insensitively, keep the first spelling
+        canonical: Dict[str, str] = {}
+        for keyword in keywords:
+            if keyword and str(keyword).strip():
+                canonical.setdefault(str(keyword).upper(), str(keyword))
+
+        self.keywords: Tuple[str, ...] = tuple(canonical.values())
+        self._canonical = canonical
+
+        folded = sorted(canonical, key=len, reverse=True)
+        self.pattern = re.compile("(?=(" + _trie_pattern(folded) + "))") if folded else None
+
+        # keyword -> other keywords that occur inside it
+        self._contained: Dict[str, Tuple[str, ...]] = {
+            outer: tuple(inner for inner in folded if inner != outer and inner in outer)
+            for outer in folded
+        }
+
+    def search(self, text) -> bool:
+        """True if any keyword occurs in text."""
+        return bool(self.pattern and text and self.pattern.search(str(text).upper()))
+
+    def matches(self, text) -> List[str]:
+        """Keywords (original spelling, list order) that occur in text."""
+        if not self.pattern or not text:
+            return []
+        found = set()
+        for match in self.pattern.finditer(str(text).upper()):
+            folded = match.group(1)
+            if folded not in found:
+                found.add(folded)
+                found.update(self._contained.get(folded, ()))
+        return [keyword for folded, keyword in self._canonical.items() if folded in found]
+
+    def matches_any(self, values: Iterable) -> List[str]:
+        """Keywords occurring in any of the values."""
+        text = "\n".join(str(v) for v in values if v)
+        return self.matches(text)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __repr__(self):
+        return f"<KeywordMatcher {len(self.keywords)} keywords>"
+
+
+@lru_cache(maxsize=1024)
+def _compiled(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """Matcher for a keyword list, compiled once per distinct list."""
+    return _compiled(tuple(keywords))
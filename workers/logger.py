@@ -10,126 +10,374 @@ Usage:
     log = ExecutionLogger("scrapers.permits", input_params)
     log.note("testing new endpoint")
     log.tag("test", "permits")
-    
+
     try:
         result = do_work()
         log.success(result)
     except Exception as e:
         log.fail(e)
+
+Writes are buffered: the logger keeps the row locally (its id is generated
+here, so log_id is set right away) and note()/tag()/meta() only mark fields
+as changed. A background thread writes every logger with changes once per
+LOG_FLUSH_INTERVAL, all of them in one bulk upsert, sending only the changed
+fields after the first write. Large input/output values are stored in the
+blob store (workers/blobs.py) and the row keeps references. success()/fail() wake it up so the final state
+goes out promptly. A short run ends up as a single insert; a loop calling
+meta() costs nothing per call.
+
+Nothing on the caller's path waits for Supabase. Changed loggers wait in a
+bounded queue (LOG_QUEUE_SIZE). When it's full, an intermediate update is
+not queued, and the logger's change goes out with its next write. A final
+update waits up to LOG_BLOCK_TIMEOUT for room, then writes from the caller's
+thread (backpressure) rather than lose the result. A failed write of a
+finished logger (final status) is kept on a retry list the next flush
+drains - it has no later change to go out with.
+
+Changes are made JSON-safe when they're taken (workers/db.py json_safe),
+and a bulk upsert that fails anyway is retried row by row, so one row the
+server rejects can't hold back the others. A logger whose write has failed
+LOG_MAX_ATTEMPTS times in a row drops those changes (counted in "dropped").
+
+flush_logs() writes everything pending now - run_automation calls it before
+a job returns (a forked RQ work-horse exits right after), and it's
+registered with atexit.
+
+Environment:
+    LOG_FLUSH_INTERVAL   seconds between background writes (default 2)
+    LOG_QUEUE_SIZE       loggers with pending changes before backpressure (default 1000)
+    LOG_BLOCK_TIMEOUT    seconds a final update waits for queue room (default 5)
+    LOG_MAX_ATTEMPTS     failed writes of one logger's changes before they're dropped (default 5)
 """
 
 import os
+import uuid
+import queue
+import atexit
+import threading
 import traceback
+from collections import deque
 from datetime import datetime
-from typing import Optional, Any
-from supabase import create_client
+from typing import Optional, Any, Dict, List
+from workers.db import get_supabase, json_safe
+from workers.blobs import offload_row
+
+
+FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 2))
+QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 1000))
+BLOCK_TIMEOUT = float(os.environ.get("LOG_BLOCK_TIMEOUT", 5))
+MAX_ATTEMPTS = int(os.environ.get("LOG_MAX_ATTEMPTS", 5))
+
+FINAL_STATUSES = ("success", "failed")
+
+
+class LogFlusher:
+    """Background writer shared by every ExecutionLogger in the process"""
+
+    def __init__(self, table: str = "execution_logs", interval: float = FLUSH_INTERVAL, maxsize: int = QUEUE_SIZE):
+        self.table = table
+        self.interval = interval
+        self._queue: "queue.Queue[ExecutionLogger]" = queue.Queue(maxsize=maxsize)
+        self._retry: "deque[ExecutionLogger]" = deque()    # finished loggers whose write failed
+        self._wake = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self.writes = 0
+        self.rows_written = 0
+        self.deferred = 0
+        self.blocked = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def submit(self, logger: "ExecutionLogger", final: bool = False) -> None:
+        """Queue a logger with changes (at most once until it's written)."""
+        self._ensure_thread()
+        with logger._lock:
+            if logger._queued:
+                if final:
+                    self._wake.set()
+                return
+            logger._queued = True
+
+        try:
+            self._queue.put_nowait(logger)
+        except queue.Full:
+            if not final:
+                # Stays dirty - goes out with the logger's next queued write
+                with logger._lock:
+                    logger._queued = False
+                self.deferred += 1
+                return
+            try:
+                self._queue.put(logger, timeout=BLOCK_TIMEOUT)
+            except queue.Full:
+                with logger._lock:
+                    logger._queued = False
+                self.blocked += 1
+                self.write([logger])
+                return
+
+        if final:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write every queued logger now. Returns rows written."""
+        loggers: List[ExecutionLogger] = []
+        while self._retry:
+            loggers.append(self._retry.popleft())
+        while True:
+            try:
+                loggers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return self.write(loggers)
+
+    def write(self, loggers: List["ExecutionLogger"]) -> int:
+        """Upsert the pending changes of these loggers, one request per column set."""
+        with self._write_lock:
+            groups: Dict[frozenset, List[tuple]] = {}
+            for logger in loggers:
+                changes = logger._take_changes()
+                if changes:
+                    # Large input/output values go to the blob store (workers/blobs.py)
+                    changes = offload_row(changes)
+                    groups.setdefault(frozenset(changes), []).append((logger, changes))
+
+            written = 0
+            for entries in groups.values():
+                try:
+                    self._upsert([changes for _, changes in entries])
+                except Exception as e:
+                    self.errors += 1
+                    if len(entries) == 1:
+                        self._failed(*entries[0], e)
+                        continue
+                    # Find the bad rows instead of failing the whole group again
+                    print(f"[LOGS] Write of {len(entries)} log rows failed, retrying row by row: {e}")
+                    for logger, changes in entries:
+                        try:
+                            self._upsert([changes])
+                        except Exception as row_error:
+                            self.errors += 1
+                            self._failed(logger, changes, row_error)
+                            continue
+                        self._succeeded(logger)
+                        self.writes += 1
+                        written += 1
+                    continue
+                for logger, _ in entries:
+                    self._succeeded(logger)
+                self.writes += 1
+                written += len(entries)
+            self.rows_written += written
+            return written
+
+    def _upsert(self, rows: List[dict]) -> None:
+        get_supabase().table(self.table).upsert(rows, on_conflict="id", returning="minimal").execute()
+
+    @staticmethod
+    def _succeeded(logger: "ExecutionLogger") -> None:
+        logger._written = True
+        logger._failures = 0
+
+    def _failed(self, logger: "ExecutionLogger", changes: dict, error: Exception) -> None:
+        """Put a logger's changes back for another try, or drop them after MAX_ATTEMPTS."""
+        logger._failures += 1
+        if logger._failures >= MAX_ATTEMPTS:
+            logger._failures = 0
+            self.dropped += 1
+            print(f"[LOGS] Dropping changes of log {logger.log_id} after {MAX_ATTEMPTS} failed writes: {error}")
+            return
+        print(f"[LOGS] Write of log {logger.log_id} failed, will retry: {error}")
+        logger._restore(changes)
+        if changes.get("status") in FINAL_STATUSES:
+            self._retry_final(logger)
+        else:
+            self.submit(logger)
+
+    def _retry_final(self, logger: "ExecutionLogger") -> None:
+        # Not through submit(): a full queue would defer it until a change
+        # that never comes, or block and write under _write_lock
+        with logger._lock:
+            if logger._queued:
+                return
+            logger._queued = True
+        self._retry.append(logger)
+
+    def _ensure_thread(self) -> None:
+        # Threads don't survive fork - an RQ work-horse starts its own
+        if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="log-flusher", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[LOGS] Background flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "retrying": len(self._retry),
+            "writes": self.writes,
+            "rows_written": self.rows_written,
+            "deferred": self.deferred,
+            "blocked": self.blocked,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
+
+
+_flusher = LogFlusher()
+
+
+def flush_logs() -> int:
+    """Write every pending log change now (blocking)."""
+    return _flusher.flush()
+
+
+atexit.register(flush_logs)
 
 
 class ExecutionLogger:
     """Simple execution logger for testing."""
-    
+
     def __init__(
         self,
         worker_name: str,
         input_data: dict,
         automation_slug: Optional[str] = None,
         notes: Optional[str] = None,
-        tags: Optional[list] = None
+        tags: Optional[list] = None,
+        step_name: Optional[str] = None
     ):
-        self.supabase = create_client(
-            os.environ["SUPABASE_URL"],
-            os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-        )
         self.worker_name = worker_name
         self.automation_slug = automation_slug
+        self.step_name = step_name
         self.start_time = datetime.utcnow()
-        self.log_id = None
+        self.log_id = str(uuid.uuid4())
         self._notes = notes
-        self._tags = tags or []
+        self._tags = list(tags or [])
         self._metadata = {}
-        
+
+        self._lock = threading.Lock()
+        self._queued = False
+        self._written = False
+        self._failures = 0
+        self._row: Dict[str, Any] = {}
+        self._dirty = set()
+
         # Create log entry
         self._create_entry(input_data)
-    
+
     def _create_entry(self, input_data: dict):
-        """Create initial log entry."""
-        result = self.supabase.table("execution_logs").insert({
-            "worker_name": self.worker_name,
-            "automation_slug": self.automation_slug,
-            "input": input_data,
-            "notes": self._notes,
-            "tags": self._tags,
-            "status": "running"
-        }).execute()
-        
-        if result.data:
-            self.log_id = result.data[0]["id"]
-    
+        """Create initial log entry (written by the next flush)."""
+        self._set(
+            id=self.log_id,
+            worker_name=self.worker_name,
+            step_name=self.step_name,
+            automation_slug=self.automation_slug,
+            started_at=self.start_time.isoformat(),
+            input=input_data,
+            notes=self._notes,
+            tags=self._tags,
+            status="running"
+        )
+
+    def _set(self, final: bool = False, **fields):
+        with self._lock:
+            self._row.update(fields)
+            self._dirty.update(fields)
+        _flusher.submit(self, final)
+
+    def _take_changes(self) -> Optional[dict]:
+        """Fields to write (the whole row until the first write succeeds)."""
+        with self._lock:
+            self._queued = False
+            if not self._dirty:
+                return None
+            keys = self._row.keys() if not self._written else self._dirty | {"id"}
+            changes = {key: self._row[key] for key in keys}
+            self._dirty.clear()
+        # What the request body will carry - a datetime in input_data must
+        # not fail the whole bulk upsert at encoding
+        return json_safe(changes)
+
+    def _restore(self, changes: dict):
+        with self._lock:
+            self._dirty.update(changes)
+
     def note(self, text: str):
         """Add or update notes."""
         self._notes = text
-        if self.log_id:
-            self.supabase.table("execution_logs").update({
-                "notes": text
-            }).eq("id", self.log_id).execute()
-    
+        self._set(notes=text)
+
     def tag(self, *tags: str):
         """Add tags."""
         self._tags.extend(tags)
-        if self.log_id:
-            self.supabase.table("execution_logs").update({
-                "tags": list(set(self._tags))
-            }).eq("id", self.log_id).execute()
-    
+        self._set(tags=list(dict.fromkeys(self._tags)))
+
     def meta(self, key: str, value: Any):
         """Add metadata (progress, stats, etc.)."""
         self._metadata[key] = value
-        if self.log_id:
-            self.supabase.table("execution_logs").update({
-                "metadata": self._metadata
-            }).eq("id", self.log_id).execute()
-    
+        self._set(metadata=dict(self._metadata))
+
+    def flush(self):
+        """Write this log's pending changes now (blocking)."""
+        _flusher.write([self])
+
     def success(self, output: Any):
         """Mark as successful with output."""
         runtime = (datetime.utcnow() - self.start_time).total_seconds()
-        
-        if self.log_id:
-            self.supabase.table("execution_logs").update({
-                "status": "success",
-                "completed_at": datetime.utcnow().isoformat(),
-                "runtime_seconds": round(runtime, 2),
-                "output": output if isinstance(output, dict) else {"result": output},
-                "metadata": self._metadata
-            }).eq("id", self.log_id).execute()
-        
+
+        self._set(
+            final=True,
+            status="success",
+            completed_at=datetime.utcnow().isoformat(),
+            runtime_seconds=round(runtime, 2),
+            output=output if isinstance(output, dict) else {"result": output},
+            metadata=dict(self._metadata)
+        )
+
         return output
-    
+
     def fail(self, error: Exception):
         """Mark as failed with error details."""
         runtime = (datetime.utcnow() - self.start_time).total_seconds()
-        
+
         error_data = {
             "type": type(error).__name__,
             "message": str(error),
             "traceback": traceback.format_exc()
         }
-        
-        if self.log_id:
-            self.supabase.table("execution_logs").update({
-                "status": "failed",
-                "completed_at": datetime.utcnow().isoformat(),
-                "runtime_seconds": round(runtime, 2),
-                "error": error_data,
-                "metadata": self._metadata
-            }).eq("id", self.log_id).execute()
-        
+
+        self._set(
+            final=True,
+            status="failed",
+            completed_at=datetime.utcnow().isoformat(),
+            runtime_seconds=round(runtime, 2),
+            error=error_data,
+            metadata=dict(self._metadata)
+        )
+
         raise error  # Re-raise so the job fails properly
 
 
 def logged(worker_name: str, automation_slug: Optional[str] = None):
     """
     Decorator for automatic logging.
-    
+
     Usage:
         @logged("scrapers.permits", "va-loudoun-permits")
         def my_worker(config, geography):
@@ -0,0 +1,392 @@
+"""
+Batched Parcel Enrichment
+=========================
+Parcel lookups for permit points without one HTTP call per permit.
+
+enrich_with_parcels() in arcgis_permits made a serial spatial query per
+feature (2,000 permits = 2,000 round trips). Here:
+
+- Points are grouped into one esriGeometryMultipoint query per batch
+  (PARCEL_BATCH_SIZE points). The parcels come back with geometry and each
+  point is matched to its parcel locally (point-in-polygon).
+- Batches run concurrently on an asyncio/httpx pool (PARCEL_CONCURRENCY)
+  behind a per-host rate limit (PARCEL_RATE_PER_HOST requests/second), so a
+  county GIS server isn't flooded.
+- Results are cached by rounded coordinate (and "no parcel here" too), so
+  overlapping permits and re-runs don't query again. With REDIS_URL the
+  cache is shared by all workers and survives the per-job fork.
+- A batch the server rejects falls back to single-point queries.
+
+Features are consumed and yielded in windows, in input order, so memory stays
+bounded while streaming.
+
+Usage:
+    from workers.parcels import enrich_batched
+
+    features = enrich_batched(features, parcel_endpoint, out_fields=["OwnerName", "Zoning"])
+
+Environment:
+    PARCEL_BATCH_SIZE       points per multipoint query (default 100)
+    PARCEL_CONCURRENCY      concurrent queries per run (default 4)
+    PARCEL_RATE_PER_HOST    max requests/second per parcel host (default 5, 0 = unlimited)
+    PARCEL_CACHE_BACKEND    memory | redis | off (default redis when REDIS_URL is set)
+    PARCEL_CACHE_TTL        seconds a cached lookup lives in Redis (default 604800 = 7d)
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+
+BATCH_SIZE = int(os.environ.get("PARCEL_BATCH_SIZE", 100))
+CONCURRENCY = int(os.environ.get("PARCEL_CONCURRENCY", 4))
+RATE_PER_HOST = float(os.environ.get("PARCEL_RATE_PER_HOST", 5))
+CACHE_TTL = int(os.environ.get("PARCEL_CACHE_TTL", 604800))
+TIMEOUT = 60
+
+NO_PARCEL = {}  # cached "looked up, nothing there"
+
+
+# =============================================================================
+# Geometry
+# =============================================================================
+
+def point_in_polygon(x: float, y: float, rings: List[List[List[float]]]) -> bool:
+    """Even-odd ray casting over every ring (holes included) of an Esri polygon."""
+    inside = False
+    for ring in rings:
+        n = len(ring)
+        j = n - 1
+        for i in range(n):
+            xi, yi = ring[i][0], ring[i][1]
+            xj, yj = ring[j][0], ring[j][1]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+def coord_key(x: float, y: float) -> str:
+    """Rounded coordinate: ~1m in degrees, 1 unit (ft/m) in projected systems."""
+    digits = 5 if abs(x) <= 180 and abs(y) <= 90 else 0
+    return f"{round(x, digits)},{round(y, digits)}"
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class ParcelCache:
+    """Parcel attributes by (endpoint, rounded coordinate), in-memory LRU"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, endpoint: str, keys: List[str]) -> Dict[str, dict]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((endpoint, key))
+                if entry is not None:
+                    self._entries.move_to_end((endpoint, key))
+                    found[key] = entry
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, endpoint: str, values: Dict[str, dict]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._entries[(endpoint, key)] = value
+                self._entries.move_to_end((endpoint, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RedisParcelCache(ParcelCache):
+    """Same interface, one Redis hash per parcel endpoint"""
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str, ttl_seconds: int = CACHE_TTL, prefix: str = "parcels"):
+        super().__init__()
+        from redis import Redis
+        self.redis = Redis.from_url(redis_url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _key(self, endpoint: str) -> str:
+        return f"{self.prefix}:{hashlib.sha1(endpoint.encode()).hexdigest()[:16]}"
+
+    def get_many(self, endpoint: str, keys: List[str]) -> Dict[str, dict]:
+        if not keys:
+            return {}
+        try:
+            values = self.redis.hmget(self._key(endpoint), keys)
+        except Exception as e:
+            print(f"[PARCELS] Redis get failed: {e}")
+            values = [None] * len(keys)
+        found = {key: json.loads(raw) for key, raw in zip(keys, values) if raw is not None}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, endpoint: str, values: Dict[str, dict]) -> None:
+        if not values:
+            return
+        key = self._key(endpoint)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={k: json.dumps(v, default=str) for k, v in values.items()})
+            pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            print(f"[PARCELS] Redis put failed: {e}")
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses}
+
+
+class NullParcelCache(ParcelCache):
+    """Caching disabled"""
+
+    backend = "off"
+
+    def get_many(self, endpoint: str, keys: List[str]) -> Dict[str, dict]:
+        self.misses += len(keys)
+        return {}
+
+    def put_many(self, endpoint: str, values: Dict[str, dict]) -> None:
+        pass
+
+
+def _cache_from_env() -> ParcelCache:
+    backend = os.environ.get("PARCEL_CACHE_BACKEND") or ("redis" if os.environ.get("REDIS_URL") else "memory")
+    if backend == "off":
+        return NullParcelCache()
+    if backend == "redis":
+        return RedisParcelCache(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    return ParcelCache()
+
+
+parcel_cache = _cache_from_env()
+
+
+# =============================================================================
+# Rate limiting
+# =============================================================================
+
+class HostRateLimiter:
+    """Spaces request starts to at most `rate` per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        # No await between reading and bumping _next_slot, so this is safe
+        # for any number of tasks on one loop
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_limiters: Dict[str, HostRateLimiter] = {}
+
+
+def limiter_for(url: str, rate: float = RATE_PER_HOST) -> HostRateLimiter:
+    host = urlparse(url).hostname or url
+    if host not in _limiters:
+        _limiters[host] = HostRateLimiter(rate)
+    return _limiters[host]
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+
+async def _query(client: httpx.AsyncClient, limiter: HostRateLimiter, slots: asyncio.Semaphore, url: str, params: dict) -> dict:
+    async with slots:
+        await limiter.wait()
+        response = await client.post(url, data=params)
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise ValueError(f"{data['error'].get('code')} {data['error'].get('message')}")
+    return data
+
+
+def _match(points: Dict[str, Tuple[float, float]], parcels: List[dict], out_fields: List[str]) -> Dict[str, dict]:
+    """Assign each point the attributes of the parcel containing it (NO_PARCEL if none)."""
+    matched = {}
+    for key, (x, y) in points.items():
+        matched[key] = NO_PARCEL
+        for parcel in parcels:
+            rings = (parcel.get("geometry") or {}).get("rings")
+            if rings and point_in_polygon(x, y, rings):
+                attrs = parcel.get("attributes", {})
+                matched[key] = {field: attrs.get(field) for field in out_fields}
+                break
+    return matched
+
+
+async def _lookup_batch(client, limiter, slots, url: str, points: Dict[str, Tuple[float, float]], out_fields: List[str], spatial_reference: Optional[dict]) -> Dict[str, dict]:
+    base = {
+        "geometryType": "esriGeometryMultipoint",
+        "spatialRel": "esriSpatialRelIntersects",
+        "outFields": ",".join(out_fields),
+        "returnGeometry": "true",
+        "f": "json",
+    }
+    geometry = {"points": [list(xy) for xy in points.values()]}
+    if spatial_reference:
+        geometry["spatialReference"] = spatial_reference
+        base["outSR"] = json.dumps(spatial_reference)
+
+    try:
+        data = await _query(client, limiter, slots, url, {**base, "geometry": json.dumps(geometry)})
+        return _match(points, data.get("features", []), out_fields)
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"[PARCELS] Multipoint query failed ({e}) - retrying {len(points)} points singly")
+
+    # Fallback: one point query each (still concurrent and rate limited)
+    async def single(key, x, y):
+        params = {
+            **base,
+            "geometryType": "esriGeometryPoint",
+            "geometry": f"{x},{y}",
+            "returnGeometry": "false",
+        }
+        if spatial_reference and spatial_reference.get("wkid"):
+            params["inSR"] = spatial_reference["wkid"]
+        try:
+            data = await _query(client, limiter, slots, url, params)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"[PARCELS] Parcel query failed at {key}: {e}")
+            return key, None  # not cached - try again next run
+        features = data.get("features", [])
+        if not features:
+            return key, NO_PARCEL
+        attrs = features[0].get("attributes", {})
+        return key, {field: attrs.get(field) for field in out_fields}
+
+    results = await asyncio.gather(*(single(key, x, y) for key, (x, y) in points.items()))
+    return {key: value for key, value in results if value is not None}
+
+
+async def _lookup(url: str, points: Dict[str, Tuple[float, float]], out_fields: List[str], spatial_reference: Optional[dict], batch_size: int, concurrency: int, client: httpx.AsyncClient) -> Dict[str, dict]:
+    limiter = limiter_for(url)
+    slots = asyncio.Semaphore(concurrency)
+    keys = list(points)
+    batches = [{key: points[key] for key in keys[i:i + batch_size]} for i in range(0, len(keys), batch_size)]
+    found = {}
+    for result in await asyncio.gather(*(_lookup_batch(client, limiter, slots, url, batch, out_fields, spatial_reference) for batch in batches)):
+        found.update(result)
+    return found
+
+
+# =============================================================================
+# Enrichment
+# =============================================================================
+
+def enrich_batched(
+    features: Iterable[dict],
+    parcel_endpoint: str,
+    out_fields: List[str],
+    spatial_reference: Optional[dict] = None,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    cache: Optional[ParcelCache] = None,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Iterator[dict]:
+    """
+    Yield features with parcel attributes (out_fields) merged into
+    feature["attributes"], in input order.
+
+    Args:
+        features: Esri point features
+        parcel_endpoint: Parcel layer URL
+        out_fields: Parcel fields to copy onto each permit
+        spatial_reference: Spatial reference of the feature points (sent as
+                           inSR/outSR so parcels come back in the same system)
+        batch_size: Points per multipoint query
+        concurrency: Queries in flight at once
+        cache: ParcelCache (default: process-wide parcel_cache)
+        on_progress: Called with the number of features processed after each window
+    """
+    cache = cache or parcel_cache
+    namespace = f"{parcel_endpoint}|{','.join(out_fields)}"  # a different field list is a different lookup
+    url = f"{parcel_endpoint.rstrip('/')}/query"
+    window_size = batch_size * concurrency
+    loop = asyncio.new_event_loop()
+    client = None
+    processed = 0
+
+    try:
+        client = httpx.AsyncClient(timeout=TIMEOUT)
+        window: List[dict] = []
+
+        def flush(window: List[dict]) -> List[dict]:
+            points = {}
+            for feature in window:
+                geom = feature.get("geometry") or {}
+                if geom.get("x") is not None and geom.get("y") is not None:
+                    points.setdefault(coord_key(geom["x"], geom["y"]), (geom["x"], geom["y"]))
+
+            found = cache.get_many(namespace, list(points))
+            missing = {key: xy for key, xy in points.items() if key not in found}
+            if missing:
+                looked_up = loop.run_until_complete(
+                    _lookup(url, missing, out_fields, spatial_reference, batch_size, concurrency, client)
+                )
+                cache.put_many(namespace, looked_up)
+                found.update(looked_up)
+
+            for feature in window:
+                geom = feature.get("geometry") or {}
+                if geom.get("x") is None or geom.get("y") is None:
+                    continue
+                parcel = found.get(coord_key(geom["x"], geom["y"]))
+                if parcel:
+                    feature.setdefault("attributes", {}).update(parcel)
+            return window
+
+        for feature in features:
+            window.append(feature)
+            if len(window) >= window_size:
+                yield from flush(window)
+                processed += len(window)
+                window = []
+                if on_progress:
+                    on_progress(processed)
+
+        if window:
+            yield from flush(window)
+            processed += len(window)
+            if on_progress:
+                on_progress(processed)
+    finally:
+        if client is not None:
+            loop.run_until_complete(client.aclose())
+        loop.close()
@@ -0,0 +1,136 @@
+"""
+Progress Reporter
+=================
+Throttled job progress for the runner, templates and BaseWorker.
+
+Every progress update used to be a job.save_meta() - a Redis round trip
+that rewrites the job's whole meta - and each caller built a fresh meta
+dict, so an update from the template dropped keys the runner or an earlier
+update had set (elapsed_seconds, data, response_id, ...). ProgressReporter:
+
+- merges each update into the job's meta instead of replacing it
+- writes at most once per PROGRESS_MIN_INTERVAL seconds, unless the
+  percent moved by PROGRESS_MIN_DELTA or more since the last write
+- always writes final states (percent >= 100 or < 0) and on close()/flush()
+
+Updates in between are kept and go out with the next write, so nothing is
+lost but the intermediate Redis traffic. Without an RQ job (direct calls,
+the threads batch backend) it only prints, with the same throttling.
+
+Each write is also appended to the job's event stream (workers/job_events.py)
+as a "progress" event, which /jobs/{id}/stream serves.
+
+Usage:
+    from workers.progress import ProgressReporter
+
+    progress = ProgressReporter(job)
+    progress.update("Fetching permits...", 20)
+    for n in ...:
+        progress.update(f"Enriched {n} permits...", 50)   # throttled
+    progress.update("Complete!", 100)                     # always written
+
+Environment:
+    PROGRESS_MIN_INTERVAL   min seconds between meta writes (default 1.0)
+    PROGRESS_MIN_DELTA      percent change that forces a write (default 5)
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from workers import job_events
+
+
+MIN_INTERVAL = float(os.environ.get("PROGRESS_MIN_INTERVAL", 1.0))
+MIN_DELTA = float(os.environ.get("PROGRESS_MIN_DELTA", 5))
+
+
+class ProgressReporter:
+    """Merged, rate-limited job.meta progress updates"""
+
+    def __init__(
+        self,
+        job: Optional[Any] = None,
+        min_interval: float = MIN_INTERVAL,
+        min_delta: float = MIN_DELTA,
+        echo: bool = True
+    ):
+        self.job = job
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.echo = echo
+        self.start_time = datetime.utcnow()
+        self.state: Dict[str, Any] = {}
+        self.writes = 0
+        self.skipped = 0
+        self._pending = False
+        self._last_write: Optional[float] = None
+        self._last_percent: Optional[float] = None
+
+    def update(self, message: str, percent: Optional[float] = None, data: Optional[dict] = None, **fields: Any) -> bool:
+        """
+        Record progress; written now if due. Returns True if it was written.
+
+        percent=None keeps the previous percent. data is merged into the
+        previous data; other keyword fields are stored as top-level meta keys.
+        """
+        self.state["message"] = message
+        if percent is not None:
+            self.state["percent"] = percent
+        if data:
+            self.state["data"] = {**self.state.get("data", {}), **data}
+        self.state.update(fields)
+        self._pending = True
+
+        if self._due(percent):
+            self.flush()
+            return True
+        self.skipped += 1
+        return False
+
+    def _due(self, percent: Optional[float]) -> bool:
+        if self._last_write is None:
+            return True
+        if percent is not None and (percent >= 100 or percent < 0):
+            return True
+        if percent is not None and self._last_percent is not None and abs(percent - self._last_percent) >= self.min_delta:
+            return True
+        return time.monotonic() - self._last_write >= self.min_interval
+
+    def flush(self) -> None:
+        """Write the latest state now (no-op if nothing changed)."""
+        if not self._pending:
+            return
+        now = datetime.utcnow()
+        self.state["timestamp"] = now.isoformat()
+        self.state["elapsed_seconds"] = round((now - self.start_time).total_seconds(), 2)
+
+        if self.job:
+            self._write(dict(self.state))
+        if self.echo:
+            percent = self.state.get("percent")
+            print(f"[{percent if percent is not None else '-'}%] {self.state['message']}")
+
+        self._pending = False
+        self._last_write = time.monotonic()
+        self._last_percent = self.state.get("percent")
+        self.writes += 1
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        # Merge - keys set by other reporters on the same job survive
+        meta = self.job.meta if isinstance(self.job.meta, dict) else {}
+        meta.update(state)
+        self.job.meta = meta
+        self.job.save_meta()
+        job_events.publish(self.job.connection, self.job.id, "progress", state)
+
+    def close(self, message: Optional[str] = None, percent: Optional[float] = None, **fields: Any) -> None:
+        """Optional last update, then make sure the final state is written."""
+        if message is not None:
+            self.state["message"] = message
+            if percent is not None:
+                self.state["percent"] = percent
+            self.state.update(fields)
+            self._pending = True
+        self.flush()
@@ -0,0 +1,108 @@
+"""
+File Prompt Cache
+=================
+prompts/*.md templates read once per process instead of on every call.
+
+ai.prompt() and agent.agent_prompt() used to read_text() the prompt file for
+every LLM step. The cache keeps each file's contents keyed by path and
+re-reads it only when its mtime (or size) changes, so edited prompts still
+take effect without a restart.
+
+Usage:
+    from workers.prompt_cache import load_prompt, load_template
+
+    text = load_prompt("entity-research")        # prompts/entity-research.md
+    prompt = load_template("entity-research").render({"company": "Acme"})
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from workers.prompt_template import CompiledTemplate, compile_template
+
+# Prompts directory
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+
+
+class FilePromptCache:
+    """mtime-validated cache of prompt files (thread-safe)."""
+
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR):
+        self.prompts_dir = Path(prompts_dir)
+        self._entries: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def path_for(self, name: str) -> Path:
+        return self.prompts_dir / f"{name}.md"
+
+    def load(self, name: str) -> str:
+        """Prompt text for prompts/{name}.md (raises FileNotFoundError)."""
+        path = self.path_for(name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Prompt not found: {path}")
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        key = str(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self.hits += 1
+                return entry[1]
+
+        text = path.read_text()
+
+        with self._lock:
+            if entry:
+                self.reloads += 1
+            else:
+                self.misses += 1
+            self._entries[key] = (stamp, text)
+        return text
+
+    def template(self, name: str) -> CompiledTemplate:
+        """Compiled template for prompts/{name}.md (recompiled only when the file changes)."""
+        # Same text object while the file is unchanged, so the compile cache hit is O(1)
+        return compile_template(self.load(name))
+
+    def version(self, name: str) -> Tuple[int, int]:
+        """(mtime_ns, size) of the cached copy - changes whenever the file does."""
+        self.load(name)
+        return self._entries[str(self.path_for(name))][0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        compile_template.cache_clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompts_dir": str(self.prompts_dir),
+                "cached": len(self._entries),
+                "bytes": sum(len(text) for _, text in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "compiled": compile_template.cache_info()._asdict(),
+            }
+
+
+file_prompts = FilePromptCache()
+
+
+def load_prompt(name: str) -> str:
+    """Load prompts/{name}.md through the process-wide cache."""
+    return file_prompts.load(name)
+
+
+def load_template(name: str) -> CompiledTemplate:
+    """Compiled template for prompts/{name}.md through the process-wide cache."""
+    return file_prompts.template(name)
@@ -0,0 +1,145 @@
+"""
+Compiled Prompt Templates
+=========================
+Single-pass {{variable}} interpolation (optionally {{#if variable}}...{{/if}}).
+
+The old approach looped str.replace() over every variable, copying the whole
+prompt once per variable - expensive when inputs are multi-hundred-KB
+narratives and claims JSON. Here a template is tokenized once into literal
+chunks and placeholders, and render() walks that list, serializing each
+dict/list value once per render and joining the pieces in one go.
+
+By default the semantics match the old prompt()/agent_prompt() loop:
+    {{name}}                   str(value); dicts/lists as json.dumps(indent=2)
+    {{name}} with no variable  left as-is (render(None) returns the template)
+    {{#if name}}, {{/if}}      not special - left as-is like any unknown name
+
+compile_template(source, conditionals=True) also evaluates
+{{#if name}}...{{/if}} blocks - kept if the variable is truthy, dropped
+otherwise - like the archived v2 step_executor did. Nothing on the prompt()
+path turns that on, so a prompt file containing {{#if}} renders as before.
+
+Two differences from the old loop: substituted values are never re-scanned,
+so a value containing "{{other}}" is inserted literally, and values json
+can't encode are str()-ed instead of raising.
+
+Usage:
+    from workers.prompt_template import compile_template
+
+    template = compile_template("Research {{company}} for {{client}}")
+    text = template.render({"company": "Acme", "client": "Span"})
+
+    compile_template("{{#if notes}}Notes: {{notes}}{{/if}}", conditionals=True).render({"notes": ""})  # ""
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Union
+
+# {{#if var}}, {{/if}} or {{anything-else}}
+TOKEN_PATTERN = re.compile(r"\{\{(?:#if\s+(\w+)|(/if)|([^{}]+))\}\}")
+
+# Parts: literal str, ("var", name, raw) or ("if", name, raw_open, children)
+Part = Union[str, Tuple]
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, indent=2, default=str)
+    return str(value)
+
+
+class CompiledTemplate:
+    """A prompt template tokenized once, rendered many times."""
+
+    __slots__ = ("source", "conditionals", "parts", "variables")
+
+    def __init__(self, source: str, conditionals: bool = False):
+        self.source = source
+        self.conditionals = conditionals
+        self.parts, self.variables = self._parse(source, conditionals)
+
+    @staticmethod
+    def _parse(source: str, conditionals: bool = False) -> Tuple[List[Part], frozenset]:
+        root: List[Part] = []
+        stack: List[Tuple[str, str, List[Part]]] = []  # (name, raw_open, parent)
+        current = root
+        names = set()
+        pos = 0
+
+        for match in TOKEN_PATTERN.finditer(source):
+            if match.start() > pos:
+                current.append(source[pos:match.start()])
+            pos = match.end()
+
+            if_name, end_if, var_name = match.groups()
+            if not conditionals and (if_name or end_if):
+                # Plain placeholder named "#if x" / "/if" - left as-is unless such a variable exists
+                current.append(("var", match.group(0)[2:-2], match.group(0)))
+            elif if_name:
+                names.add(if_name)
+                stack.append((if_name, match.group(0), current))
+                current = []
+            elif end_if:
+                if not stack:
+                    current.append(match.group(0))  # stray {{/if}} stays literal
+                    continue
+                name, raw_open, parent = stack.pop()
+                parent.append(("if", name, raw_open, current))
+                current = parent
+            else:
+                names.add(var_name)
+                current.append(("var", var_name, match.group(0)))
+
+        if pos < len(source):
+            current.append(source[pos:])
+
+        # Unclosed {{#if}} blocks stay literal
+        while stack:
+            name, raw_open, parent = stack.pop()
+            parent.append(raw_open)
+            parent.extend(current)
+            current = parent
+
+        return root, frozenset(names)
+
+    def render(self, variables: Dict[str, Any] = None) -> str:
+        variables = variables or {}
+        out: List[str] = []
+        # id(value) -> formatted text, so a value used twice is serialized once
+        memo: Dict[int, str] = {}
+        self._render(self.parts, variables, memo, out)
+        return "".join(out)
+
+    def _render(self, parts: List[Part], variables: Dict[str, Any], memo: Dict[int, str], out: List[str]):
+        for part in parts:
+            if part.__class__ is str:
+                out.append(part)
+            elif part[0] == "var":
+                name = part[1]
+                if name not in variables:
+                    out.append(part[2])
+                    continue
+                value = variables[name]
+                key = id(value)
+                text = memo.get(key)
+                if text is None:
+                    text = memo[key] = _format_value(value)
+                out.append(text)
+            elif variables.get(part[1]):
+                self._render(part[3], variables, memo, out)
+
+    def __repr__(self):
+        return f"<CompiledTemplate {len(self.source)} chars, {len(self.variables)} variables>"
+
+
+@lru_cache(maxsize=256)
+def compile_template(source: str, conditionals: bool = False) -> CompiledTemplate:
+    """Compile (or reuse the compiled form of) a template string."""
+    return CompiledTemplate(source, conditionals)
+
+
+def render_template(source: str, variables: Dict[str, Any] = None, conditionals: bool = False) -> str:
+    """Interpolate variables into a template string (compiled form is cached)."""
+    return compile_template(source, conditionals).render(variables)
@@ -0,0 +1,247 @@
+"""
+Columnar Scraper Records
+========================
+Compact output for scraper templates.
+
+Templates used to return a list of dicts per record, each repeating the
+run's geography and a full raw_attributes dict, and run_automation stored
+all of it in automation_runs.result - megabytes of redundant JSON per run
+for a large county. A RecordBuffer keeps instead:
+
+- header   values shared by every record (geography, endpoint, ...), once
+- fields   the column names; nested dicts are flattened one level
+           ("raw_attributes.CaseNumber", "coordinates.lat")
+- columns  one value array per field
+
+store_records() writes the buffer as gzipped JSON Lines (first line = header
+and field table, then one JSON array of values per record) or Parquet, to
+Supabase Storage or a local directory, and returns a small pointer. The
+runner puts that pointer and the summary counts in automation_runs.result
+instead of the records themselves.
+
+Usage:
+    from workers.records import RecordBuffer, store_records, load_records
+
+    buffer = RecordBuffer(header={"geography": geography})
+    buffer.append({"case_number": "B-1", "raw_attributes": attrs})
+    pointer = store_records(buffer, f"{slug}/{run_id}")
+    for record in load_records(pointer["uri"]).iter_records():
+        ...
+
+Environment:
+    RECORDS_BACKEND   supabase | local (default supabase)
+    RECORDS_BUCKET    Supabase Storage bucket (default scraper-records, created by
+                      database/migrations/012_scraper_records_bucket.sql)
+    RECORDS_DIR       local backend directory (default ./tmp/records)
+    RECORDS_FORMAT    jsonl.gz | parquet (default jsonl.gz; parquet needs pyarrow)
+"""
+
+import io
+import os
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+BACKEND = os.environ.get("RECORDS_BACKEND", "supabase")
+BUCKET = os.environ.get("RECORDS_BUCKET", "scraper-records")
+RECORDS_DIR = Path(os.environ.get("RECORDS_DIR", Path(__file__).parent.parent / "tmp" / "records"))
+FORMAT = os.environ.get("RECORDS_FORMAT", "jsonl.gz")
+
+FORMAT_VERSION = "columnar-jsonl/1"
+
+
+class RecordBuffer:
+    """Column-oriented record buffer with a shared header"""
+
+    def __init__(self, header: Optional[Dict[str, Any]] = None):
+        self.header = header or {}
+        self.fields: List[str] = []
+        self.columns: List[List[Any]] = []
+        self._index: Dict[str, int] = {}
+        self.count = 0
+
+    def _column(self, field: str) -> List[Any]:
+        position = self._index.get(field)
+        if position is None:
+            position = self._index[field] = len(self.fields)
+            self.fields.append(field)
+            self.columns.append([None] * self.count)
+        return self.columns[position]
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Add one record (nested dicts are flattened one level)."""
+        for key, value in record.items():
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    self._column(f"{key}.{sub_key}").append(sub_value)
+            else:
+                self._column(key).append(value)
+
+        self.count += 1
+        for column in self.columns:
+            if len(column) < self.count:
+                column.append(None)
+
+    def extend(self, records) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def rows(self) -> Iterator[List[Any]]:
+        """Value arrays in field order."""
+        return (list(row) for row in zip(*self.columns)) if self.columns else iter([[]] * self.count)
+
+    def iter_records(self, include_header: bool = False) -> Iterator[Dict[str, Any]]:
+        """Rebuild record dicts (nested fields restored; None values dropped)."""
+        split = [field.split(".", 1) for field in self.fields]
+        for row in self.rows():
+            record: Dict[str, Any] = dict(self.header) if include_header else {}
+            for parts, value in zip(split, row):
+                if value is None:
+                    continue
+                if len(parts) == 2:
+                    record.setdefault(parts[0], {})[parts[1]] = value
+                else:
+                    record[parts[0]] = value
+            yield record
+
+    def to_dicts(self, include_header: bool = False) -> List[Dict[str, Any]]:
+        return list(self.iter_records(include_header))
+
+    def summary(self) -> Dict[str, Any]:
+        return {"count": self.count, "fields": len(self.fields), "header": self.header}
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+
+    def to_jsonl_gz(self) -> bytes:
+        out = io.BytesIO()
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) as gz:
+            head = {"format": FORMAT_VERSION, "header": self.header, "fields": self.fields, "count": self.count}
+            gz.write(json.dumps(head, default=str).encode() + b"\n")
+            for row in self.rows():
+                gz.write(json.dumps(row, separators=(",", ":"), default=str).encode() + b"\n")
+        return out.getvalue()
+
+    @classmethod
+    def from_jsonl_gz(cls, data: bytes) -> "RecordBuffer":
+        lines = gzip.decompress(data).splitlines()
+        head = json.loads(lines[0])
+        buffer = cls(header=head.get("header"))
+        buffer.fields = list(head["fields"])
+        buffer._index = {field: i for i, field in enumerate(buffer.fields)}
+        buffer.columns = [[] for _ in buffer.fields]
+        for line in lines[1:]:
+            for column, value in zip(buffer.columns, json.loads(line)):
+                column.append(value)
+        buffer.count = len(lines) - 1
+        return buffer
+
+    def to_parquet(self) -> bytes:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("RECORDS_FORMAT=parquet needs pyarrow (pip install pyarrow)")
+
+        def cell(value):
+            # Lists/dicts as JSON text so every column has a single arrow type
+            return json.dumps(value, default=str) if isinstance(value, (list, dict)) else value
+
+        arrays = {}
+        for field, column in zip(self.fields, self.columns):
+            values = [cell(v) for v in column]
+            try:
+                arrays[field] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrays[field] = pa.array([None if v is None else str(v) for v in values])
+
+        table = pa.table(arrays).replace_schema_metadata({
+            "format": FORMAT_VERSION,
+            "header": json.dumps(self.header, default=str),
+        })
+        out = io.BytesIO()
+        pq.write_table(table, out, compression="zstd")
+        return out.getvalue()
+
+    @classmethod
+    def from_parquet(cls, data: bytes) -> "RecordBuffer":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(data))
+        metadata = table.schema.metadata or {}
+        buffer = cls(header=json.loads(metadata.get(b"header", b"{}")))
+        buffer.fields = list(table.column_names)
+        buffer._index = {field: i for i, field in enumerate(buffer.fields)}
+        buffer.columns = [table.column(field).to_pylist() for field in buffer.fields]
+        buffer.count = table.num_rows
+        return buffer
+
+    def serialize(self, format: str = FORMAT) -> bytes:
+        if format == "parquet":
+            return self.to_parquet()
+        return self.to_jsonl_gz()
+
+    def __repr__(self):
+        return f"<RecordBuffer {self.count} records x {len(self.fields)} fields>"
+
+
+# =============================================================================
+# Storage
+# =============================================================================
+
+def _content_type(format: str) -> str:
+    return "application/vnd.apache.parquet" if format == "parquet" else "application/gzip"
+
+
+def store_records(buffer: RecordBuffer, name: str, format: str = FORMAT, backend: str = BACKEND) -> Dict[str, Any]:
+    """
+    Serialize and store a buffer as {name}.{format}.
+
+    Returns the pointer kept in automation_runs.result:
+        {uri, format, count, fields, bytes}
+    """
+    data = buffer.serialize(format)
+    path = f"{name}.{format}"
+
+    if backend == "local":
+        target = RECORDS_DIR / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        uri = target.resolve().as_uri()
+    else:
+        from workers.db import get_supabase
+        get_supabase().storage.from_(BUCKET).upload(
+            path, data, {"content-type": _content_type(format), "upsert": "true"}
+        )
+        uri = f"supabase://{BUCKET}/{path}"
+
+    return {
+        "uri": uri,
+        "format": format,
+        "count": buffer.count,
+        "fields": len(buffer.fields),
+        "bytes": len(data),
+    }
+
+
+def load_records(uri: str) -> RecordBuffer:
+    """Load a buffer back from a store_records() uri."""
+    if uri.startswith("supabase://"):
+        from workers.db import get_supabase
+        bucket, path = uri[len("supabase://"):].split("/", 1)
+        data = get_supabase().storage.from_(bucket).download(path)
+    elif uri.startswith("file://"):
+        from urllib.parse import urlparse, unquote
+        data = Path(unquote(urlparse(uri).path)).read_bytes()
+    else:
+        data = Path(uri).read_bytes()
+
+    if uri.endswith(".parquet"):
+        return RecordBuffer.from_parquet(data)
+    return RecordBuffer.from_jsonl_gz(data)
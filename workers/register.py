@@ -21,17 +21,8 @@ Usage:
     print(status)  # {"registered": True, "automation": {...}}
 """
 
-import os
 from datetime import datetime
-from supabase import create_client
-
-
-def get_supabase():
-    """Get Supabase client."""
-    return create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-    )
+from workers.db import get_supabase
 
 
 def register_automation(
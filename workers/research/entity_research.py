@@ -12,6 +12,7 @@ import time
 from datetime import datetime
 from rq import get_current_job
 from openai import OpenAI
+from workers.progress import ProgressReporter
 
 
 # =============================================================================
@@ -132,17 +133,9 @@ def run_entity_research(
     """
     job = get_current_job()
     
-    def update(message: str, percent: int, **extra):
-        """Update job progress."""
-        if job:
-            job.meta = {
-                "message": message,
-                "percent": percent,
-                "timestamp": datetime.utcnow().isoformat(),
-                **extra
-            }
-            job.save_meta()
-        print(f"[{percent}%] {message}")
+    # Update job progress - merged into job.meta, so response_id set at
+    # start is still there on every poll update (see workers/progress.py)
+    update = ProgressReporter(job).update
     
     # Initialize
     update("Initializing OpenAI client...", 5)
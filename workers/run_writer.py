@@ -0,0 +1,337 @@
+"""
+Run Record Writer
+=================
+Write-behind buffer for automation_runs.
+
+run_automation used to insert a "running" row at the start of every job
+and update it at the end - two tiny Supabase requests per run, which at
+thousands of runs per hour made up most of the request count. Runs now go
+through RunWriter instead:
+
+- start() only creates the row in memory (id generated here, so sinks can
+  use it right away)
+- finish() merges the final fields into the same row
+- flush() writes every pending row in one bulk upsert on automation_runs.id
+  per column set (rows are never padded with nulls - a row finish()
+  created without automation_id must not overwrite the stored one)
+
+Rows are made JSON-safe when they're buffered (workers/db.py json_safe).
+If a bulk upsert fails anyway, its rows are retried one by one, so a row
+the server rejects fails only its own run: it stays pending, and after
+RUN_MAX_ROW_FAILURES rejections - a data/constraint error (SQLSTATE class
+22/23), or a failure while other rows were written - it's dropped and
+reported. An outage (nothing written) never counts toward that.
+
+A run that finishes before the next flush is written once, already final.
+A long run is still visible as "running": the background flusher writes
+rows that have been pending for RUN_FLUSH_INTERVAL seconds, and finish()
+later upserts the completed row over it.
+
+Rows are flushed:
+- when RUN_FLUSH_SIZE rows are pending
+- every RUN_FLUSH_INTERVAL seconds (background thread)
+- right after finish() unless inside `with run_writer.batch():` - a forked
+  RQ work-horse exits as soon as its job returns (os._exit, no atexit), so
+  outside a batch every finished run is written before run_automation
+  returns: finish() retries the write RUN_FINISH_RETRIES times and then
+  raises if its own row still isn't written, failing the job instead of
+  silently losing the row
+- on exit of a batch() block, close() and interpreter exit (atexit)
+
+finish(run_id, on_written=...) calls on_written once the finished row has
+actually been written - the runner commits the run's seen-record index
+there, so a run row that never reaches the table doesn't leave its records
+marked as already emitted.
+
+automations.last_run_at / last_run_status / counters are kept by the
+update_automation_stats trigger (migration 010), which fires for the rows
+of the same upsert - on insert, and when an update changes the status.
+
+Usage:
+    from workers.run_writer import run_writer
+
+    run_id = run_writer.start({"automation_id": automation_id, "status": "running"})
+    run_writer.finish(run_id, status="success", records_found=10)
+
+    with run_writer.batch():       # buffer across many runs
+        for slug in slugs:
+            run_automation(slug)
+
+Environment:
+    RUN_FLUSH_SIZE       pending rows that trigger a flush (default 50)
+    RUN_FLUSH_INTERVAL   max seconds a row waits before being written (default 5)
+    RUN_FINISH_RETRIES   write attempts of an unbatched finish() before it raises (default 3)
+    RUN_MAX_ROW_FAILURES rejections of one row before it's dropped (default 3)
+"""
+
+import os
+import time
+import uuid
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from workers.db import get_supabase, json_safe
+
+
+FLUSH_SIZE = int(os.environ.get("RUN_FLUSH_SIZE", 50))
+FLUSH_INTERVAL = float(os.environ.get("RUN_FLUSH_INTERVAL", 5))
+FINISH_RETRIES = int(os.environ.get("RUN_FINISH_RETRIES", 3))
+MAX_ROW_FAILURES = int(os.environ.get("RUN_MAX_ROW_FAILURES", 3))
+
+TERMINAL_STATUSES = ("success", "failed", "timeout")
+
+
+def row_error(error: Exception) -> bool:
+    """PostgREST rejected the row's data (SQLSTATE class 22 data / 23 constraint) - retrying won't help."""
+    return isinstance(error, APIError) and str(error.code or "")[:2] in ("22", "23")
+
+
+class RunWriter:
+    """Coalesces automation_runs rows and writes them in bulk upserts"""
+
+    def __init__(
+        self,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        table: str = "automation_runs",
+        finish_retries: int = FINISH_RETRIES,
+        max_row_failures: int = MAX_ROW_FAILURES
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.finish_retries = finish_retries
+        self.max_row_failures = max_row_failures
+        self.table = table
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Any]] = {}     # every run not yet written in its final state
+        self._dirty: Dict[str, float] = {}             # run id -> monotonic time it became dirty
+        self._on_written: Dict[str, Callable[[], Any]] = {}
+        self._failed: Dict[str, Tuple[int, str]] = {}  # run id -> (rejections, last error), until written
+        self._batch_depth = 0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def start(self, row: Dict[str, Any]) -> str:
+        """Buffer a new run row; returns its id."""
+        run = {"id": str(uuid.uuid4()), "started_at": datetime.utcnow().isoformat(), **json_safe(row)}
+        with self._lock:
+            self._rows[run["id"]] = run
+            self._dirty[run["id"]] = time.monotonic()
+        self._ensure_flusher()
+        return run["id"]
+
+    def finish(self, run_id: str, on_written: Optional[Callable[[], Any]] = None, **fields: Any) -> None:
+        """
+        Merge the final fields into a run; written now, or with the batch.
+
+        on_written is called after the finished row has been written (a
+        later finish() of the same run replaces or drops it). Outside a
+        batch, raises RuntimeError if this run's row still can't be written
+        after finish_retries attempts (it stays pending for a later flush),
+        or was dropped - other runs' rows never fail it.
+        """
+        fields = json_safe(fields)
+        with self._lock:
+            run = self._rows.get(run_id)
+            if run is None:
+                # Not started through this writer (or already written) -
+                # write the fields as they are
+                run = self._rows[run_id] = {"id": run_id}
+            run.update(fields)
+            if on_written:
+                self._on_written[run_id] = on_written
+            else:
+                self._on_written.pop(run_id, None)
+            self._dirty.setdefault(run_id, time.monotonic())
+            pending = len(self._dirty)
+            batching = self._batch_depth > 0
+
+        if batching:
+            if pending >= self.flush_size:
+                self.flush()
+            return
+
+        for attempt in range(max(1, self.finish_retries)):
+            if attempt:
+                time.sleep(min(2 ** (attempt - 1), 10))
+            self.flush()
+            with self._lock:
+                if run_id not in self._dirty:
+                    failure = self._failed.pop(run_id, None)
+                    if failure is None:
+                        return
+                    raise RuntimeError(f"Run {run_id} was rejected by {self.table} and dropped: {failure[1]}")
+                error = self._failed.get(run_id, (0, "unknown error"))[1]
+        raise RuntimeError(f"Run {run_id} could not be written to {self.table} after {self.finish_retries} attempts: {error}")
+
+    def last_cursor(self, automation_id: str) -> Optional[dict]:
+        """Cursor of the latest successful run still in the buffer (None if none)."""
+        with self._lock:
+            runs = [
+                run for run in self._rows.values()
+                if run.get("automation_id") == automation_id and run.get("status") == "success" and run.get("cursor")
+            ]
+        return max(runs, key=lambda run: run["started_at"])["cursor"] if runs else None
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self, older_than: Optional[float] = None) -> int:
+        """
+        Upsert pending rows, one request per column set. Returns how many were written.
+
+        older_than: only flush if some row has been pending that many seconds
+        (the background flusher's check); everything pending is written then.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                if older_than is not None and time.monotonic() - min(self._dirty.values()) < older_than:
+                    return 0
+                rows = {run_id: dict(self._rows[run_id]) for run_id in self._dirty}
+                self._dirty.clear()
+
+            # Same columns in every row of a request, without padding with
+            # nulls that would overwrite stored values
+            groups: Dict[frozenset, List[str]] = {}
+            for run_id, row in rows.items():
+                groups.setdefault(frozenset(row), []).append(run_id)
+
+            written: List[str] = []
+            failed: Dict[str, Exception] = {}
+            for ids in groups.values():
+                self._upsert(ids, rows, written, failed)
+
+            callbacks = []
+            with self._lock:
+                for run_id in written:
+                    self._failed.pop(run_id, None)
+                    # Finished rows are done; running rows stay so finish() can resend them whole
+                    if rows[run_id].get("status") in TERMINAL_STATUSES and run_id not in self._dirty:
+                        self._rows.pop(run_id, None)
+                        callbacks.append(self._on_written.pop(run_id, None))
+
+                now = time.monotonic()
+                for run_id, error in failed.items():
+                    # Only a rejection of the row itself counts - when nothing
+                    # was written it's more likely an outage than the row
+                    rejections = self._failed.get(run_id, (0, ""))[0] + (1 if written or row_error(error) else 0)
+                    self._failed[run_id] = (rejections, str(error))
+                    if rejections < self.max_row_failures:
+                        self._dirty.setdefault(run_id, now)
+                        continue
+                    self.dropped += 1
+                    print(f"[RUNS] Dropping run row {run_id} after {rejections} rejections: {error}")
+                    if run_id not in self._dirty:
+                        self._rows.pop(run_id, None)
+                        self._on_written.pop(run_id, None)
+
+            if written:
+                self.flushes += 1
+                self.rows_written += len(written)
+
+        for callback in callbacks:
+            if callback:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[RUNS] on_written callback failed: {e}")
+        return len(written)
+
+    def _upsert(self, ids: List[str], rows: Dict[str, Dict[str, Any]], written: List[str], failed: Dict[str, Exception]) -> None:
+        """Upsert these rows in one request; if it fails, one by one to isolate the bad ones."""
+        table = get_supabase().table(self.table)
+        try:
+            table.upsert([rows[run_id] for run_id in ids], on_conflict="id", returning="minimal").execute()
+            written.extend(ids)
+            return
+        except Exception as e:
+            self.errors += 1
+            if len(ids) == 1:
+                print(f"[RUNS] Write of run row {ids[0]} failed, will retry: {e}")
+                failed[ids[0]] = e
+                return
+            print(f"[RUNS] Flush of {len(ids)} run rows failed, retrying row by row: {e}")
+
+        for run_id in ids:
+            try:
+                table.upsert([rows[run_id]], on_conflict="id", returning="minimal").execute()
+                written.append(run_id)
+            except Exception as e:
+                self.errors += 1
+                print(f"[RUNS] Write of run row {run_id} failed, will retry: {e}")
+                failed[run_id] = e
+
+    def _ensure_flusher(self) -> None:
+        # Threads don't survive fork - an RQ work-horse starts its own
+        if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run_flusher, name="run-writer", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run_flusher(self) -> None:
+        stop = self._stop
+        while not stop.wait(min(self.flush_interval, 1.0)):
+            try:
+                self.flush(older_than=self.flush_interval)
+            except Exception as e:
+                print(f"[RUNS] Background flush failed: {e}")
+
+    @contextmanager
+    def batch(self):
+        """Buffer finished runs until a size/time threshold or the end of the block."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background flusher and write everything pending."""
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            left = len(self._dirty)
+        if left:
+            print(f"[RUNS] {left} run rows could not be written")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._dirty),
+                "open": len(self._rows),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "errors": self.errors,
+                "dropped": self.dropped,
+                "failing": len(self._failed),
+            }
+
+
+run_writer = RunWriter()
+atexit.register(run_writer.close)
@@ -13,29 +13,41 @@ Usage:
     run_automation("ferc-pjm-interconnection")
 """
 
-import os
-import importlib
+import inspect
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Dict, Optional
 from rq import get_current_job
-from supabase import create_client
+from workers.db import get_supabase
+from workers.automation_cache import automation_cache, AUTOMATION_COLUMNS
+from workers.run_writer import run_writer
+from workers.logger import flush_logs
+from workers.records import RecordBuffer, store_records
+from workers.sink import sink_for
+from workers.seen_index import SeenIndex
+from workers.progress import ProgressReporter
+from workers.template_registry import templates
 
 
-def get_supabase():
-    return create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-    )
+def get_last_cursor(automation_id: str) -> Optional[dict]:
+    """Cursor stored by the automation's latest successful run (None on first run)."""
+    buffered = run_writer.last_cursor(automation_id)
+    if buffered:
+        return buffered
+    result = get_supabase().table("automation_runs").select("cursor").eq(
+        "automation_id", automation_id
+    ).eq("status", "success").not_.is_("cursor", "null").order("started_at", desc=True).limit(1).execute()
+    return result.data[0]["cursor"] if result.data else None
 
 
 def run_automation(
     slug: str,
-    override_config: Optional[dict] = None
+    override_config: Optional[dict] = None,
+    automation: Optional[dict] = None
 ) -> dict:
     """
     Run an automation by slug.
     
-    1. Loads automation config from registry
+    1. Loads automation config from registry (cached, see workers/automation_cache.py)
     2. Finds the template
     3. Executes with config
     4. Logs the run
@@ -43,28 +55,30 @@ def run_automation(
     Args:
         slug: Automation slug (e.g., "maricopa-az-permits")
         override_config: Optional config overrides
+        automation: Automation row already loaded by the caller (run_by_filter);
+                    used once its config_updated_at is confirmed current
+                    (it may have waited in a queue)
     
     Returns:
         Automation result
     """
     job = get_current_job()
-    supabase = get_supabase()
     
-    def update_progress(message: str, percent: int):
-        if job:
-            job.meta = {"message": message, "percent": percent, "timestamp": datetime.utcnow().isoformat()}
-            job.save_meta()
-        print(f"[{percent}%] {message}")
+    # Merged into job.meta and rate-limited (see workers/progress.py)
+    update_progress = ProgressReporter(job).update
     
     update_progress(f"Loading automation: {slug}", 5)
     
-    # Load automation from registry
-    result = supabase.table("automations").select("*").eq("slug", slug).execute()
-    if not result.data:
+    # Load automation from registry - retries and repeat runs within the
+    # cache TTL reuse the row instead of selecting it again. A row passed
+    # in is checked like a cache entry past its TTL before it's trusted.
+    if automation:
+        automation = automation_cache.validate(automation)
+    else:
+        automation = automation_cache.get(slug)
+    if not automation:
         raise ValueError(f"Automation not found: {slug}")
     
-    automation = result.data[0]
-    
     # Check status
     if automation["status"] not in ["active", "draft"]:
         raise ValueError(f"Automation is {automation['status']}, cannot run")
@@ -76,59 +90,78 @@ def run_automation(
     
     update_progress(f"Loading template: {automation['template']}", 10)
     
-    # Map template to runner function
-    template_runners = {
-        "arcgis_permits": "workers.templates.arcgis_permits:run",
-        "state_portal": "workers.templates.state_portal:run",
-        "public_api": "workers.templates.public_api:run",
-        "job_board": "workers.templates.job_board:run",
-        "google_maps": "workers.templates.google_maps:run",
-        "entity_research": "workers.research.entity_research:run_entity_research",
-    }
-    
+    # Templates are discovered from workers/templates (and entry points) and
+    # kept imported per process - warm RQ workers already have them loaded
     template = automation.get("template")
-    if not template or template not in template_runners:
-        raise ValueError(f"Unknown template: {template}")
-    
-    # Import and run the template
-    module_path, func_name = template_runners[template].rsplit(":", 1)
-    
-    try:
-        module = importlib.import_module(module_path)
-        runner = getattr(module, func_name)
-    except (ImportError, AttributeError) as e:
-        raise ValueError(f"Cannot load template {template}: {e}")
+    if not template:
+        raise ValueError(f"Automation {slug} has no template")
+    runner = templates.get(template)
     
     update_progress(f"Running {automation['name']}...", 20)
     
-    # Create run record
-    run_id = supabase.table("automation_runs").insert({
+    # Create run record - buffered, see workers/run_writer.py; a short run
+    # is written once, already finished
+    run_id = run_writer.start({
         "automation_id": automation["id"],
         "status": "running",
         "rq_job_id": job.id if job else None
-    }).execute().data[0]["id"]
+    })
     
     start_time = datetime.utcnow()
     
+    # Incremental templates also get the previous run's cursor and the
+    # automation id (for their seen-record index)
+    extra = {}
+    accepted = inspect.signature(runner).parameters
+    if "cursor" in accepted:
+        extra["cursor"] = get_last_cursor(automation["id"])
+    if "automation_id" in accepted:
+        extra["automation_id"] = automation["id"]
+    
+    # The seen-record index is committed only once the run row is written -
+    # a run whose records or row were lost is retried in full
+    seen = None
+    if "seen_index" in accepted:
+        seen = extra["seen_index"] = SeenIndex(automation["id"])
+    
+    # Streaming templates write records to a sink as they go instead of
+    # returning them all in result["data"]
+    sink = None
+    if "sink" in accepted:
+        sink = extra["sink"] = sink_for(slug, run_id, config)
+    
     try:
         # Execute the template with config
         # Pass job for progress updates
         result = runner(
             config=config,
             geography=automation.get("geography", {}),
-            job=job
+            job=job,
+            **extra
         )
         
+        # Columnar records are stored outside the run row - the result
+        # keeps a pointer and the summary counts only
+        if sink:
+            result = {**result, "data": None, "records": sink.close()}
+        elif isinstance(result.get("data"), RecordBuffer):
+            pointer = store_records(result["data"], f"{slug}/{run_id}")
+            result = {**result, "data": None, "records": pointer}
+        
         # Update run record
         duration = (datetime.utcnow() - start_time).total_seconds()
-        supabase.table("automation_runs").update({
-            "status": "success",
-            "completed_at": datetime.utcnow().isoformat(),
-            "duration_seconds": duration,
-            "records_found": result.get("records_found", 0),
-            "records_new": result.get("records_new", 0),
-            "result": result
-        }).eq("id", run_id).execute()
+        run_writer.finish(
+            run_id,
+            status="success",
+            completed_at=datetime.utcnow().isoformat(),
+            duration_seconds=duration,
+            records_found=result.get("records_found", 0),
+            records_new=result.get("records_new", 0),
+            records_updated=result.get("records_updated"),
+            cursor=result.get("cursor"),
+            result=result,
+            on_written=seen.commit if seen else None
+        )
         
         update_progress("Complete!", 100)
         
@@ -140,43 +173,106 @@ def run_automation(
         }
         
     except Exception as e:
+        # Keep whatever the sink already stored - a retry or a human can use it
+        partial = None
+        if sink and not sink.closed:
+            try:
+                partial = {"records": sink.close(partial=True)}
+            except Exception as sink_error:
+                print(f"Could not flush partial records: {sink_error}")
+        
         # Update run record with error
         duration = (datetime.utcnow() - start_time).total_seconds()
-        supabase.table("automation_runs").update({
+        failed = {
             "status": "failed",
             "completed_at": datetime.utcnow().isoformat(),
             "duration_seconds": duration,
             "error_message": str(e),
             "error_traceback": str(e.__traceback__)
-        }).eq("id", run_id).execute()
+        }
+        if partial:
+            failed["records_found"] = partial["records"]["count"]
+            failed["result"] = partial
+        run_writer.finish(run_id, **failed)
         
         update_progress(f"Failed: {e}", 100)
         
         raise
+    
+    finally:
+        # Execution logs written during the run are buffered - a forked
+        # work-horse exits as soon as this returns
+        flush_logs()
 
 
 def run_batch(
     slugs: list[str],
-    parallel: bool = False
+    parallel: bool = False,
+    backend: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    max_per_template: Optional[int] = None,
+    max_per_host: Optional[int] = None,
+    wait: bool = False,
+    on_result: Optional[Callable[[dict], None]] = None,
+    automations: Optional[Dict[str, dict]] = None
 ) -> dict:
     """
     Run multiple automations.
     
     Args:
         slugs: List of automation slugs
-        parallel: If True, queue all at once. If False, run sequentially.
+        parallel: If True, fan out (see workers/batch.py). If False, run sequentially.
+        backend: "rq" (one RQ job per slug) or "threads" (bounded pool in this
+                 process). Defaults to rq when REDIS_URL is set.
+        max_workers: Thread pool size for the threads backend
+        max_per_template: Max automations of one template running at once
+        max_per_host: Max automations hitting one target host at once
+        wait: rq backend only - block until every job finishes and return the summary
+        on_result: Called with each slug's result as it finishes
+        automations: slug -> automation row already loaded (run_by_filter);
+                     handed to each run so none of them queries the registry
     
     Returns:
-        Summary of runs
+        Summary of runs, or for the rq backend (without wait) a batch handle
+        {batch_id, backend, total, queued, limits} - poll with workers.batch.get_batch()
     """
+    if parallel:
+        from workers import batch
+
+        backend = backend or batch.default_backend()
+        if backend == "threads":
+            return batch.run_threaded(
+                slugs,
+                max_workers=max_workers or batch.MAX_WORKERS,
+                max_per_template=max_per_template,
+                max_per_host=max_per_host,
+                on_result=on_result,
+                automations=automations
+            )
+
+        handle = batch.enqueue_batch(
+            slugs, max_per_template=max_per_template, max_per_host=max_per_host, automations=automations
+        )
+        if not wait and not on_result:
+            return handle
+        for result in batch.iter_results(handle["batch_id"]):
+            if on_result:
+                on_result(result)
+        return batch.get_batch(handle["batch_id"])
+
     results = []
+    automations = automations or {}
     
-    for slug in slugs:
-        try:
-            result = run_automation(slug)
-            results.append({"slug": slug, "status": "success", "result": result})
-        except Exception as e:
-            results.append({"slug": slug, "status": "failed", "error": str(e)})
+    # Run rows of the whole batch go out in a few bulk upserts
+    with run_writer.batch():
+        for slug in slugs:
+            try:
+                result = run_automation(slug, automation=automations.get(slug))
+                results.append({"slug": slug, "status": "success", "result": result})
+            except Exception as e:
+                results.append({"slug": slug, "status": "failed", "error": str(e)})
+            if on_result:
+                on_result(results[-1])
     
     return {
         "total": len(slugs),
@@ -192,7 +288,9 @@ def run_by_filter(
     state: Optional[str] = None,
     template: Optional[str] = None,
     client_id: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    parallel: bool = False,
+    **batch_options
 ) -> dict:
     """
     Run all automations matching a filter.
@@ -200,10 +298,13 @@ def run_by_filter(
     Examples:
         run_by_filter(state="VA")  # All Virginia automations
         run_by_filter(template="arcgis_permits", limit=5)  # First 5 permit scrapers
+        run_by_filter(state="TX", limit=500, parallel=True, max_per_host=2)
     """
     supabase = get_supabase()
     
-    query = supabase.table("automations").select("slug").eq("status", "active")
+    # One query for every matching row - each run gets its row instead of
+    # selecting it again
+    query = supabase.table("automations").select(AUTOMATION_COLUMNS).eq("status", "active")
     
     if type:
         query = query.eq("type", type)
@@ -218,5 +319,6 @@ def run_by_filter(
     
     result = query.limit(limit).execute()
     slugs = [r["slug"] for r in result.data]
+    automation_cache.prime(result.data)
     
-    return run_batch(slugs)
+    return run_batch(slugs, parallel=parallel, automations={r["slug"]: r for r in result.data}, **batch_options)
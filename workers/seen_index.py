@@ -0,0 +1,103 @@
+"""
+Seen-Record Index
+=================
+Persistent (automation_id, record_key) -> content_hash index in
+automation_seen_records (migration 008), so a scraper can tell which of the
+records it just fetched are new, changed, or already emitted by a previous run.
+
+Lookups are batched (one query per LOOKUP_CHUNK keys) and nothing is written
+until commit(). The runner hands templates an index (seen_index=) and commits
+it only after the sink is closed and the successful run row is written (see
+RunWriter.finish on_written); a template called directly commits its own at
+the end. A failed run leaves the index untouched and is retried in full.
+
+Usage:
+    from workers.seen_index import SeenIndex, record_key
+
+    index = SeenIndex(automation_id)
+    batch = {record_key(r["case_number"], jurisdiction): r for r in records}
+    status = index.classify(batch)
+    fresh = [r for key, r in batch.items() if status[key] != "unchanged"]
+    index.commit()
+"""
+
+import json
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from workers.db import get_supabase
+
+
+LOOKUP_CHUNK = 200
+UPSERT_CHUNK = 500
+
+
+def record_key(*parts: Any) -> str:
+    """Stable key for a record identity, e.g. record_key(case_number, jurisdiction)."""
+    return hashlib.sha1("|".join("" if p is None else str(p) for p in parts).encode()).hexdigest()
+
+
+def content_hash(record: Any) -> str:
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SeenIndex:
+    """Seen records of one automation"""
+
+    def __init__(self, automation_id: Optional[str]):
+        self.automation_id = automation_id
+        self._pending: Dict[str, str] = {}
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+
+    def lookup(self, keys: List[str]) -> Dict[str, str]:
+        """record_key -> stored content_hash, for the keys already seen."""
+        if not self.automation_id or not keys:
+            return {}
+        supabase = get_supabase()
+        found = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            rows = supabase.table("automation_seen_records").select("record_key, content_hash").eq(
+                "automation_id", self.automation_id
+            ).in_("record_key", chunk).execute().data
+            found.update({row["record_key"]: row["content_hash"] for row in rows})
+        return found
+
+    def classify(self, records: Dict[str, Any]) -> Dict[str, str]:
+        """
+        record_key -> "new" | "changed" | "unchanged" for a batch of records.
+        New and changed records are queued for commit().
+        """
+        stored = self.lookup(list(records))
+        status = {}
+        for key, record in records.items():
+            digest = content_hash(record)
+            previous = stored.get(key)
+            if previous is None:
+                status[key] = "new"
+            elif previous != digest:
+                status[key] = "changed"
+            else:
+                status[key] = "unchanged"
+                continue
+            self._pending[key] = digest
+        for value in status.values():
+            self.counts[value] += 1
+        return status
+
+    def commit(self) -> int:
+        """Write queued new/changed hashes. Returns how many were written."""
+        if not self.automation_id or not self._pending:
+            return 0
+        now = datetime.utcnow().isoformat()
+        rows = [
+            {"automation_id": self.automation_id, "record_key": key, "content_hash": digest, "last_seen_at": now}
+            for key, digest in self._pending.items()
+        ]
+        table = get_supabase().table("automation_seen_records")
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            table.upsert(rows[start:start + UPSERT_CHUNK], on_conflict="automation_id,record_key").execute()
+        written = len(rows)
+        self._pending.clear()
+        return written
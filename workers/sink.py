@@ -0,0 +1,215 @@
+"""
+Record Sinks
+============
+Incremental output for templates, so a run never holds all its records.
+
+run_automation used to wait for a template's fully materialized
+result["data"]. Templates that accept a `sink` argument now get one and
+write records as they produce them:
+
+    def run(config, geography, job=None, sink=None):
+        sink.set_header({"geography": geography})
+        for record in scrape():
+            sink.write(record)
+        return {"records_found": sink.count}
+
+Sinks flush every chunk_size records, so memory is bounded by one chunk
+and every flushed chunk survives a crash:
+
+- ChunkedFileSink  each chunk is a columnar part file (workers/records.py)
+                   stored right away under {slug}/{run_id}/part-NNNNN
+- TableSink        each chunk is bulk-inserted (or upserted) into a Supabase
+                   table, for automations with config["output_table"]
+- MemorySink       keeps a RecordBuffer (templates called directly)
+
+close() flushes the last chunk and returns the pointer the runner keeps in
+automation_runs.result - for failed runs too, with "partial": True. A chunk
+stays pending until its flush succeeds, so a failed upload can be retried,
+and the pointer's count is the number of records actually stored.
+
+Environment:
+    SINK_CHUNK_SIZE   records per flushed chunk (default 1000)
+"""
+
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from workers.records import RecordBuffer, store_records, load_records
+
+
+CHUNK_SIZE = int(os.environ.get("SINK_CHUNK_SIZE", 1000))
+
+
+class RecordSink:
+    """Base sink: counts records and flushes every chunk_size"""
+
+    kind = "base"
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.count = 0
+        self.stored = 0
+        self.chunks = 0
+        self.counts: Dict[str, int] = {}
+        self.closed = False
+        self._pending: List[Dict[str, Any]] = []
+
+    def set_header(self, header: Dict[str, Any]) -> None:
+        """Values shared by every record (stored once per chunk, not per record)."""
+        self.header.update(header)
+
+    def write(self, record: Dict[str, Any], kind: Optional[str] = None) -> None:
+        """Add a record; kind (e.g. "new", "changed") is tallied in self.counts."""
+        if self.closed:
+            raise RuntimeError("Sink is closed")
+        self._pending.append(record)
+        self.count += 1
+        if kind:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Dict[str, Any]], kind: Optional[str] = None) -> None:
+        for record in records:
+            self.write(record, kind)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        # Dropped only once stored - a failed flush keeps the chunk for the next try
+        self._flush(self._pending)
+        self.stored += len(self._pending)
+        self._pending = []
+        self.chunks += 1
+
+    def _flush(self, records: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self, partial: bool = False) -> Dict[str, Any]:
+        """
+        Flush what's left and return the pointer/summary for the run record.
+
+        partial: the run failed - a last chunk that can't be flushed is
+        reported as "unflushed" instead of raising; count is what was stored.
+        """
+        unflushed = 0
+        if not self.closed:
+            try:
+                self.flush()
+            except Exception as e:
+                if not partial:
+                    raise
+                unflushed = len(self._pending)
+                print(f"[SINK] Could not flush last {unflushed} records: {e}")
+            self.closed = True
+        summary = {"sink": self.kind, "count": self.stored, "chunks": self.chunks, **self._pointer()}
+        if self.counts:
+            summary["counts"] = dict(self.counts)
+        if partial:
+            summary["partial"] = True
+        if unflushed:
+            summary["unflushed"] = unflushed
+        return summary
+
+    def _pointer(self) -> Dict[str, Any]:
+        return {}
+
+
+class ChunkedFileSink(RecordSink):
+    """Columnar part files, stored (Supabase Storage / local) as each chunk fills"""
+
+    kind = "file"
+
+    def __init__(self, name: str, chunk_size: int = CHUNK_SIZE, format: Optional[str] = None, backend: Optional[str] = None):
+        super().__init__(chunk_size)
+        self.name = name
+        self.options = {key: value for key, value in (("format", format), ("backend", backend)) if value}
+        self.parts: List[Dict[str, Any]] = []
+
+    def _flush(self, records: List[Dict[str, Any]]) -> None:
+        buffer = RecordBuffer(header=self.header)
+        buffer.extend(records)
+        self.parts.append(store_records(buffer, f"{self.name}/part-{len(self.parts) + 1:05d}", **self.options))
+
+    def _pointer(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "parts": [part["uri"] for part in self.parts],
+            "bytes": sum(part["bytes"] for part in self.parts),
+        }
+
+
+class TableSink(RecordSink):
+    """Bulk inserts into a Supabase table, one request per chunk"""
+
+    kind = "table"
+
+    def __init__(
+        self,
+        table: str,
+        chunk_size: int = CHUNK_SIZE,
+        on_conflict: Optional[str] = None,
+        row: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        """
+        Args:
+            table: Target table
+            on_conflict: Upsert conflict columns (plain insert when None)
+            row: Maps (record, header) to a table row (default: header merged into record)
+        """
+        super().__init__(chunk_size)
+        self.table = table
+        self.on_conflict = on_conflict
+        self.row = row or (lambda record, header: {**header, **record})
+
+    def _flush(self, records: List[Dict[str, Any]]) -> None:
+        from workers.db import get_supabase
+
+        rows = [self.row(record, self.header) for record in records]
+        query = get_supabase().table(self.table)
+        if self.on_conflict:
+            query.upsert(rows, on_conflict=self.on_conflict).execute()
+        else:
+            query.insert(rows).execute()
+
+    def _pointer(self) -> Dict[str, Any]:
+        return {"table": self.table}
+
+
+class MemorySink(RecordSink):
+    """Keeps everything in a RecordBuffer (no flushing) - for direct template calls"""
+
+    kind = "memory"
+
+    def __init__(self):
+        super().__init__(chunk_size=0)
+        self.buffer = RecordBuffer()
+
+    def set_header(self, header: Dict[str, Any]) -> None:
+        super().set_header(header)
+        self.buffer.header = self.header
+
+    def write(self, record: Dict[str, Any], kind: Optional[str] = None) -> None:
+        self.buffer.append(record)
+        self.count += 1
+        self.stored += 1
+        if kind:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def _flush(self, records: List[Dict[str, Any]]) -> None:
+        pass
+
+
+def sink_for(slug: str, run_id: str, config: Dict[str, Any]) -> RecordSink:
+    """Sink for a run: TableSink when config["output_table"] is set, else part files."""
+    chunk_size = int(config.get("sink_chunk_size", CHUNK_SIZE))
+    if config.get("output_table"):
+        return TableSink(config["output_table"], chunk_size=chunk_size, on_conflict=config.get("output_on_conflict"))
+    return ChunkedFileSink(f"{slug}/{run_id}", chunk_size=chunk_size)
+
+
+def iter_sink_records(pointer: Dict[str, Any], include_header: bool = False):
+    """Read back the records of a ChunkedFileSink pointer, part by part."""
+    for uri in pointer.get("parts", []):
+        yield from load_records(uri).iter_records(include_header)
@@ -0,0 +1,156 @@
+"""
+Template Registry
+=================
+Discovers automation templates instead of hardcoding them in the runner.
+
+Sources (no template is imported during discovery):
+- every module in workers/templates/; the template name is the module name
+  and the entry function is run() (or the module's TEMPLATE_ENTRY)
+- the "automations.templates" entry point group, for templates shipped in
+  other packages:  [project.entry-points."automations.templates"]
+                   my_template = "my_pkg.module:run"
+
+get(name) imports a template the first time it's needed and keeps the
+function, timing the import. warm() imports and validates all of them - the
+RQ worker (workers/worker.py) calls it at startup so every forked job starts
+with templates already in memory. A template is valid if its function takes
+`config` and `geography` (or **kwargs), which is how run_automation calls it.
+
+Usage:
+    from workers.template_registry import templates
+
+    runner = templates.get("arcgis_permits")
+    templates.warm()
+    templates.stats()   # per-template load_seconds / error
+"""
+
+import time
+import inspect
+import pkgutil
+import importlib
+import threading
+from importlib.metadata import entry_points
+from typing import Any, Callable, Dict, Optional
+
+ENTRY_POINT_GROUP = "automations.templates"
+TEMPLATE_PACKAGE = "workers.templates"
+REQUIRED_PARAMS = ("config", "geography")
+
+
+class TemplateError(ValueError):
+    """Unknown, unimportable or invalid template"""
+
+
+class TemplateRegistry:
+    """name -> "module:function", imported lazily and cached per process"""
+
+    def __init__(self, package: str = TEMPLATE_PACKAGE, group: str = ENTRY_POINT_GROUP):
+        self.package = package
+        self.group = group
+        self._lock = threading.Lock()
+        self._targets: Optional[Dict[str, str]] = None
+        self._loaded: Dict[str, Callable] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------
+
+    def discover(self) -> Dict[str, str]:
+        """Scan the templates package and entry points (once)."""
+        if self._targets is not None:
+            return self._targets
+
+        targets: Dict[str, str] = {}
+        package = importlib.import_module(self.package)
+        for module in pkgutil.iter_modules(package.__path__):
+            if module.name.startswith("_") or module.ispkg:
+                continue
+            targets[module.name] = f"{self.package}.{module.name}:run"
+
+        try:
+            for entry in entry_points(group=self.group):
+                targets[entry.name] = entry.value
+        except Exception as e:
+            print(f"[TEMPLATES] Entry point scan failed: {e}")
+
+        self._targets = targets
+        return targets
+
+    def names(self):
+        return sorted(self.discover())
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _import(self, name: str, target: str) -> Callable:
+        module_path, _, func_name = target.partition(":")
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+
+        # Modules may name a different entry function
+        func_name = getattr(module, "TEMPLATE_ENTRY", func_name or "run")
+        func = getattr(module, func_name, None)
+        elapsed = time.perf_counter() - start
+
+        if not callable(func):
+            raise TemplateError(f"Template {name}: {module_path} has no {func_name}()")
+
+        params = inspect.signature(func).parameters
+        takes_kwargs = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+        missing = [p for p in REQUIRED_PARAMS if p not in params]
+        if missing and not takes_kwargs:
+            raise TemplateError(f"Template {name}: {module_path}.{func_name}() doesn't accept {', '.join(missing)}")
+
+        self._info[name] = {
+            "target": f"{module_path}:{func_name}",
+            "load_seconds": round(elapsed, 4),
+            "params": list(params),
+            "error": None,
+        }
+        return func
+
+    def get(self, name: str) -> Callable:
+        """Template function by name (imported on first use)."""
+        func = self._loaded.get(name)
+        if func is not None:
+            return func
+
+        targets = self.discover()
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            target = targets.get(name)
+            if not target:
+                raise TemplateError(f"Unknown template: {name} (available: {', '.join(sorted(targets))})")
+            try:
+                func = self._import(name, target)
+            except TemplateError as e:
+                self._info[name] = {"target": target, "load_seconds": None, "error": str(e)}
+                raise
+            except Exception as e:
+                self._info[name] = {"target": target, "load_seconds": None, "error": repr(e)}
+                raise TemplateError(f"Cannot load template {name}: {e}") from e
+            self._loaded[name] = func
+            return func
+
+    def warm(self) -> Dict[str, Dict[str, Any]]:
+        """Import and validate every discovered template. Returns stats()."""
+        for name in self.names():
+            try:
+                self.get(name)
+            except TemplateError as e:
+                print(f"[TEMPLATES] {e}")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-template {target, loaded, load_seconds, error}."""
+        stats = {}
+        for name, target in self.discover().items():
+            info = self._info.get(name, {"target": target, "load_seconds": None, "error": None})
+            stats[name] = {**info, "loaded": name in self._loaded}
+        return stats
+
+
+templates = TemplateRegistry()
@@ -9,23 +9,157 @@ Config Schema:
     "permit_endpoint": "https://gis.example.gov/.../PermitHistory/FeatureServer/0",
     "parcel_endpoint": "https://gis.example.gov/.../Parcels/MapServer/1",  # optional
     "case_types": ["Building Commercial", "Site Development"],
-    "min_date": "90_days_ago",  # or ISO date
+    "min_date": "90_days_ago",  # or "30_days_ago", ISO date, or "" for the full history
+    "date_field": "ApplicationDate",  # optional - defaults to the first known date field on the layer
+    "case_type_field": "CaseType",  # optional
     "keywords": ["INDUSTRIAL", "WAREHOUSE", "DATA CENTER"],
-    "min_lot_size": 5.0  # acres, optional
+    "min_lot_size": 5.0,  # acres, optional
+    "extra_fields": ["Zoning"],  # optional - additional permit fields to keep in raw_attributes
+    "out_fields": ["*"],  # optional - replaces the requested field list entirely
+    "page_size": 1000,  # optional - records per request (capped at the server's maxRecordCount)
+    "parcel_mode": "batched",  # or "per_point" (one spatial query per permit, the old behaviour)
+    "parcel_batch_size": 100,  # optional - points per multipoint parcel query
+    "incremental": true,  # default - only fetch/emit permits new or changed since the last run
+    "edit_date_field": "EditDate"  # optional - defaults to the layer's editFieldsInfo.editDateField
 }
+
+Permits are paged through (resultOffset, or objectId chunks on servers
+without pagination - see workers/arcgis.py) and streamed through parcel
+enrichment and filters, so large jurisdictions aren't truncated at
+maxRecordCount and aren't held in memory.
+
+The min_date window (and, without a parcel_endpoint, the keywords as
+UPPER(field) LIKE predicates) is pushed into the server-side WHERE clause so
+only the window is transferred. If a server rejects those predicates the run
+falls back to the base clause and filters locally.
+
+Runs are incremental: the previous run's cursor (max edit date, or max
+objectId on layers without edit tracking) is added to the WHERE clause, and
+every emitted permit is recorded by (case_number, jurisdiction) + content
+hash in automation_seen_records, so only new or changed permits are emitted
+and records_new / records_updated are real counts.
+
+Output records are streamed to the run's sink (workers/sink.py) in chunks of
+columnar part files, so memory stays bounded and flushed chunks survive a
+crash; automation_runs.result only keeps a pointer to them.
+
+Parcel enrichment batches points into multipoint queries run concurrently
+with a per-host rate limit and a rounded-coordinate cache (workers/parcels.py).
 """
 
 import os
 import requests
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 from rq import get_current_job
 
+from workers.parcels import enrich_batched, BATCH_SIZE as PARCEL_BATCH_SIZE
+from workers.keywords import get_matcher
+from workers.sink import RecordSink, MemorySink
+from workers.progress import ProgressReporter
+from workers.seen_index import SeenIndex, record_key, content_hash
+from workers.arcgis import (
+    ArcGISError, iter_features, layer_info, object_id_field, resolve_field, in_predicate,
+    date_predicate, timestamp_predicate, keyword_predicate, supports_standardized_sql
+)
+
+# Permit fields read when formatting records (both naming styles seen in the wild)
+RECORD_FIELDS = [
+    "CaseNumber", "CASE_NUMBER",
+    "CaseType", "CASE_TYPE",
+    "ApplicationDate", "APPLICATION_DATE",
+    "Address", "ADDRESS",
+    "OwnerName", "OWNER_NAME",
+    "PropertyUse", "PROPERTY_USE",
+    "LotSize_Acre",
+]
+
+# Records classified against the seen-record index per lookup batch
+SEEN_BATCH_SIZE = 500
+
+# Parcel fields copied onto each permit by enrichment
+PARCEL_FIELDS = ["OwnerName", "PropertyUse", "LotSize_Acre", "Zoning"]
+
+# Per-point parcel enrichment reports progress every N permits
+PROGRESS_EVERY = 100
+
+# Date fields tried (after config["date_field"]) for the min_date window
+DATE_FIELDS = ["ApplicationDate", "APPLICATION_DATE", "IssueDate", "ISSUE_DATE", "IssuedDate", "OpenDate", "OPENED_DATE"]
+
+# String date formats seen on permit layers (ISO is handled first)
+DATE_FORMATS = [
+    "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%Y/%m/%d", "%Y%m%d",
+    "%d-%b-%Y", "%d %b %Y", "%b %d %Y", "%B %d %Y",
+]
+
+# Fields searched by the keyword filter
+KEYWORD_FIELDS = ["PropertyUse", "PROPERTY_USE", "Description", "ProjectName", "Notes"]
+
+
+def permit_out_fields(config: dict) -> list:
+    """
+    Fields to request from the permit layer: what the record formatter and
+    keyword filter read, plus config["extra_fields"]. config["out_fields"]
+    overrides the whole list (["*"] = every attribute, the old behaviour).
+    """
+    if config.get("out_fields"):
+        return config["out_fields"]
+    return RECORD_FIELDS + KEYWORD_FIELDS + list(config.get("extra_fields", []))
+
+
+def resolve_min_date(min_date: Optional[str]) -> Optional[str]:
+    """"90_days_ago" style (any N) or ISO date -> YYYY-MM-DD (None/"" = no window)."""
+    if not min_date:
+        return None
+    if str(min_date).endswith("_days_ago"):
+        days = int(str(min_date).split("_", 1)[0])
+        return (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    return str(min_date)[:10]
+
+
+def stream_permits(endpoint: str, where_parts: list, pushdown_parts: list, **query) -> Iterator[dict]:
+    """
+    iter_features() with the pushdown predicates in the WHERE clause. If the
+    server rejects them before returning anything (old SQL dialect, field
+    type mismatch), retry with the base clause only - the local filters
+    still apply.
+    """
+    where = " AND ".join(where_parts + pushdown_parts) or "1=1"
+    started = False
+    try:
+        for feature in iter_features(endpoint, where=where, **query):
+            started = True
+            yield feature
+        return
+    except ArcGISError as e:
+        if started or not pushdown_parts:
+            raise
+        print(f"Server rejected pushdown filters ({e}) - falling back to local filtering")
+    
+    yield from iter_features(endpoint, where=" AND ".join(where_parts) or "1=1", **query)
+
+
+def track_cursor(features: Iterable[dict], cursor: dict, edit_date_field: Optional[str], oid_field: Optional[str]) -> Iterator[dict]:
+    """Pass features through, raising cursor["max_edit_date"] / cursor["max_object_id"] as they go."""
+    for feature in features:
+        attrs = feature.get("attributes", {})
+        edited = attrs.get(edit_date_field) if edit_date_field else None
+        if isinstance(edited, (int, float)) and edited > (cursor.get("max_edit_date") or 0):
+            cursor["max_edit_date"] = edited
+        oid = attrs.get(oid_field) if oid_field else None
+        if isinstance(oid, int) and oid > (cursor.get("max_object_id") or 0):
+            cursor["max_object_id"] = oid
+        yield feature
+
 
 def run(
     config: dict,
     geography: dict,
-    job: Optional[object] = None
+    job: Optional[object] = None,
+    cursor: Optional[dict] = None,
+    automation_id: Optional[str] = None,
+    sink: Optional[RecordSink] = None,
+    seen_index: Optional[SeenIndex] = None
 ) -> dict:
     """
     Run the ArcGIS permit scraper.
@@ -34,16 +168,24 @@ def run(
         config: Scraper configuration (endpoints, filters)
         geography: Geographic context {state, county, city}
         job: RQ job for progress updates
+        cursor: High-water mark from the previous successful run (set by the runner)
+        automation_id: Automation id, keys the seen-record index (set by the runner)
+        sink: Where output records are written as they're produced (set by the
+              runner); without one they're collected in memory and returned
+        seen_index: Seen-record index the runner commits once the output and
+                    the run row are stored (set by the runner); without one
+                    the template commits its own index at the end
     
     Returns:
-        {records_found, records_new, data: [...]}
+        {records_found, records_new, records_updated, cursor, data}
+        Records go to the sink - only new or changed permits when running
+        incrementally, geography in the header rather than on every record.
+        data is the in-memory RecordBuffer when no sink was passed, else None.
     """
     
-    def update(message: str, percent: int):
-        if job:
-            job.meta = {"message": message, "percent": percent}
-            job.save_meta()
-        print(f"[{percent}%] {message}")
+    # Merged into job.meta and rate-limited - the per-batch updates below
+    # don't each cost a Redis write
+    update = ProgressReporter(job).update
     
     # Validate config
     permit_endpoint = config.get("permit_endpoint")
@@ -52,63 +194,119 @@ def run(
     
     update("Fetching permits...", 20)
     
+    session = requests.Session()
+    info = layer_info(permit_endpoint, session)
+    
     # Build date filter
-    min_date = config.get("min_date", "90_days_ago")
-    if min_date == "90_days_ago":
-        min_date = (datetime.utcnow() - timedelta(days=90)).strftime("%Y-%m-%d")
+    min_date = resolve_min_date(config.get("min_date", "90_days_ago"))
+    date_field = resolve_field(info, [config.get("date_field")] + DATE_FIELDS)
+    if not date_field and not info.get("fields"):
+        date_field = config.get("date_field")  # layer metadata unavailable - trust the config
     
-    # Build WHERE clause
+    # Build WHERE clause - the base part always goes to the server, the
+    # pushdown part (date window, keywords) is dropped again if the server rejects it
     case_types = config.get("case_types", [])
+    keywords = config.get("keywords", [])
+    parcel_endpoint = config.get("parcel_endpoint")
     where_parts = []
+    pushdown_parts = []
     
     if case_types:
-        types_str = ",".join([f"'{t}'" for t in case_types])
-        where_parts.append(f"CaseType IN ({types_str})")
+        case_type_field = resolve_field(info, [config.get("case_type_field"), "CaseType", "CASE_TYPE"]) or "CaseType"
+        where_parts.append(in_predicate(case_type_field, case_types))
     
-    where_clause = " AND ".join(where_parts) if where_parts else "1=1"
+    if min_date and date_field:
+        pushdown_parts.append(date_predicate(date_field, min_date, supports_standardized_sql(info)))
+    elif min_date:
+        print(f"No date field found on {permit_endpoint} - filtering {min_date} window locally")
     
-    # Query permit layer
-    params = {
-        "where": where_clause,
-        "outFields": "*",
-        "returnGeometry": "true",
-        "f": "json"
-    }
+    # Keyword fields can be overwritten by parcel enrichment, so only push
+    # them down when the permit layer is the sole source
+    keyword_fields = [f for f in (resolve_field(info, [name]) for name in KEYWORD_FIELDS) if f]
+    push_keywords = bool(keywords and keyword_fields and not parcel_endpoint and supports_standardized_sql(info))
+    if push_keywords:
+        pushdown_parts.append(keyword_predicate(dict.fromkeys(keyword_fields), keywords))
+    
+    # Incremental: start from the previous run's high-water mark. Edit date
+    # catches new and edited permits; objectId (layers without edit tracking)
+    # only catches new ones. The seen-record index below drops anything
+    # already emitted either way.
+    incremental = config.get("incremental", True)
+    edit_date_field = resolve_field(info, [config.get("edit_date_field"), (info.get("editFieldsInfo") or {}).get("editDateField")])
+    oid_field = object_id_field(info)
+    previous = (cursor or {}) if incremental else {}
+    next_cursor = {"edit_date_field": edit_date_field, "object_id_field": oid_field}
+    
+    if previous.get("max_edit_date") and edit_date_field and previous.get("edit_date_field") == edit_date_field:
+        pushdown_parts.append(timestamp_predicate(edit_date_field, previous["max_edit_date"], supports_standardized_sql(info)))
+        next_cursor["max_edit_date"] = previous["max_edit_date"]
+    elif previous.get("max_object_id") and oid_field and previous.get("object_id_field") == oid_field:
+        pushdown_parts.append(f"{oid_field} > {int(previous['max_object_id'])}")
+    if previous.get("max_object_id"):
+        next_cursor["max_object_id"] = previous["max_object_id"]
     
-    response = requests.get(f"{permit_endpoint}/query", params=params, timeout=60)
-    response.raise_for_status()
-    data = response.json()
+    # Stream the permit layer page by page, asking only for the fields used below
+    features = stream_permits(
+        permit_endpoint,
+        where_parts,
+        pushdown_parts,
+        out_fields=permit_out_fields(config) + [f for f in (date_field, edit_date_field) if f],
+        page_size=config.get("page_size"),
+        session=session
+    )
+    features = track_cursor(features, next_cursor, edit_date_field, oid_field)
     
-    features = data.get("features", [])
-    update(f"Found {len(features)} permits", 40)
+    # Date window is applied locally too (no-op when the server already did it)
+    if min_date:
+        features = filter_by_date(features, min_date, date_field)
     
     # Enrich with parcel data if endpoint provided
-    parcel_endpoint = config.get("parcel_endpoint")
-    if parcel_endpoint and features:
-        update("Enriching with parcel data...", 50)
-        features = enrich_with_parcels(features, parcel_endpoint, job)
+    if parcel_endpoint and config.get("parcel_mode", "batched") == "per_point":
+        features = enrich_with_parcels(
+            features, parcel_endpoint,
+            on_progress=lambda n: update(f"Enriched {n} permits with parcels...", 50)
+        )
+    elif parcel_endpoint:
+        features = enrich_batched(
+            features,
+            parcel_endpoint,
+            out_fields=PARCEL_FIELDS,
+            spatial_reference=(info.get("extent") or {}).get("spatialReference"),
+            batch_size=config.get("parcel_batch_size", PARCEL_BATCH_SIZE),
+            on_progress=lambda n: update(f"Enriched {n} permits with parcels...", 50)
+        )
     
-    # Filter by keywords
-    keywords = config.get("keywords", [])
+    # Filter by keywords (still needed when pushed down - parcel fields and exact semantics)
     if keywords:
-        update("Filtering by keywords...", 70)
         features = filter_by_keywords(features, keywords)
-        update(f"{len(features)} match keyword filters", 75)
     
     # Filter by lot size
     min_lot_size = config.get("min_lot_size")
     if min_lot_size:
-        features = [f for f in features if f.get("attributes", {}).get("LotSize_Acre", 0) >= min_lot_size]
-        update(f"{len(features)} meet lot size minimum", 80)
+        features = (f for f in features if (f.get("attributes", {}).get("LotSize_Acre") or 0) >= min_lot_size)
+    
+    # Format output as features arrive; with the seen-record index, only
+    # new or changed permits are kept
+    owns_index = seen_index is None or not incremental
+    seen = SeenIndex(automation_id if incremental else None) if owns_index else seen_index
+    jurisdiction = "/".join(str(geography.get(k) or "") for k in ("state", "county", "city")).strip("/") or permit_endpoint
+    out = sink or MemorySink()
+    out.set_header({"geography": geography, "permit_endpoint": permit_endpoint})
+    found = 0
+    batch = {}
+    
+    def flush_batch():
+        status = seen.classify(batch)
+        for key, record in batch.items():
+            if status[key] != "unchanged":
+                out.write(record, status[key])
+        batch.clear()
     
-    # Format output
-    update("Formatting results...", 90)
-    records = []
     for feature in features:
         attrs = feature.get("attributes", {})
         geom = feature.get("geometry", {})
         
-        records.append({
+        record = {
             "case_number": attrs.get("CaseNumber") or attrs.get("CASE_NUMBER"),
             "case_type": attrs.get("CaseType") or attrs.get("CASE_TYPE"),
             "application_date": format_date(attrs.get("ApplicationDate") or attrs.get("APPLICATION_DATE")),
@@ -120,34 +318,64 @@ def run(
                 "lat": geom.get("y"),
                 "lon": geom.get("x")
             } if geom else None,
-            "geography": geography,
             "raw_attributes": attrs
-        })
+        }
+        if "matched_keywords" in feature:
+            record["matched_keywords"] = feature["matched_keywords"]
+        identity = record["case_number"] or (f"oid:{attrs[oid_field]}" if oid_field and attrs.get(oid_field) is not None else content_hash(attrs))
+        batch[record_key(identity, jurisdiction)] = record
+        found += 1
+        
+        if len(batch) >= SEEN_BATCH_SIZE:
+            flush_batch()
+            update(f"{found} matching permits so far, {out.count} new or changed...", 60)
+    
+    if batch:
+        flush_batch()
+    
+    # Only remember what was emitted once the whole run went through - a
+    # runner-provided index is committed by the runner after its run row
+    if owns_index:
+        seen.commit()
     
-    update(f"Complete! {len(records)} records", 100)
+    update(f"Complete! {found} records, {seen.counts['new']} new, {seen.counts['changed']} changed", 100)
     
     return {
-        "records_found": len(records),
-        "records_new": len(records),  # TODO: dedup against previous runs
-        "data": records,
+        "records_found": found,
+        "records_new": seen.counts["new"],
+        "records_updated": seen.counts["changed"],
+        "cursor": next_cursor,
+        "data": out.buffer if isinstance(out, MemorySink) else None,
         "geography": geography,
         "config_used": {
             "permit_endpoint": permit_endpoint,
             "case_types": case_types,
-            "keywords": keywords
+            "keywords": keywords,
+            "min_date": min_date,
+            "date_field": date_field,
+            "incremental": incremental,
+            "cursor_in": previous or None,
+            "where": " AND ".join(where_parts + pushdown_parts) or "1=1"
         }
     }
 
 
-def enrich_with_parcels(features: list, parcel_endpoint: str, job: Optional[object] = None) -> list:
-    """Enrich permits with parcel data via spatial query."""
-    enriched = []
-    total = len(features)
+def enrich_with_parcels(
+    features: Iterable[dict],
+    parcel_endpoint: str,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Iterator[dict]:
+    """
+    Enrich permits with parcel data via one spatial query per permit
+    (parcel_mode="per_point"; the default batched mode is workers/parcels.py).
+    on_progress is called with the number of permits done every PROGRESS_EVERY.
+    """
+    session = requests.Session()
     
     for i, feature in enumerate(features):
         geom = feature.get("geometry")
         if not geom:
-            enriched.append(feature)
+            yield feature
             continue
         
         # Spatial query
@@ -155,13 +383,13 @@ def enrich_with_parcels(features: list, parcel_endpoint: str, job: Optional[obje
             "geometry": f"{geom.get('x')},{geom.get('y')}",
             "geometryType": "esriGeometryPoint",
             "spatialRel": "esriSpatialRelIntersects",
-            "outFields": "OwnerName,PropertyUse,LotSize_Acre,Zoning",
+            "outFields": ",".join(PARCEL_FIELDS),
             "returnGeometry": "false",
             "f": "json"
         }
         
         try:
-            response = requests.get(f"{parcel_endpoint}/query", params=params, timeout=30)
+            response = session.get(f"{parcel_endpoint}/query", params=params, timeout=30)
             if response.ok:
                 parcel_data = response.json()
                 parcels = parcel_data.get("features", [])
@@ -176,31 +404,76 @@ def enrich_with_parcels(features: list, parcel_endpoint: str, job: Optional[obje
         except Exception as e:
             print(f"Parcel enrichment failed for feature {i}: {e}")
         
-        enriched.append(feature)
+        yield feature
         
-        # Progress update every 10%
-        if job and i % max(1, total // 10) == 0:
-            pct = 50 + int((i / total) * 20)
-            job.meta = {"message": f"Enriching {i}/{total} permits...", "percent": pct}
-            job.save_meta()
-    
-    return enriched
+        # Total isn't known while streaming - report a count
+        if on_progress and i and i % PROGRESS_EVERY == 0:
+            on_progress(i)
 
 
-def filter_by_keywords(features: list, keywords: list) -> list:
-    """Filter features by keywords in property use or description."""
-    keywords_upper = [k.upper() for k in keywords]
+def filter_by_keywords(features: Iterable[dict], keywords: list) -> Iterator[dict]:
+    """
+    Filter features by keywords in property use or description. Kept features
+    get feature["matched_keywords"] (compiled matcher, cached per keyword list).
+    """
+    matcher = get_matcher(keywords)
     
-    def matches(feature):
+    for feature in features:
         attrs = feature.get("attributes", {})
         # Check common fields
-        for field in ["PropertyUse", "PROPERTY_USE", "Description", "ProjectName", "Notes"]:
-            value = attrs.get(field, "")
-            if value and any(kw in str(value).upper() for kw in keywords_upper):
-                return True
-        return False
+        matched = matcher.matches_any(attrs.get(field) for field in KEYWORD_FIELDS)
+        if matched:
+            feature["matched_keywords"] = matched
+            yield feature
+
+
+def filter_by_date(features: Iterable[dict], min_date: str, date_field: Optional[str]) -> Iterator[dict]:
+    """Keep features on/after min_date (features without a date are kept)."""
+    fields = [date_field] if date_field else DATE_FIELDS
     
-    return [f for f in features if matches(f)]
+    for feature in features:
+        attrs = feature.get("attributes", {})
+        value = next((attrs[f] for f in fields if attrs.get(f)), None)
+        date = parse_date(value)
+        # Unparseable dates are kept - better an extra permit than a lost one
+        if not date or date >= min_date:
+            yield feature
+
+
+def parse_date(value) -> Optional[str]:
+    """
+    ArcGIS date value -> YYYY-MM-DD, or None if it can't be read.
+
+    Date fields come back as epoch milliseconds; string-typed fields (the
+    layers where the server-side date filter is often rejected) use ISO or
+    local formats like "10/03/2025", which don't compare as strings.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value / 1000).strftime("%Y-%m-%d")
+        except (OverflowError, OSError, ValueError):
+            return None
+
+    text = str(value).strip()
+    if text.isdigit() and len(text) >= 10:
+        return parse_date(int(text))  # epoch ms as a string
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return datetime.strptime(text[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+
+    # Drop a time part ("10/03/2025 14:05:00", "10/03/2025 2:05 PM") and commas
+    words = text.replace(",", "").split()
+    for candidate in dict.fromkeys([" ".join(words), words[0], " ".join(words[:3])]):
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+    return None
 
 
 def format_date(timestamp):
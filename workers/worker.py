@@ -0,0 +1,77 @@
+"""
+Warm RQ Worker
+==============
+`rq worker` imports a job's module inside the forked work-horse, so every
+run paid for importing its template (requests, openai, parsers, ...) again.
+This entry point imports the runner and every template once in the parent
+process before it starts listening; forks inherit them already loaded.
+
+Template load times and any template that failed to import/validate are
+printed at startup and published to Redis (template_registry:{worker name})
+so the API can show them at /workers/templates.
+
+With RQ_WORKER_CLASS=simple jobs run in the worker process itself (no fork
+per job), so automation_runs rows are buffered across jobs and written in
+bulk (workers/run_writer.py); whatever is pending is flushed when the
+worker shuts down. Forked work-horses write their run rows before exiting.
+
+Usage:
+    python -m workers.worker                    # default queue
+    python -m workers.worker high default low   # queues in priority order
+
+Environment:
+    RQ_WORKER_CLASS   fork | simple (default fork)
+"""
+
+import os
+import sys
+import json
+import socket
+
+# Allow `python workers/worker.py` as well as `python -m workers.worker`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis import Redis
+from rq import Queue, SimpleWorker, Worker
+
+import workers.runner  # noqa: F401 - pre-import the job entry points
+import workers.batch  # noqa: F401
+from workers.template_registry import templates
+from workers.run_writer import run_writer
+
+STATS_TTL = 86400
+WORKER_CLASS = os.environ.get("RQ_WORKER_CLASS", "fork")
+
+
+def publish_template_stats(redis: Redis, worker_name: str, stats: dict) -> None:
+    try:
+        redis.set(f"template_registry:{worker_name}", json.dumps(stats), ex=STATS_TTL)
+    except Exception as e:
+        print(f"[WORKER] Could not publish template stats: {e}")
+
+
+def main(queue_names=None):
+    redis = Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    queues = [Queue(name, connection=redis) for name in (queue_names or ["default"])]
+    worker_name = f"{socket.gethostname()}.{os.getpid()}"
+
+    stats = templates.warm()
+    for name, info in sorted(stats.items()):
+        if info["error"]:
+            print(f"[WORKER] template {name}: FAILED - {info['error']}")
+        else:
+            print(f"[WORKER] template {name}: loaded in {info['load_seconds']}s")
+    publish_template_stats(redis, worker_name, stats)
+
+    if WORKER_CLASS == "simple":
+        try:
+            with run_writer.batch():
+                SimpleWorker(queues, connection=redis, name=worker_name).work(with_scheduler=True)
+        finally:
+            run_writer.close()
+    else:
+        Worker(queues, connection=redis, name=worker_name).work(with_scheduler=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])